@@ -24,6 +24,7 @@ class Tank {
     ZMQ.Context ctx
     ZMQ.Socket cmdSocket
     ZMQ.Socket eventSocket
+    String peerId
     GameInfo gameInfo
     int myId
     boolean isAlive = true
@@ -62,12 +63,13 @@ class Tank {
         initSockets(reply)
         gameInfo = reply.gameInfo
         myId = reply.id
+        peerId = reply.peerId
     }
 
     private initSockets(RegistrationReply reply) {
         log.info("Subscribing to ${reply.eventUrl}")
         eventSocket = ctx.socket(SocketType.SUB)
-        eventSocket.subscribe(ZMQ.SUBSCRIPTION_ALL)
+        reply.eventTopicsList.each { topic -> eventSocket.subscribe(topic) }
         eventSocket.connect(reply.eventUrl)
         log.info("Connecting to ${reply.cmdUrl}")
         cmdSocket = ctx.socket(SocketType.REQ)
@@ -87,7 +89,7 @@ class Tank {
     }
 
     def handleEvents() {
-        def bytes = eventSocket.recv(ZMQ.NOBLOCK)
+        def bytes = recvEvent()
         while (bytes != null) {
             Event event = deserialize(bytes, Event.&parseFrom)
             switch (event.getEventCase()) {
@@ -108,8 +110,17 @@ class Tank {
                     return
             }
             log.info(event.toString())
-            bytes = eventSocket.recv(ZMQ.NOBLOCK)
+            bytes = recvEvent()
+        }
+    }
+
+    // Events are published with a topic frame first, so the payload is the last frame of the message
+    private byte[] recvEvent() {
+        def bytes = eventSocket.recv(ZMQ.NOBLOCK)
+        while (bytes != null && eventSocket.hasReceiveMore()) {
+            bytes = eventSocket.recv()
         }
+        return bytes
     }
 
     def runSingle() {
@@ -123,7 +134,7 @@ class Tank {
         def nextCmdType = CommandType.forNumber(values[this.RANDOM.nextInt(values.size())].number)
         def nextCmdName = nextCmdType.name()
         log.info("Next cmd is $nextCmdName")
-        def nextCmd = Command.newBuilder().setType(nextCmdType)
+        def nextCmd = Command.newBuilder().setType(nextCmdType).setPeerId(peerId)
         switch (nextCmdType) {
             case CommandType.MOVE:
                 nextCmd.setValue(this.RANDOM.nextInt(gameInfo.arena.height) as short)
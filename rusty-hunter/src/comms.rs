@@ -14,6 +14,7 @@ pub enum CommsError {
 pub struct Commander {
     pub cmd_socket: ReqSocket,
     pub event_socket: SubSocket,
+    peer_id: Option<String>,
 }
 
 impl Commander {
@@ -29,18 +30,23 @@ impl Commander {
             .connect(registration.event_url.as_str())
             .await
             .context("Failed to connect to event socket")?;
-        event_socket.subscribe("")
-            .await
-            .context("Failed to subscribe to event socket")?;
+        for topic in &registration.event_topics {
+            event_socket.subscribe(topic)
+                .await
+                .context("Failed to subscribe to event socket")?;
+        }
 
         let commander = Commander {
             cmd_socket,
             event_socket,
+            peer_id: registration.peer_id.clone(),
         };
         Ok(commander)
     }
 
-    pub async fn command(&mut self, command: Command) -> Result<()> {
+    pub async fn command(&mut self, mut command: Command) -> Result<()> {
+        // The server routes commands from all bots on one socket, by the peer_id given at registration
+        command.peer_id = self.peer_id.clone();
         debug!("Sending command {:?}", &command);
 
         self.cmd_socket
@@ -110,7 +116,8 @@ pub async fn register(server_url: &String) -> Result<RegistrationReply> {
 fn zmq_decode<T: prost::Message + Default>(zm: ZmqMessage) -> Result<T> {
     let vec = zm.into_vec();
     debug!("Received {} frames of bytes", vec.len());
-    let data = vec.get(0).context("No data in message")?.to_owned();
+    // Events are published with a topic frame first, so the payload is always the last frame
+    let data = vec.last().context("No data in message")?.to_owned();
     return T::decode(data).map_err(|e| anyhow!(e));
 }
 
@@ -0,0 +1,520 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import logging
+import math
+from collections import defaultdict
+from random import randint
+
+import numpy as np
+from euclid import Point2, Vector2
+
+from ibidem.codetanks.domain.messages_pb2 import GameData, Arena, Tank, Point, Bullet, BotStatus, Event, Death, \
+    MovementComplete, RotationComplete, AimingComplete, ShotFired, ScanComplete
+from ibidem.codetanks.server.commands import EPSILON
+from ibidem.codetanks.server.constants import MAX_HEALTH, TANK_SPEED, TANK_RADIUS, BULLET_SPEED, BULLET_RADIUS, \
+    BULLET_DAMAGE, ROTATION, CANNON_RELOAD
+from ibidem.codetanks.server.geometry import rotate, sector_hits, scan_radius, time_to_contact, time_to_boundary, \
+    time_to_stop
+
+LOG = logging.getLogger(__name__)
+
+
+class ArrayWorld(object):
+    """World engine keeping all entity state in NumPy arrays
+
+    Tanks and bullets are stored as a struct of arrays, and every tick is advanced in one batched step
+    for all entities, instead of calling a command object per vehicle. Protobuf messages are only built
+    when a snapshot is needed, either for `gamedata` or for an event.
+
+    Movement is simultaneous, and swept: the way every tank and bullet covers in a tick is checked as a
+    whole, so nothing passes through anything however long the tick is. A tank that runs into the edge
+    of the arena or another tank stops where contact is made, and completes its move.
+
+    Tanks can be put in separate arenas of the same size, sharing the arrays. Tanks and bullets only
+    meet, and are only seen by scans, within their own arena.
+    """
+    arena = Arena()
+
+    def __init__(self, world_width, world_height, debug):
+        LOG.debug("Creating array world %dx%d (debug: %r)", world_width, world_height, debug)
+        self.arena = Arena(width=world_width, height=world_height)
+        self._debug = debug
+        self.reset()
+
+    def reset(self):
+        """Remove all tanks and bullets, ready for a new match"""
+        self._events = defaultdict(list)
+        self._bot_ids = []
+        self._handles = []
+        self._tank_arena = np.zeros(0, dtype=np.int64)
+        self._tank_ids = np.zeros(0, dtype=np.int64)
+        self._tank_position = np.zeros((0, 2))
+        self._tank_direction = np.zeros((0, 2))
+        self._tank_turret = np.zeros((0, 2))
+        self._tank_health = np.zeros(0, dtype=np.int64)
+        self._tank_status = np.zeros(0, dtype=np.int64)
+        self._tank_speed = np.zeros(0)
+        # Distance left to move, angle left to turn, or reload time left, depending on status
+        self._tank_remaining = np.zeros(0)
+        # Signed angular speed when rotating or aiming
+        self._tank_spin = np.zeros(0)
+        # Exact end state of the current command: target position, direction or turret
+        self._tank_target = np.zeros((0, 2))
+        self._tank_fired = np.zeros(0, dtype=bool)
+        self._tank_scan = np.zeros(0)
+        self._bullet_count = 0
+        self._bullet_ids = np.zeros(0, dtype=np.int64)
+        self._bullet_position = np.zeros((0, 2))
+        self._bullet_direction = np.zeros((0, 2))
+        self._bullet_parent = np.zeros(0, dtype=np.int64)
+        self._bullet_remaining = np.zeros(0)
+        # The last snapshot, reused for as long as nothing in it has changed
+        self._gamedata = None
+
+    def add_tank(self, bot_id, tank_id, arena=0):
+        index = len(self._handles)
+        self._bot_ids.append(bot_id)
+        self._tank_arena = np.append(self._tank_arena, arena)
+        self._tank_ids = np.append(self._tank_ids, tank_id)
+        self._tank_position = np.vstack((self._tank_position, (-TANK_RADIUS, -TANK_RADIUS)))
+        self._tank_direction = np.vstack((self._tank_direction, self._select_random_direction()))
+        self._tank_turret = np.vstack((self._tank_turret, self._select_random_direction()))
+        self._tank_health = np.append(self._tank_health, MAX_HEALTH)
+        self._tank_status = np.append(self._tank_status, BotStatus.IDLE)
+        self._tank_speed = np.append(self._tank_speed, 0.0)
+        self._tank_remaining = np.append(self._tank_remaining, 0.0)
+        self._tank_spin = np.append(self._tank_spin, 0.0)
+        self._tank_target = np.vstack((self._tank_target, (0.0, 0.0)))
+        self._tank_fired = np.append(self._tank_fired, False)
+        self._tank_scan = np.append(self._tank_scan, 0.0)
+        self._set_valid_position(index)
+        handle = TankHandle(self, index)
+        self._gamedata = None
+        self._handles.append(handle)
+        return handle
+
+    @property
+    def gamedata(self):
+        """Snapshot of all tanks and bullets
+
+        The same snapshot is returned until something in the world changes, so it must not be modified.
+        """
+        if self._gamedata is None:
+            self._gamedata = GameData(bullets=self.bullets, tanks=self.tanks)
+        return self._gamedata
+
+    @property
+    def tanks(self):
+        return [self._tank_entity(i) for i in range(len(self._handles))]
+
+    @property
+    def bullets(self):
+        return [self._bullet_entity(i) for i in range(self._bullet_count)]
+
+    @property
+    def number_of_live_bots(self):
+        return int(np.count_nonzero(self._tank_status != BotStatus.DEAD))
+
+    def get_live_bots(self):
+        return [self._handles[i] for i in np.flatnonzero(self._tank_status != BotStatus.DEAD)]
+
+    def get_tank(self, tank_id):
+        return self._handles[int(np.flatnonzero(self._tank_ids == tank_id)[0])]
+
+    def get_tanks_with_status(self, status):
+        return [self._handles[i] for i in np.flatnonzero(self._tank_status == status)]
+
+    def get_events(self):
+        events = self._events
+        self._events = defaultdict(list)
+        return events
+
+    def add_event(self, tank_id, event):
+        self._events[tank_id].append(event)
+
+    ###################################
+    # Snapshots
+    ###################################
+
+    def _tank_entity(self, index):
+        position = self._tank_position[index]
+        direction = self._tank_direction[index]
+        turret = self._tank_turret[index]
+        return Tank(
+            id=int(self._tank_ids[index]),
+            bot_id=self._bot_ids[index],
+            position=Point(x=position[0], y=position[1]),
+            direction=Point(x=direction[0], y=direction[1]),
+            turret=Point(x=turret[0], y=turret[1]),
+            health=int(self._tank_health[index]),
+            status=int(self._tank_status[index])
+        )
+
+    def _bullet_entity(self, index):
+        position = self._bullet_position[index]
+        direction = self._bullet_direction[index]
+        return Bullet(
+            id=int(self._bullet_ids[index]),
+            position=Point(x=position[0], y=position[1]),
+            direction=Point(x=direction[0], y=direction[1])
+        )
+
+    def _complete(self, indices, event_factory):
+        for index in indices:
+            self._tank_status[index] = BotStatus.IDLE
+            self._tank_speed[index] = 0.0
+            self.add_event(int(self._tank_ids[index]), event_factory(self._tank_entity(index)))
+
+    ###################################
+    # Placement
+    ###################################
+
+    def _set_valid_position(self, index):
+        self._tank_position[index] = (randint(0, self.arena.width), randint(0, self.arena.height))
+        while self._is_blocked(index, self._tank_position[index]):
+            self._tank_position[index] = (randint(0, self.arena.width), randint(0, self.arena.height))
+
+    def _is_blocked(self, index, position):
+        if self._outside_arena(position[np.newaxis], TANK_RADIUS)[0]:
+            return True
+        others = (self._tank_status != BotStatus.DEAD) & (self._tank_arena == self._tank_arena[index])
+        others[index] = False
+        distance = np.hypot(*(self._tank_position[others] - position).T)
+        return bool(np.any(distance <= 2 * TANK_RADIUS))
+
+    def _outside_arena(self, positions, radius):
+        upper = np.array((self.arena.width, self.arena.height)) - radius
+        return np.any((positions < radius) | (positions > upper), axis=1)
+
+    def _select_random_direction(self):
+        x = randint(-1, 1)
+        y = randint(-1, 1)
+        while x == y == 0:
+            y = randint(-1, 1)
+        return np.array((x, y)) / math.hypot(x, y)
+
+    ###################################
+    # Commands
+    #
+    # Given one tank index and value, or arrays of them
+    ###################################
+
+    def move(self, index, distance):
+        self._tank_status[index] = BotStatus.MOVING
+        self._gamedata = None
+        self._tank_speed[index] = TANK_SPEED
+        self._tank_remaining[index] = distance
+        distance = np.expand_dims(distance, -1)
+        self._tank_target[index] = self._tank_position[index] + self._tank_direction[index] * distance
+
+    def rotate(self, index, theta):
+        self._start_turn(index, BotStatus.ROTATING, self._tank_direction, theta)
+
+    def aim(self, index, theta):
+        self._start_turn(index, BotStatus.AIMING, self._tank_turret, theta)
+
+    def _start_turn(self, index, status, vectors, theta):
+        theta = _wrap_angle(theta)
+        self._tank_status[index] = status
+        self._gamedata = None
+        self._tank_remaining[index] = np.abs(theta)
+        self._tank_spin[index] = np.where(theta < 0.0, -ROTATION, ROTATION)
+        self._tank_target[index] = rotate(vectors[index], theta)
+
+    def fire(self, index):
+        self._tank_status[index] = BotStatus.FIRING
+        self._gamedata = None
+        self._tank_remaining[index] = CANNON_RELOAD
+        self._tank_fired[index] = False
+
+    def scan(self, index, theta):
+        self._tank_status[index] = BotStatus.SCANNING
+        self._gamedata = None
+        self._tank_scan[index] = theta
+
+    ###################################
+    # Simulation
+    ###################################
+
+    def update(self, ticks):
+        resting = (self._tank_status == BotStatus.IDLE) | (self._tank_status == BotStatus.DEAD)
+        if self._bullet_count or not resting.all():
+            self._gamedata = None
+        origins = self._tank_position.copy()
+        self._update_movement(ticks)
+        self._update_turning(ticks, BotStatus.ROTATING, self._tank_direction, RotationComplete, "rotation_complete")
+        self._update_turning(ticks, BotStatus.AIMING, self._tank_turret, AimingComplete, "aiming_complete")
+        self._update_firing(ticks)
+        self._update_scanning()
+        self._update_bullets(ticks, origins)
+
+    def next_event(self):
+        """Ticks until the next command completes, and until the next contact
+
+        A contact is a moving tank or bullet reaching the edge of the arena, or another tank. Either is
+        None when nothing is pending.
+        """
+        return self.next_completion(), self._next_contact()
+
+    def next_completion(self):
+        """Ticks until the next command completes, or None when nothing is pending
+
+        Only tanks and bullets with a command to complete are moving, so this is None whenever next_event is.
+        """
+        status = self._tank_status
+        completions = [
+            self._tank_remaining[status == BotStatus.MOVING] / TANK_SPEED,
+            self._tank_remaining[(status == BotStatus.ROTATING) | (status == BotStatus.AIMING)] / ROTATION,
+            np.where(self._tank_fired, self._tank_remaining, 0.0)[status == BotStatus.FIRING],
+            np.zeros(np.count_nonzero(status == BotStatus.SCANNING)),
+            self._bullet_remaining[:self._bullet_count] / BULLET_SPEED,
+        ]
+        completion = np.concatenate(completions)
+        return float(completion.min()) if len(completion) else None
+
+    def _next_contact(self):
+        count = self._bullet_count
+        live = np.flatnonzero(self._tank_status != BotStatus.DEAD)
+        moving = np.flatnonzero(self._tank_status == BotStatus.MOVING)
+        tank_velocity = np.zeros_like(self._tank_position)
+        tank_velocity[moving] = self._tank_direction[moving] * self._tank_speed[moving, np.newaxis]
+        bullet_velocity = self._bullet_direction[:count] * BULLET_SPEED
+        times = [
+            time_to_boundary(self._tank_position[moving], tank_velocity[moving], TANK_RADIUS,
+                             self.arena.width, self.arena.height),
+            time_to_boundary(self._bullet_position[:count], bullet_velocity, BULLET_RADIUS,
+                             self.arena.width, self.arena.height),
+        ]
+        if len(moving) and len(live):
+            mover, other = (a.ravel() for a in np.meshgrid(moving, live, indexing="ij"))
+            pairs = (mover != other) & (self._tank_arena[mover] == self._tank_arena[other])
+            mover, other = mover[pairs], other[pairs]
+            times.append(time_to_contact(self._tank_position[mover] - self._tank_position[other],
+                                         tank_velocity[mover] - tank_velocity[other], 2 * TANK_RADIUS))
+        if count and len(live):
+            bullet, other = (a.ravel() for a in np.meshgrid(np.arange(count), live, indexing="ij"))
+            parent = self._bullet_parent[bullet]
+            pairs = (parent != other) & (self._tank_arena[parent] == self._tank_arena[other])
+            bullet, other = bullet[pairs], other[pairs]
+            times.append(time_to_contact(self._bullet_position[bullet] - self._tank_position[other],
+                                         bullet_velocity[bullet] - tank_velocity[other],
+                                         TANK_RADIUS + BULLET_RADIUS))
+        contact = np.concatenate(times)
+        if not len(contact) or np.isinf(contact.min()):
+            return None
+        return float(contact.min())
+
+    def _update_movement(self, ticks):
+        moving = np.flatnonzero(self._tank_status == BotStatus.MOVING)
+        if not len(moving):
+            return
+        step = np.minimum(self._tank_speed[moving] * ticks, self._tank_remaining[moving])
+        arrived = self._tank_remaining[moving] - step <= EPSILON
+        displacement = np.zeros_like(self._tank_position)
+        displacement[moving] = self._tank_direction[moving] * step[:, np.newaxis]
+        boundary = time_to_boundary(self._tank_position[moving], displacement[moving], TANK_RADIUS,
+                                    self.arena.width, self.arena.height)
+        fraction = np.zeros(len(self._handles))
+        fraction[moving] = np.minimum(boundary, 1.0)
+        walled = np.zeros(len(self._handles), dtype=bool)
+        walled[moving] = boundary <= 1.0
+        others = np.flatnonzero(self._tank_status != BotStatus.DEAD)
+        mover, other = (a.ravel() for a in np.meshgrid(moving, others, indexing="ij"))
+        pairs = (mover != other) & (self._tank_arena[mover] == self._tank_arena[other])
+        fraction, _ = time_to_stop(self._tank_position, displacement, fraction, walled, mover[pairs], other[pairs],
+                                   2 * TANK_RADIUS)
+        fraction = fraction[moving]
+        blocked = fraction < 1.0
+        self._tank_position[moving] += displacement[moving] * fraction[:, np.newaxis]
+        done = arrived & ~blocked
+        self._tank_position[moving[done]] = self._tank_target[moving[done]]
+        self._tank_remaining[moving] -= step * fraction
+        self._complete(moving[blocked | arrived], lambda you: Event(movement_complete=MovementComplete(you=you)))
+
+    def _update_turning(self, ticks, status, vectors, event_class, event_field):
+        turning = np.flatnonzero(self._tank_status == status)
+        if not len(turning):
+            return
+        step = np.minimum(ROTATION * ticks, self._tank_remaining[turning])
+        vectors[turning] = rotate(vectors[turning], np.copysign(step, self._tank_spin[turning]))
+        self._tank_remaining[turning] -= step
+        done = turning[self._tank_remaining[turning] <= EPSILON]
+        vectors[done] = self._tank_target[done]
+        self._complete(done, lambda you: Event(**{event_field: event_class(you=you)}))
+
+    def _update_firing(self, ticks):
+        firing = self._tank_status == BotStatus.FIRING
+        reloading = np.flatnonzero(firing & self._tank_fired)
+        self._tank_remaining[reloading] -= ticks
+        self._complete(reloading[self._tank_remaining[reloading] <= 0.0],
+                       lambda you: Event(shot_fired=ShotFired(you=you)))
+        shooting = np.flatnonzero(firing & ~self._tank_fired)
+        for index in shooting:
+            LOG.debug("Tank %d fired a shot", index)
+            self._add_bullet(index)
+        self._tank_fired[shooting] = True
+
+    def _update_scanning(self):
+        for index in np.flatnonzero(self._tank_status == BotStatus.SCANNING):
+            hits = [self._tank_entity(i) for i in self._scan(index, self._tank_scan[index])]
+            self._complete((index,), lambda you: Event(scan_complete=ScanComplete(tanks=hits, you=you)))
+
+    def _scan(self, index, theta):
+        radius = scan_radius(theta, self.arena.height)
+        hits = sector_hits(self._tank_position[index], self._tank_turret[index], theta, radius,
+                           self._tank_position, TANK_RADIUS)
+        return np.flatnonzero(hits & (self._tank_arena == self._tank_arena[index]))
+
+    def _add_bullet(self, parent):
+        if self._bullet_count == len(self._bullet_ids):
+            capacity = max(8, 2 * len(self._bullet_ids))
+            self._bullet_ids = np.resize(self._bullet_ids, capacity)
+            self._bullet_position = np.resize(self._bullet_position, (capacity, 2))
+            self._bullet_direction = np.resize(self._bullet_direction, (capacity, 2))
+            self._bullet_parent = np.resize(self._bullet_parent, capacity)
+            self._bullet_remaining = np.resize(self._bullet_remaining, capacity)
+        i = self._bullet_count
+        self._bullet_ids[i] = next(_bullet_generator)
+        self._bullet_position[i] = self._tank_position[parent]
+        self._bullet_direction[i] = self._tank_turret[parent] / np.hypot(*self._tank_turret[parent])
+        self._bullet_parent[i] = parent
+        self._bullet_remaining[i] = self.arena.width + self.arena.height
+        self._bullet_count += 1
+
+    def _update_bullets(self, ticks, origins):
+        """Move bullets, swept against the tanks moving from origins to where they are now"""
+        count = self._bullet_count
+        if not count:
+            return
+        step = np.minimum(BULLET_SPEED * ticks, self._bullet_remaining[:count])
+        displacement = self._bullet_direction[:count] * step[:, np.newaxis]
+        boundary = time_to_boundary(self._bullet_position[:count], displacement, BULLET_RADIUS,
+                                    self.arena.width, self.arena.height)
+        # Bullets can only hit tanks in the arena they were fired in
+        bullet_arena = self._tank_arena[self._bullet_parent[:count]]
+        bullet, tank = np.nonzero(bullet_arena[:, np.newaxis] == self._tank_arena[np.newaxis, :])
+        times = np.full((count, len(self._handles)), np.inf)
+        times[bullet, tank] = time_to_contact(self._bullet_position[bullet] - origins[tank],
+                                              displacement[bullet] - (self._tank_position[tank] - origins[tank]),
+                                              TANK_RADIUS + BULLET_RADIUS)
+        times[np.arange(count), self._bullet_parent[:count]] = np.inf
+        fraction = np.minimum(boundary, 1.0)
+        expired = (boundary <= 1.0) | (self._bullet_remaining[:count] - step <= 0.0)
+        for bullet in np.flatnonzero(np.any(times <= fraction[:, np.newaxis], axis=1)):
+            # Resolved in bullet order, since an earlier bullet may kill a tank this one would otherwise hit
+            live = self._tank_status != BotStatus.DEAD
+            candidates = np.flatnonzero(live & (times[bullet] <= fraction[bullet]))
+            if not len(candidates):
+                continue
+            victim = candidates[np.argmin(times[bullet, candidates])]
+            if times[bullet, victim] == boundary[bullet]:
+                continue
+            self._inflict(victim, BULLET_DAMAGE, self._bullet_parent[bullet])
+            fraction[bullet] = times[bullet, victim]
+            expired[bullet] = True
+        self._bullet_position[:count] += displacement * fraction[:, np.newaxis]
+        self._bullet_remaining[:count] -= step * fraction
+        keep = np.flatnonzero(~expired)
+        self._bullet_count = len(keep)
+        for array in (self._bullet_ids, self._bullet_position, self._bullet_direction, self._bullet_parent,
+                      self._bullet_remaining):
+            array[:len(keep)] = array[keep]
+
+    def _inflict(self, index, damage, perpetrator):
+        self._tank_health[index] -= damage
+        LOG.debug("Tank %d has received %d in damage from tank %d", index, damage, perpetrator)
+        if self._tank_health[index] <= 0:
+            self._tank_status[index] = BotStatus.DEAD
+            self._tank_speed[index] = 0.0
+            death = Death(victim=self._tank_entity(index), perpetrator=self._tank_entity(perpetrator))
+            self.add_event(int(self._tank_ids[index]), Event(death=death))
+
+
+class TankHandle(object):
+    """The face of a tank in an ArrayWorld, offering the same interface as an Armour"""
+    radius = TANK_RADIUS
+
+    def __init__(self, world, index):
+        self._world = world
+        self._index = index
+
+    @property
+    def entity(self):
+        return self._world._tank_entity(self._index)
+
+    @property
+    def tank_id(self):
+        return int(self._world._tank_ids[self._index])
+
+    @property
+    def status(self):
+        return int(self._world._tank_status[self._index])
+
+    @status.setter
+    def status(self, value):
+        self._world._tank_status[self._index] = value
+        self._world._gamedata = None
+
+    @property
+    def health(self):
+        return int(self._world._tank_health[self._index])
+
+    @property
+    def position(self):
+        return Point2(*self._world._tank_position[self._index])
+
+    @property
+    def direction(self):
+        return Vector2(*self._world._tank_direction[self._index])
+
+    @property
+    def turret(self):
+        return Vector2(*self._world._tank_turret[self._index])
+
+    def is_tank(self):
+        return True
+
+    ###################################
+    # Commands
+    ###################################
+
+    def move(self, distance):
+        if distance < 0.0:
+            return
+        self._world.move(self._index, distance)
+
+    def rotate(self, angle):
+        self._world.rotate(self._index, math.radians(angle))
+
+    def aim(self, angle):
+        self._world.aim(self._index, math.radians(angle))
+
+    def fire(self):
+        self._world.fire(self._index)
+
+    def scan(self, angle):
+        if angle > 90:
+            return
+        self._world.scan(self._index, math.radians(angle))
+
+    def __repr__(self):
+        keys = ("tank_id", "position", "direction", "turret", "status")
+        return "TankHandle(%s)" % ", ".join("%s=%r" % (key, getattr(self, key)) for key in keys)
+
+
+def _wrap_angle(theta):
+    return np.arctan2(np.sin(theta), np.cos(theta))
+
+
+def _id_generator():
+    i = 0
+    while True:
+        yield i
+        i += 1
+
+
+_bullet_generator = _id_generator()
+
+if __name__ == "__main__":
+    pass
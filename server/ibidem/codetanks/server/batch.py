@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import logging
+
+import numpy as np
+
+from ibidem.codetanks.domain.messages_pb2 import BotStatus, CommandType, Id
+
+from ibidem.codetanks.server.array_world import ArrayWorld
+from ibidem.codetanks.server.clock import FRAME_TIME
+from ibidem.codetanks.server.constants import PLAYER_COUNT, MAX_HEALTH
+
+LOG = logging.getLogger(__name__)
+
+# Marks a tank that is given no command in a step
+NO_COMMAND = -1
+# Columns of the observation for each tank
+OBSERVATION_FIELDS = ("x", "y", "direction_x", "direction_y", "turret_x", "turret_y", "health", "status")
+# Reward for the last tank standing
+WIN_REWARD = MAX_HEALTH
+
+
+class BatchWorld(ArrayWorld):
+    """An ArrayWorld with many arenas, where the only record of what happens is kept in the arrays
+
+    No events are created, so nothing is built as protobuf while stepping. Damage is summed per tank
+    instead, both dealt and taken, until it is collected.
+    """
+
+    def reset(self):
+        super(BatchWorld, self).reset()
+        self.damage_dealt = np.zeros(0)
+        self.damage_taken = np.zeros(0)
+
+    def add_tank(self, bot_id, tank_id, arena=0):
+        self.damage_dealt = np.append(self.damage_dealt, 0.0)
+        self.damage_taken = np.append(self.damage_taken, 0.0)
+        return super(BatchWorld, self).add_tank(bot_id, tank_id, arena)
+
+    def _complete(self, indices, event_factory):
+        self._tank_status[indices] = BotStatus.IDLE
+        self._tank_speed[indices] = 0.0
+
+    def _update_scanning(self):
+        self._complete(np.flatnonzero(self._tank_status == BotStatus.SCANNING), None)
+
+    def _inflict(self, index, damage, perpetrator):
+        self._tank_health[index] -= damage
+        self.damage_taken[index] += damage
+        self.damage_dealt[perpetrator] += damage
+        if self._tank_health[index] <= 0:
+            self._tank_status[index] = BotStatus.DEAD
+            self._tank_speed[index] = 0.0
+
+    @property
+    def tank_status(self):
+        return self._tank_status
+
+    def observe(self):
+        """OBSERVATION_FIELDS for every tank, one row per tank"""
+        columns = (self._tank_position, self._tank_direction, self._tank_turret,
+                   self._tank_health[:, np.newaxis], self._tank_status[:, np.newaxis])
+        return np.hstack(columns).astype(float)
+
+    def collect_damage(self):
+        """Damage dealt and taken per tank since the last time it was collected"""
+        dealt, taken = self.damage_dealt, self.damage_taken
+        self.damage_dealt = np.zeros_like(dealt)
+        self.damage_taken = np.zeros_like(taken)
+        return dealt, taken
+
+    def restart_arenas(self, arenas):
+        """Put the tanks in the given arenas back at full health in new random places, and remove their bullets"""
+        tanks = np.flatnonzero(np.isin(self._tank_arena, arenas))
+        # Dead tanks are never in the way, so the old places don't block the new ones
+        self._tank_status[tanks] = BotStatus.DEAD
+        for index in tanks:
+            self._tank_direction[index] = self._select_random_direction()
+            self._tank_turret[index] = self._select_random_direction()
+            self._set_valid_position(index)
+            self._tank_status[index] = BotStatus.IDLE
+        self._tank_health[tanks] = MAX_HEALTH
+        self._tank_speed[tanks] = 0.0
+        self._tank_remaining[tanks] = 0.0
+        self._tank_fired[tanks] = False
+        count = self._bullet_count
+        keep = np.flatnonzero(~np.isin(self._tank_arena[self._bullet_parent[:count]], arenas))
+        self._bullet_count = len(keep)
+        for array in (self._bullet_ids, self._bullet_position, self._bullet_direction, self._bullet_parent,
+                      self._bullet_remaining):
+            array[:len(keep)] = array[keep]
+        self._gamedata = None
+
+
+class BatchEnvironment(object):
+    """Many games played in lockstep, for training bots
+
+    There are worlds games of tanks_per_world tanks each, all kept in one BatchWorld, so every step
+    advances all of them at once. Commands for a step are given as a worlds x tanks_per_world array of
+    CommandType values, with NO_COMMAND for tanks that are given none, and an array of values of the
+    same shape. Like for bots over the network, commands are only accepted from idle tanks, moves must
+    not be backwards and scans can be at most 90 degrees wide.
+
+    Each step advances the games by step_ticks milliseconds, and returns the observations, rewards
+    and done flags as arrays with one row per game. A game is done when at most one tank is left, or
+    when it has run for max_time milliseconds. Games that are done are restarted right away, so the
+    observations returned for them are from the start of their next game.
+
+    The observation is OBSERVATION_FIELDS for every tank in the game. The reward is the damage a tank
+    dealt in the step less the damage it took, and WIN_REWARD to the winner when a game ends.
+    """
+
+    def __init__(self, worlds, tanks_per_world=PLAYER_COUNT, step_ticks=FRAME_TIME, max_time=None,
+                 world_width=500, world_height=500):
+        self.worlds = worlds
+        self.tanks_per_world = tanks_per_world
+        self._step_ticks = step_ticks
+        self._max_time = max_time
+        self._world = BatchWorld(world_width, world_height, False)
+        for arena in range(worlds):
+            for tank in range(tanks_per_world):
+                self._world.add_tank(Id(name="batch", version=1), arena * tanks_per_world + tank, arena)
+        self._game_time = np.zeros(worlds)
+
+    @property
+    def shape(self):
+        return self.worlds, self.tanks_per_world
+
+    @property
+    def game_time(self):
+        return self._game_time.copy()
+
+    def reset(self):
+        """Restart every game, and return the observations"""
+        self._restart(np.arange(self.worlds))
+        return self._observations()
+
+    def step(self, commands, values=None):
+        """Apply the commands, advance every game by one step, and return observations, rewards and done flags"""
+        commands = np.asarray(commands).reshape(-1)
+        if values is None:
+            values = np.zeros(len(commands))
+        values = np.asarray(values, dtype=float).reshape(-1)
+        self._apply(commands, values)
+        world = self._world
+        world.update(self._step_ticks)
+        self._game_time += self._step_ticks
+        dealt, taken = world.collect_damage()
+        rewards = (dealt - taken).reshape(self.shape)
+        live = (world.tank_status != BotStatus.DEAD).reshape(self.shape)
+        live_count = live.sum(axis=1)
+        done = live_count <= 1
+        rewards[live & (live_count == 1)[:, np.newaxis]] += WIN_REWARD
+        if self._max_time is not None:
+            done |= self._game_time >= self._max_time
+        finished = np.flatnonzero(done)
+        if len(finished):
+            LOG.debug("Restarting %d finished games", len(finished))
+            self._restart(finished)
+        return self._observations(), rewards, done
+
+    def _restart(self, arenas):
+        self._world.restart_arenas(arenas)
+        self._world.collect_damage()
+        self._game_time[arenas] = 0
+
+    def _apply(self, commands, values):
+        world = self._world
+        idle = world.tank_status == BotStatus.IDLE
+        move = np.flatnonzero(idle & (commands == CommandType.MOVE) & (values >= 0.0))
+        world.move(move, values[move])
+        rotate = np.flatnonzero(idle & (commands == CommandType.ROTATE))
+        world.rotate(rotate, np.radians(values[rotate]))
+        aim = np.flatnonzero(idle & (commands == CommandType.AIM))
+        world.aim(aim, np.radians(values[aim]))
+        world.fire(np.flatnonzero(idle & (commands == CommandType.FIRE)))
+        scan = np.flatnonzero(idle & (commands == CommandType.SCAN) & (values <= 90))
+        world.scan(scan, np.radians(values[scan]))
+
+    def _observations(self):
+        return self._world.observe().reshape(self.worlds, self.tanks_per_world, len(OBSERVATION_FIELDS))
+
+
+if __name__ == "__main__":
+    pass
@@ -75,17 +75,20 @@ class CliBot(Cmd):
 
     def _init_sockets(self, reply, zmq_context):
         self._update_socket = zmq_context.socket(zmq.SUB)
-        self._update_socket.set(zmq.SUBSCRIBE, b"")
+        for topic in reply.event_topics:
+            self._update_socket.set(zmq.SUBSCRIBE, topic.encode())
         event_url = reply.event_url
         LOG.info("Subscribing to %s", event_url)
         self._update_socket.connect(event_url)
         self._cmd_socket = zmq_context.socket(zmq.REQ)
         self._cmd_socket.connect(reply.cmd_url)
+        self._peer_id = reply.peer_id
         LOG.info("Connecting to %s", reply.cmd_url)
 
     def _print_events(self):
         while self._update_socket.poll(10):
-            LOG.info(deserialize(Event, self._update_socket.recv()))
+            _topic, data = self._update_socket.recv_multipart()
+            LOG.info(deserialize(Event, data))
 
     def _print_result(self):
         reply = deserialize(CommandReply, self._cmd_socket.recv())
@@ -103,27 +106,27 @@ class CliBot(Cmd):
 
     @parse_args
     def do_move(self, distance=10):
-        self._cmd_socket.send(serialize(Command(type=CommandType.MOVE, value=distance)))
+        self._cmd_socket.send(serialize(Command(type=CommandType.MOVE, value=distance, peer_id=self._peer_id)))
         self._print_result()
 
     @parse_args
     def do_rotate(self, angle=10):
-        self._cmd_socket.send(serialize(Command(type=CommandType.ROTATE, value=angle)))
+        self._cmd_socket.send(serialize(Command(type=CommandType.ROTATE, value=angle, peer_id=self._peer_id)))
         self._print_result()
 
     @parse_args
     def do_aim(self, angle=10):
-        self._cmd_socket.send(serialize(Command(type=CommandType.AIM, value=angle)))
+        self._cmd_socket.send(serialize(Command(type=CommandType.AIM, value=angle, peer_id=self._peer_id)))
         self._print_result()
 
     @parse_args
     def do_fire(self):
-        self._cmd_socket.send(serialize(Command(type=CommandType.FIRE)))
+        self._cmd_socket.send(serialize(Command(type=CommandType.FIRE, peer_id=self._peer_id)))
         self._print_result()
 
     @parse_args
     def do_scan(self, angle=10):
-        self._cmd_socket.send(serialize(Command(type=CommandType.SCAN, value=angle)))
+        self._cmd_socket.send(serialize(Command(type=CommandType.SCAN, value=angle, peer_id=self._peer_id)))
         self._print_result()
 
 
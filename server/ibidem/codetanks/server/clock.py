@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import logging
+import math
+
+from ibidem.codetanks.server.commands import EPSILON
+
+LOG = logging.getLogger(__name__)
+
+FRAME_RATE = 60
+FRAME_TIME = 1000 // FRAME_RATE
+
+
+class RealTimeClock(object):
+    """Advance the game by the real milliseconds passed, at most FRAME_RATE times per second
+
+    The clock does not sleep between frames itself. The caller waits out time_to_next_tick, and can
+    do useful work, like handling commands, while waiting.
+    """
+
+    def __init__(self):
+        import pygame
+        pygame.init()
+        self._get_ticks = pygame.time.get_ticks
+        self._last_tick = self._get_ticks()
+
+    def start(self):
+        self._last_tick = self._get_ticks()
+
+    def time_to_next_tick(self):
+        """Milliseconds to wait before the next frame is due"""
+        return max(0, self._last_tick + FRAME_TIME - self._get_ticks())
+
+    def tick(self, limit=None):
+        now = self._get_ticks()
+        ticks = now - self._last_tick
+        self._last_tick = now
+        return ticks
+
+
+class FixedStepClock(object):
+    """Advance the game by a fixed number of simulated milliseconds, as fast as possible
+
+    Needs neither pygame nor a display, and never sleeps.
+    """
+
+    def __init__(self, step):
+        self._step = step
+
+    def start(self):
+        pass
+
+    def time_to_next_tick(self):
+        return 0
+
+    def tick(self, limit=None):
+        if limit is not None:
+            return min(self._step, limit)
+        return self._step
+
+
+class EventClock(object):
+    """Advance the game straight to the next thing that can happen in the world
+
+    The world is asked for the time until its next event: a command completing, a reload expiring,
+    a bullet hitting something or a tank running into another. Time is kept in whole milliseconds, like
+    the real time clock. Completions are rounded up, so the command finishes on that tick. Contacts are
+    approached to the millisecond before, and then stepped into one millisecond later, so a blocked
+    move stops where it would when running in real time.
+
+    When nothing is pending, no time passes until a bot issues a new command, unless the caller gives
+    a limit to wait for, and time_to_next_tick is None so the caller can wait for that command instead
+    of spinning. Like the fixed step clock, it never sleeps.
+    """
+
+    def __init__(self, world):
+        self._world = world
+
+    def start(self):
+        pass
+
+    def time_to_next_tick(self):
+        """0 when something is pending in the world, or None when the next tick must wait for a command
+
+        Only completions are looked for, so the contacts are only searched for once per tick, by tick.
+        """
+        if self._world.next_completion() is None:
+            return None
+        return 0
+
+    def tick(self, limit=None):
+        completion, contact = self._world.next_event()
+        candidates = []
+        if completion is not None:
+            candidates.append(math.ceil(completion - EPSILON))
+        if contact is not None:
+            candidates.append(math.ceil(contact) - 1)
+        if limit is not None:
+            candidates.append(limit)
+        if not candidates:
+            return 0
+        ticks = max(1, min(candidates))
+        LOG.debug("Advancing %d ticks to next event", ticks)
+        return ticks
+
+
+if __name__ == "__main__":
+    pass
@@ -2,9 +2,9 @@
 # -*- coding: utf-8
 
 import logging
-import operator
+import math
 
-from euclid import Ray2, Circle
+from euclid import Ray2
 
 from ibidem.codetanks.domain.messages_pb2 import BotStatus, MovementComplete, RotationComplete, AimingComplete, \
     ShotFired, ScanComplete, Event
@@ -12,9 +12,14 @@ from ibidem.codetanks.server.constants import ROTATION, CANNON_RELOAD
 
 LOG = logging.getLogger(__name__)
 
+# Progress this close to the end counts as done, so rounding in the sum of many small steps is not
+# left over as one more tick of work
+EPSILON = 1e-9
+
 
 class Idle(object):
     status = BotStatus.IDLE
+    velocity = (0.0, 0.0)
 
     def __init__(self, vehicle):
         self.vehicle = vehicle
@@ -24,25 +29,35 @@ class Idle(object):
         """Performs update and returns command and event"""
         return self, None
 
+    def remaining_ticks(self):
+        """Ticks until this command completes, or None if it never does by itself"""
+        return None
+
 
 class Dead(Idle):
     status = BotStatus.DEAD
 
 
 class Move(Idle):
+    """Move along the current direction
+
+    The distance left is known up front, so each update only advances a scalar, and the position
+    is always computed from the starting point. The move completes exactly at the target.
+
+    The whole way covered in an update is checked for obstacles, so nothing is passed through however
+    long the update is. A move that runs into something stops where contact is made.
+    """
     status = BotStatus.MOVING
 
     def __init__(self, vehicle, speed, distance):
         super(Move, self).__init__(vehicle)
         self.speed = speed
-        LOG.debug("Starting move of %r", vehicle)
-        target_position = vehicle.calculate_new_position(distance)
-        LOG.debug("Calculated target_position: %r", target_position)
-        self.target_ray = Ray2(target_position, vehicle.direction)
-        LOG.debug("Moving to %r", self.target_ray)
-
-    def _reached_target_position(self, position):
-        return self.target_ray.intersect(Circle(position, 1.0))
+        self.distance = distance
+        self.travelled = 0.0
+        self._start_x, self._start_y = vehicle.location
+        self._dx, self._dy = vehicle.heading_vector
+        self.velocity = (self._dx * speed, self._dy * speed)
+        LOG.debug("Starting move of %r, %r units along (%r, %r)", vehicle, distance, self._dx, self._dy)
 
     def _completion(self):
         if self.vehicle.is_tank():
@@ -50,67 +65,62 @@ class Move(Idle):
         else:
             return Idle(self.vehicle), None
 
+    def _place(self, travelled):
+        self.vehicle.place(self._start_x + self._dx * travelled, self._start_y + self._dy * travelled)
+
     def update(self, ticks):
-        distance = ticks * self.speed
-        LOG.debug("Attempting to move %r", distance)
-        old_pos = self.vehicle.position
-        new_pos = self.vehicle.calculate_new_position(distance)
-        LOG.debug("New position: %r", new_pos)
-        self.vehicle.position = new_pos
-        if self.vehicle.is_collision():
-            LOG.debug("Aborting move, new position is invalid")
-            self.vehicle.position = old_pos
+        travelled = self.travelled + ticks * self.speed
+        if travelled >= self.distance - EPSILON:
+            travelled = self.distance
+        LOG.debug("Attempting to move to %r of %r", travelled, self.distance)
+        obstacle, fraction = self.vehicle.sweep(self._start_x + self._dx * travelled,
+                                                self._start_y + self._dy * travelled)
+        if obstacle:
+            LOG.debug("Stopping move at contact with %r", obstacle)
+            self._place(self.travelled + (travelled - self.travelled) * fraction)
             return self._completion()
-        elif self._reached_target_position(new_pos):
-            LOG.debug("Reached target %r", self.target_ray)
-            self.vehicle.position = self.target_ray.p
+        self._place(travelled)
+        self.travelled = travelled
+        if travelled >= self.distance:
+            LOG.debug("Reached target after %r", travelled)
             return self._completion()
         return self, None
 
+    def remaining_ticks(self):
+        return (self.distance - self.travelled) / self.speed
+
 
 class RotateAndAim(Idle):
+    """Turn towards a heading, the shortest way around
+
+    The angle to turn is known up front, so each update only advances a scalar, and the heading
+    is always computed from the starting heading. The turn completes exactly at the target.
+    """
+
     def __init__(self, vehicle, theta):
         super(RotateAndAim, self).__init__(vehicle)
-        self.target = self._calculate(theta)
-        self._set_rotation()
-        self._set_operation()
-        current = self._get_current()
-        LOG.debug("Starting to %r by %r from %r towards %r (current angle %r) until angle is %r 0.0",
-                  self.__class__.__name__,
-                  self.rotation,
-                  current,
-                  self.target,
-                  self.target.angle_oriented(current),
-                  self.operation)
-
-    def _set_rotation(self):
-        self.rotation = -ROTATION if self._get_current().angle_oriented(self.target) < 0 else ROTATION
-
-    def _set_operation(self):
-        self.operation = operator.gt if self.rotation > 0.0 else operator.lt
-
-    def _reached_target(self, direction):
-        angle = self.target.angle_oriented(direction)
-        LOG.debug("Angle between %r and %r is %r", self.target, direction, angle)
-        return self.operation(angle, 0.0)
+        theta = math.remainder(theta, 2 * math.pi)
+        self.start = self._get_current()
+        self.angle = abs(theta)
+        self.rotation = -ROTATION if theta < 0 else ROTATION
+        self.turned = 0.0
+        LOG.debug("Starting to %r by %r from %r, turning %r", self.__class__.__name__, self.rotation, self.start,
+                  theta)
 
     def update(self, ticks):
-        should_end = False
-        theta = ticks * self.rotation
-        new = self._calculate(theta)
-        if self._reached_target(new):
-            LOG.debug("Reached target %r", self.target)
-            new = self.target
-            should_end = True
-        self._update_vehicle(new)
-        if should_end:
+        self.turned += ticks * ROTATION
+        if self.turned >= self.angle - EPSILON:
+            self.turned = self.angle
+        self._update_vehicle(self.start + math.copysign(self.turned, self.rotation))
+        if self.turned >= self.angle:
+            LOG.debug("Reached target after turning %r", self.turned)
             return Idle(self.vehicle), self._completion_event()
         return self, None
 
-    def _calculate(self, theta):
-        raise NotImplementedError("This command must be subclassed")
+    def remaining_ticks(self):
+        return (self.angle - self.turned) / ROTATION
 
-    def _update_vehicle(self, new):
+    def _update_vehicle(self, heading):
         raise NotImplementedError("This command must be subclassed")
 
     def _get_current(self):
@@ -123,14 +133,11 @@ class RotateAndAim(Idle):
 class Rotate(RotateAndAim):
     status = BotStatus.ROTATING
 
-    def _calculate(self, theta):
-        return self.vehicle.calculate_new_direction(theta)
-
-    def _update_vehicle(self, new):
-        self.vehicle.direction = new
+    def _update_vehicle(self, heading):
+        self.vehicle.heading = heading
 
     def _get_current(self):
-        return self.vehicle.direction
+        return self.vehicle.heading
 
     def _completion_event(self):
         return Event(rotation_complete=RotationComplete(you=self.vehicle.entity))
@@ -139,14 +146,11 @@ class Rotate(RotateAndAim):
 class Aim(RotateAndAim):
     status = BotStatus.AIMING
 
-    def _calculate(self, theta):
-        return self.vehicle.calculate_new_turret(theta)
-
-    def _update_vehicle(self, new):
-        self.vehicle.turret = new
+    def _update_vehicle(self, heading):
+        self.vehicle.turret_heading = heading
 
     def _get_current(self):
-        return self.vehicle.turret
+        return self.vehicle.turret_heading
 
     def _completion_event(self):
         return Event(aiming_complete=AimingComplete(you=self.vehicle.entity))
@@ -173,6 +177,9 @@ class Fire(Idle):
             return self, None
         return Idle(self.vehicle), Event(shot_fired=ShotFired(you=self.vehicle.entity))
 
+    def remaining_ticks(self):
+        return self._delay if self._fired else 0
+
 
 class Scan(Idle):
     status = BotStatus.SCANNING
@@ -186,3 +193,6 @@ class Scan(Idle):
         scan_ray = Ray2(self.vehicle.position, self.vehicle.turret)
         hits = self._world.scan(scan_ray, self._theta)
         return Idle(self.vehicle), Event(scan_complete=ScanComplete(tanks=hits, you=self.vehicle.entity))
+
+    def remaining_ticks(self):
+        return 0
@@ -9,16 +9,50 @@ class Mode(str, Enum):
     RELEASE = "Release"
 
 
+class Engine(str, Enum):
+    OBJECT = "Object"
+    ARRAY = "Array"
+
+
+class Transport(str, Enum):
+    TCP = "tcp"
+    IPC = "ipc"
+    INPROC = "inproc"
+
+
+class ClockMode(str, Enum):
+    REAL_TIME = "RealTime"
+    EVENT = "Event"
+    FIXED_STEP = "FixedStep"
+
+
 class Settings(BaseSettings):
     mode: Mode = Mode.RELEASE
+    engine: Engine = Engine.OBJECT
+    clock: ClockMode = ClockMode.REAL_TIME
+    clock_step: int = 16
+    keyframe_interval: int = 30
+    # Independent matches hosted by this process, sharing its ports
+    match_count: int = 1
+    # Start the next match with the same peers when one ends, instead of exiting
+    persistent: bool = False
+    # Events a peer can have waiting before more are dropped. Also the high-water mark on ZeroMQ event sockets.
+    event_queue_size: int = 1000
+    # Keep at most one GameData frame waiting per peer, skipping deltas until the next keyframe when behind
+    conflate_game_data: bool = True
+    # Seconds a peer can stay with a full event queue before it is disconnected
+    slow_consumer_timeout: float = 5.0
     log_level: str = logging.getLevelName(logging.INFO)
     advertise_address: str = "localhost"
+    # ipc and inproc endpoints are named by port, in ipc_dir or under the inproc:// name codetanks
+    transport: Transport = Transport.TCP
+    ipc_dir: str = "/tmp/codetanks"
     registration_port: int = 13337
     viewer_port: int = 13338
     grpc_port: int = 13339
 
-    event_port_range: tuple[int, int] = (1337, 1340)
-    cmd_port_range: tuple[int, int] = (2337, 2340)
+    event_port: int = 1337
+    cmd_port: int = 2337
 
     @property
     def debug(self):
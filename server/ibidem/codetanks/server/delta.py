@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import logging
+
+from ibidem.codetanks.domain.messages_pb2 import Event, GameDataDelta
+
+LOG = logging.getLogger(__name__)
+
+_TANK_FIELDS = ("bot_id", "position", "direction", "turret", "health", "status")
+
+
+class GameDataStream(object):
+    """Turn GameData snapshots into a stream of keyframes and deltas for viewers
+
+    Every frame is an Event with a sequence_id. A keyframe carries the full GameData, and a delta
+    carries only what changed since the frame before it. A keyframe is sent every keyframe_interval
+    ticks, and on the next tick after one is requested, so viewers that join late or miss a frame can
+    catch up. Between keyframes, nothing is sent for ticks where nothing changed.
+    """
+
+    def __init__(self, keyframe_interval):
+        self._keyframe_interval = keyframe_interval
+        self._ticks_since_keyframe = 0
+        self._keyframe_due = True
+        self._game_data = None
+        self._sequence_id = None
+        self._tanks = {}
+        self._bullets = {}
+
+    def request_keyframe(self):
+        self._keyframe_due = True
+
+    def next_frame(self, game_data, next_sequence_id):
+        """The event to send for the current tick, or None if there is nothing to send"""
+        self._ticks_since_keyframe += 1
+        if self._keyframe_due or self._ticks_since_keyframe >= self._keyframe_interval:
+            event = Event(game_data=game_data, sequence_id=next_sequence_id())
+            self._keyframe_due = False
+            self._ticks_since_keyframe = 0
+        elif game_data is self._game_data:
+            return None
+        else:
+            delta = self._build_delta(game_data)
+            event = Event(game_data_delta=delta, sequence_id=next_sequence_id())
+        self._remember(game_data, event.sequence_id)
+        return event
+
+    def _build_delta(self, game_data):
+        delta = GameDataDelta(base_sequence_id=self._sequence_id)
+        for tank in game_data.tanks:
+            previous = self._tanks.get(tank.id)
+            changes = {field: getattr(tank, field) for field in _TANK_FIELDS
+                       if previous is None or getattr(previous, field) != getattr(tank, field)}
+            if changes:
+                delta.tanks.add(id=tank.id, **changes)
+        bullet_ids = set()
+        for bullet in game_data.bullets:
+            bullet_ids.add(bullet.id)
+            if self._bullets.get(bullet.id) != bullet:
+                delta.bullets.append(bullet)
+        delta.removed_bullets.extend(bullet_id for bullet_id in self._bullets if bullet_id not in bullet_ids)
+        return delta
+
+    def _remember(self, game_data, sequence_id):
+        self._game_data = game_data
+        self._sequence_id = sequence_id
+        self._tanks = {tank.id: tank for tank in game_data.tanks}
+        self._bullets = {bullet.id: bullet for bullet in game_data.bullets}
+
+
+if __name__ == "__main__":
+    pass
@@ -1,39 +1,44 @@
 #!/usr/bin/env python
 # -*- coding: utf-8
+import asyncio
 import logging
-from datetime import datetime
 
-import pygame
-import time
 from ibidem.codetanks.domain.messages_pb2 import GameInfo, RegistrationReply, ClientType, RegistrationResult, Event, \
     GameStarted, GameOver
 
 from ibidem.codetanks.server.bot import Bot
+from ibidem.codetanks.server.delta import GameDataStream
 from ibidem.codetanks.server.constants import PLAYER_COUNT, MAX_HEALTH, BULLET_DAMAGE, TANK_SPEED, ROTATION, \
     BULLET_SPEED, TANK_RADIUS, BULLET_RADIUS, CANNON_RELOAD
-from ibidem.codetanks.server.peer import Peer
+from ibidem.codetanks.server.peer import Peer, EncodedEvent
 
 LOG = logging.getLogger(__name__)
 
 
 class GameServer(object):
     def __init__(self,
-                 zeromq_server,
                  world,
-                 victory_delay):
-        self._zeromq_server = zeromq_server
+                 victory_delay,
+                 clock,
+                 keyframe_interval):
         self._world = world
-        pygame.init()
-        self.clock = None
+        self.clock = clock
+        self._started = False
+        self._game_time = 0
         self._bots = []
         self._viewers = []
         self._victory_delay = victory_delay
         self._event_sequence_id = 1
+        self._game_data_stream = GameDataStream(keyframe_interval)
+        self._loop = None
+        self._roster_changed = None
+        self._commands_arrived = None
 
     def _send_viewer_event(self, event: Event):
+        encoded = EncodedEvent(event)
         for viewer in self._viewers:
             assert isinstance(viewer, Peer)
-            viewer.handle_event(event)
+            viewer.handle_event(encoded)
 
     def next_sequence_id(self):
         self._event_sequence_id += 1
@@ -45,12 +50,17 @@ class GameServer(object):
         self._send_viewer_event(Event(game_started=GameStarted(game_info=game_info), sequence_id=sequence_id))
         for peer, bot in self._bots:
             event = Event(game_started=GameStarted(game_info=game_info, you=bot.tank.entity), sequence_id=sequence_id)
-            peer.handle_event(event)
-        self.clock = pygame.time.Clock()
+            peer.handle_event(EncodedEvent(event))
+        self.clock.start()
+        self._started = True
         LOG.info("Game started!")
 
     def started(self):
-        return self.clock is not None
+        return self._started
+
+    @property
+    def game_time(self):
+        return self._game_time
 
     def game_full(self):
         return len(self._bots) == PLAYER_COUNT
@@ -59,26 +69,86 @@ class GameServer(object):
         live_count = self._world.number_of_live_bots
         return len(self._bots) > 1 >= live_count
 
-    def run(self):
+    async def play_match(self):
+        """Play one match on the running asyncio event loop, with peers handed in by whoever serves them"""
+        self._loop = asyncio.get_running_loop()
+        self._roster_changed = asyncio.Event()
+        self._commands_arrived = asyncio.Event()
         LOG.info("GameServer starting")
         while not self.game_full():
-            self._run_once()
+            await self._roster_changed.wait()
+            self._roster_changed.clear()
+            self._tick()
         LOG.info("Players registered, preparing to start game")
-        time.sleep(0.1)
+        await asyncio.sleep(0.1)
         self.start()
-        while not self.finished():
-            self._run_once()
+        await self._play(self.finished)
+        celebrations_end = self._end_game()
+        await self._play(lambda: self._game_time >= celebrations_end, lambda: celebrations_end - self._game_time)
+
+    def _play(self, done, limit=lambda: None):
+        """Schedule ticks on the loop until done returns True, and return a future resolved at that point
+
+        When the clock has no tick due, and there is no limit to wait for, the next tick waits for commands.
+        """
+        loop = self._loop
+        finished = loop.create_future()
+
+        def schedule():
+            delay = self.clock.time_to_next_tick()
+            if delay is None and limit() is None:
+                self._commands_arrived.clear()
+                waiting = loop.create_task(self._commands_arrived.wait())
+                waiting.add_done_callback(lambda task: task.cancelled() or tick())
+            else:
+                loop.call_at(loop.time() + (delay or 0) / 1000, tick)
+
+        def tick():
+            try:
+                self.handle_commands()
+                self._tick(limit())
+                if done():
+                    finished.set_result(None)
+                else:
+                    schedule()
+            except Exception as e:
+                finished.set_exception(e)
+
+        if done():
+            finished.set_result(None)
+        else:
+            schedule()
+        return finished
+
+    def reset(self):
+        """Clear the world after a match, and put the same bots in again, ready for the next one
+
+        Peers stay connected. Bots get new tanks, and learn about them from the next GameStarted.
+        """
+        LOG.info("Resetting for the next match")
+        self._world.reset()
+        peers = [peer for peer, _ in self._bots]
+        self._bots = []
+        for peer in peers:
+            self._register_bot(peer)
+        self._started = False
+        self._game_data_stream.request_keyframe()
+
+    def _end_game(self):
+        """Announce the winner, if there is one left, and return the game time when victory celebrations end"""
         LOG.info("Game finished, allowing %d seconds for victory celebrations", self._victory_delay.seconds)
-        start = datetime.now()
-        winner = self._world.get_live_bots()[-1]
-        game_over = Event(game_over=GameOver(winner=winner.entity), sequence_id=self.next_sequence_id())
+        survivors = self._world.get_live_bots()
+        winner = survivors[0].entity if len(survivors) == 1 else None
+        game_over = EncodedEvent(Event(game_over=GameOver(winner=winner), sequence_id=self.next_sequence_id()),
+                                 broadcast=True)
         for peer, bot in self._bots:
             peer.handle_event(game_over)
-        self._send_viewer_event(game_over)
-        while (datetime.now() - start) < self._victory_delay:
-            self._run_once()
+        for viewer in self._viewers:
+            viewer.handle_event(game_over)
+        return self._game_time + self._victory_delay.total_seconds() * 1000
 
-    def _run_once(self):
+    def handle_commands(self):
+        """Handle the commands waiting from bots, and reply to them"""
         received_commands = 0
         for peer, bot in self._bots:
             cmd = peer.next_command()
@@ -88,29 +158,53 @@ class GameServer(object):
                 received_commands += 1
         if received_commands > 0:
             LOG.debug("GameServer processed %d commands", received_commands)
+            if self._commands_arrived is not None:
+                self._commands_arrived.set()
+
+    def step(self, limit=None):
+        """Handle the waiting commands, and advance the game by one tick of the clock right away
+
+        Nothing waits for the tick to be due, and the transports are not polled, so this is for callers
+        that drive the game themselves, with every peer in the process.
+        """
+        self.handle_commands()
+        self._tick(limit)
+
+    def _tick(self, limit=None):
         if self.started():
-            ticks = self.clock.tick(60)
+            ticks = self.clock.tick(limit)
+            self._game_time += ticks
             self._world.update(ticks)
-        self._send_viewer_event(Event(game_data=self._world.gamedata))
+        if self._viewers:
+            frame = self._game_data_stream.next_frame(self._world.gamedata, self.next_sequence_id)
+            if frame is not None:
+                self._send_viewer_event(frame)
+                if any(viewer.wants_keyframe() for viewer in self._viewers):
+                    self._game_data_stream.request_keyframe()
         for tank_id, events in self._world.get_events().items():
             bots = self._bots if tank_id is None else (self._bots[tank_id],)
             for event in events:
                 assert isinstance(event, Event), "%r is not an instance of Event" % event
                 event.sequence_id = self.next_sequence_id()
+                encoded = EncodedEvent(event, broadcast=tank_id is None)
                 for peer, _ in bots:
-                    peer.handle_event(event)
-        self._zeromq_server.register_waiting(self.add_peer)
+                    peer.handle_event(encoded)
 
     def add_peer(self, peer: Peer) -> RegistrationReply:
         LOG.info("GameServer received peer: %r", peer)
         if peer.client_type == ClientType.BOT:
-            return self._register_bot(peer)
+            reply = self._register_bot(peer)
         else:
-            self._viewers.append(peer)
-            return RegistrationReply(
+            if peer not in self._viewers:
+                self._viewers.append(peer)
+            self._game_data_stream.request_keyframe()
+            reply = RegistrationReply(
                 result=RegistrationResult.SUCCESS,
                 game_info=self.build_game_info(),
             )
+        if self._roster_changed is not None and reply.result == RegistrationResult.SUCCESS:
+            self._roster_changed.set()
+        return reply
 
     def _register_bot(self, peer: Peer):
         if self.game_full():
@@ -130,18 +224,22 @@ class GameServer(object):
         )
 
     def build_game_info(self):
-        return GameInfo(
-            arena=self._world.arena,
-            max_health=MAX_HEALTH,
-            bullet_damage=BULLET_DAMAGE,
-            player_count=PLAYER_COUNT,
-            tank_speed=TANK_SPEED,
-            rotation=ROTATION,
-            bullet_speed=BULLET_SPEED,
-            tank_radius=TANK_RADIUS,
-            bullet_radius=BULLET_RADIUS,
-            cannon_reload=CANNON_RELOAD,
-        )
+        return build_game_info(self._world.arena)
+
+
+def build_game_info(arena):
+    return GameInfo(
+        arena=arena,
+        max_health=MAX_HEALTH,
+        bullet_damage=BULLET_DAMAGE,
+        player_count=PLAYER_COUNT,
+        tank_speed=TANK_SPEED,
+        rotation=ROTATION,
+        bullet_speed=BULLET_SPEED,
+        tank_radius=TANK_RADIUS,
+        bullet_radius=BULLET_RADIUS,
+        cannon_reload=CANNON_RELOAD,
+    )
 
 
 if __name__ == "__main__":
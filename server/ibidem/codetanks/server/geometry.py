@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import math
+
+import numpy as np
+
+
+def scan_radius(theta, arena_height):
+    """The reach of a scan, which shrinks as the scan gets wider"""
+    return max(math.pi - theta, 0.0) * (arena_height * 0.318)
+
+
+def rotate(vectors, theta):
+    """Rotate an array of 2D vectors counter-clockwise by the matching angles in theta"""
+    cos = np.cos(theta)
+    sin = np.sin(theta)
+    x = vectors[..., 0]
+    y = vectors[..., 1]
+    return np.stack((x * cos - y * sin, x * sin + y * cos), axis=-1)
+
+
+def sector_hits(origin, direction, theta, radius, positions, target_radius):
+    """Find the circles at positions that are caught by a scan
+
+    The sector is centered on direction, spans theta radians and reaches radius from origin.
+    A circle is caught when its center is within reach, and either touches the line through
+    one of the edges of the sector, or has its center inside the sector. Circles centered
+    exactly at origin are never caught.
+
+    Returns a boolean array with one element per position.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    direction = np.asarray(direction, dtype=float)
+    center = direction / np.hypot(*direction)
+    offsets = positions - np.asarray(origin, dtype=float)
+    distance = np.hypot(offsets[:, 0], offsets[:, 1])
+    bounds = theta / 2.
+    sides = rotate(np.vstack((center, center)), np.array((bounds, -bounds)))
+    side_distance = np.abs(offsets[:, np.newaxis, 0] * sides[:, 1] - offsets[:, np.newaxis, 1] * sides[:, 0])
+    touches_side = np.any(side_distance <= target_radius, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosine = np.clip((offsets @ center) / distance, -1.0, 1.0)
+    inside_angle = np.arccos(cosine) <= bounds
+    return (distance > 0.0) & (distance <= radius) & (touches_side | inside_angle)
+
+
+def time_to_contact(offsets, velocities, reach):
+    """Time until pairs of circles first come within reach of each other
+
+    Each pair is given as the offset between the centers, and the velocity of the first relative to
+    the second. Pairs that already touch or overlap and keep closing in are in contact right away.
+    Pairs that move apart, or that pass each other by, are never in contact, and get infinity.
+    """
+    offsets = np.asarray(offsets, dtype=float).reshape(-1, 2)
+    velocities = np.asarray(velocities, dtype=float).reshape(-1, 2)
+    a = np.einsum("ij,ij->i", velocities, velocities)
+    b = 2.0 * np.einsum("ij,ij->i", offsets, velocities)
+    c = np.einsum("ij,ij->i", offsets, offsets) - reach * reach
+    discriminant = b * b - 4.0 * a * c
+    approaching = (b < 0.0) & (discriminant >= 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        times = np.maximum((-b - np.sqrt(discriminant)) / (2.0 * a), 0.0)
+    return np.where(approaching, np.where(c > 0.0, times, 0.0), np.inf)
+
+
+def time_to_stop(positions, displacements, fractions, blocked, first, second, reach):
+    """How far circles moving at the same time get before they run into each other
+
+    Each circle moves in a straight line over its displacement, and stops at the given fraction of it,
+    or where it comes within reach of another circle, whichever is first. A circle that has stopped stays
+    put while the others move on. Blocked circles already have an obstacle at their fraction, which wins
+    a tie with a circle run into at the same time. Only the pairs given by the indices in first and second
+    can meet, so circles that both move must be given both ways round.
+
+    Contacts are settled earliest first, since a circle stopping early may let others go further.
+
+    Returns the fractions covered, and the index of the circle each ran into, or -1 for none.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    displacements = np.asarray(displacements, dtype=float).reshape(-1, 2)
+    fractions = np.array(fractions, dtype=float)
+    blocked = np.array(blocked, dtype=bool)
+    first = np.asarray(first, dtype=np.int64)
+    second = np.asarray(second, dtype=np.int64)
+    count = len(fractions)
+    hits = np.full(count, -1)
+    settled = np.zeros(count, dtype=bool)
+    while True:
+        pairs = np.flatnonzero(~settled[first])
+        if not len(pairs):
+            break
+        mover, other = first[pairs], second[pairs]
+        offsets = positions[mover] - positions[other]
+        times = time_to_contact(offsets, displacements[mover] - displacements[other], reach)
+        # Past the time the other circle stops, only the mover closes in
+        stop = fractions[other]
+        stopped_offsets = offsets + (displacements[mover] - displacements[other]) * stop[:, np.newaxis]
+        later = stop + time_to_contact(stopped_offsets, displacements[mover], reach)
+        times = np.where(times > stop, later, times)
+        limit = fractions[mover]
+        valid = (times < limit) | (~blocked[mover] & (times <= limit))
+        if not valid.any():
+            break
+        earliest = times[valid].min()
+        chosen = valid & (times == earliest)
+        nearest = np.full(count, count)
+        np.minimum.at(nearest, mover[chosen], other[chosen])
+        stopped = np.unique(mover[chosen])
+        hits[stopped] = nearest[stopped]
+        fractions[stopped] = earliest
+        blocked[stopped] = True
+        settled[stopped] = True
+    return fractions, hits
+
+
+def time_to_boundary(positions, velocities, radius, width, height):
+    """Time until circles moving in a straight line touch the edge of the arena
+
+    The radius is either shared, or given per circle. Circles standing still get infinity.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+    velocities = np.asarray(velocities, dtype=float).reshape(-1, 2)
+    radius = np.asarray(radius, dtype=float).reshape(-1, 1)
+    upper = np.array((width, height), dtype=float) - radius
+    with np.errstate(invalid="ignore", divide="ignore"):
+        times = np.where(velocities > 0.0, (upper - positions) / velocities,
+                         np.where(velocities < 0.0, (radius - positions) / velocities, np.inf))
+    return np.maximum(times.min(axis=1), 0.0)
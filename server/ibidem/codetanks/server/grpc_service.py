@@ -1,60 +1,113 @@
+import asyncio
 import logging
-import threading
 import uuid
-from concurrent import futures
-from queue import Queue, Empty
-from typing import Generator, Optional
+from typing import AsyncIterator, Optional
 
 import grpc
 
 from ibidem.codetanks.domain import messages_pb2_grpc, messages_pb2
 from ibidem.codetanks.server import peer
-from ibidem.codetanks.server.config import settings
+from ibidem.codetanks.server.config import settings, Transport
 
 LOG = logging.getLogger(__name__)
 
 
 class GrpcPeer(peer.Peer):
+    """A peer connected over gRPC
+
+    Events wait in a bounded EventQueue, and the command queues are asyncio queues. All are used from
+    the event loop the game server runs on, so waiting for events or replies does not hold on to a thread.
+    The events are read by one stream at a time, either GetEvent or Play.
+    """
+
     def __init__(self, registration: messages_pb2.Registration):
         self.id = registration.id
         self.client_type = registration.client_type
-        self._event_queue = Queue()
-        self._command_queue = Queue(1)
-        self._command_reply_queue = Queue(1)
+        self.event_queue = peer.EventQueue(settings.event_queue_size, settings.conflate_game_data,
+                                           settings.slow_consumer_timeout)
+        self._events_waiting = asyncio.Event()
+        self._command_queue = asyncio.Queue(1)
+        self._command_reply_queue = asyncio.Queue(1)
+        self._streaming = False
+        self._playing = False
+        self._events_stopped = False
+
+    @property
+    def playing(self) -> bool:
+        return self._playing
+
+    def open_stream(self, play: bool) -> bool:
+        """Claim the events for a stream, unless another stream has them already
+
+        On a Play stream, command replies are sent in line with the events.
+        """
+        if self._streaming:
+            return False
+        self._streaming = True
+        self._playing = play
+        self._events_stopped = False
+        return True
+
+    def close_stream(self) -> None:
+        self._streaming = False
+        self._playing = False
+        self._events_stopped = False
+
+    def stop_events(self) -> None:
+        """End get_events for the stream reading them, even if it is waiting for the next event"""
+        self._events_stopped = True
+        self._events_waiting.set()
+
+    def handle_event(self, event: peer.EncodedEvent) -> None:
+        self._put_event(event)
 
-    def handle_event(self, event: messages_pb2.Event) -> None:
-        self._event_queue.put_nowait(event)
+    def _put_event(self, item) -> None:
+        self.event_queue.put(item)
+        self._events_waiting.set()
 
-    def get_events(self) -> Generator[messages_pb2.Event]:
-        while True:
-            yield self._event_queue.get()
+    async def get_events(self) -> AsyncIterator[peer.EncodedEvent]:
+        """The events for this peer as they come, until it is disconnected for falling behind, or stopped"""
+        while not self.event_queue.disconnected and not self._events_stopped:
+            item = self.event_queue.get()
+            if item is None:
+                self._events_waiting.clear()
+                await self._events_waiting.wait()
+            else:
+                yield item
 
     def queue_command(self, cmd: messages_pb2.Command) -> None:
         self._command_queue.put_nowait(cmd)
 
     def next_command(self) -> Optional[messages_pb2.Command]:
         try:
-            return self._command_queue.get(block=False)
-        except Empty:
+            return self._command_queue.get_nowait()
+        except asyncio.QueueEmpty:
             return None
 
     def command_reply(self, reply: messages_pb2.CommandReply) -> None:
-        self._command_reply_queue.put_nowait(reply)
+        if self._playing:
+            self._put_event(reply)
+        else:
+            self._command_reply_queue.put_nowait(reply)
 
-    def next_reply(self) -> messages_pb2.CommandReply:
-        return self._command_reply_queue.get()
+    async def next_reply(self) -> messages_pb2.CommandReply:
+        return await self._command_reply_queue.get()
+
+    def wants_keyframe(self) -> bool:
+        return self.event_queue.keyframe_wanted
 
 
 class CodeTanksServicer(messages_pb2_grpc.CodeTanksServicer):
-    def __init__(self, registration_handler):
+    def __init__(self, registration_handler, commands_received):
         self._registration_handler = registration_handler
+        self._commands_received = commands_received
         self._channels = {}
         self._peers = {}
 
-    def Register(
+    async def Register(
             self,
             request: messages_pb2.Registration,
-            context: grpc.ServicerContext
+            context: grpc.aio.ServicerContext
     ) -> messages_pb2.RegistrationReply:
         peer_id = uuid.uuid4()
         peer = GrpcPeer(request)
@@ -64,35 +117,156 @@ class CodeTanksServicer(messages_pb2_grpc.CodeTanksServicer):
         registration_reply: messages_pb2.RegistrationReply = self._registration_handler(peer)
         if registration_reply.result == messages_pb2.RegistrationResult.SUCCESS:
             registration_reply.peer_id = str(peer_id)
-            self._peers[peer_id] = peer
+            self._peers[str(peer_id)] = peer
         return registration_reply
 
-    def SendCommand(self, request: messages_pb2.Command, context: grpc.ServicerContext) -> messages_pb2.CommandReply:
-        peer_id = context.peer()
+    async def _find_peer(self, peer_id: str, context: grpc.aio.ServicerContext) -> GrpcPeer:
         if peer_id not in self._peers:
-            raise grpc.RpcError(grpc.StatusCode.FAILED_PRECONDITION, f"Peer {peer_id} not registered")
-        peer = self._peers[peer_id]
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, f"Peer {peer_id} not registered")
+        return self._peers[peer_id]
+
+    async def SendCommand(
+            self,
+            request: messages_pb2.Command,
+            context: grpc.aio.ServicerContext
+    ) -> messages_pb2.CommandReply:
+        peer = await self._find_peer(request.peer_id, context)
+        if peer.playing:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Commands go on the open Play stream")
         peer.queue_command(request)
-        return peer.next_reply()
+        self._commands_received()
+        return await peer.next_reply()
 
-    def GetEvent(
+    async def GetEvent(
             self,
-            _request: messages_pb2.EventRequest,
-            context: grpc.ServicerContext
-    ) -> Generator[messages_pb2.Event]:
-        peer_id = context.peer()
-        if peer_id not in self._peers:
-            raise grpc.RpcError(grpc.StatusCode.FAILED_PRECONDITION, f"Peer {peer_id} not registered")
-        peer = self._peers[peer_id]
-        yield from peer.get_events()
+            request: messages_pb2.EventRequest,
+            context: grpc.aio.ServicerContext
+    ) -> AsyncIterator[peer.EncodedEvent]:
+        peer = await self._find_peer(request.peer_id, context)
+        await self._open_stream(peer, False, context)
+        try:
+            async for event in peer.get_events():
+                yield event
+        finally:
+            peer.close_stream()
+        await _abort_disconnected(context)
+
+    async def Play(
+            self,
+            request_iterator: AsyncIterator[messages_pb2.Command],
+            context: grpc.aio.ServicerContext
+    ) -> AsyncIterator[peer.EncodedEvent | messages_pb2.CommandReply]:
+        commands = aiter(request_iterator)
+        first = await anext(commands, None)
+        if first is None:
+            return
+        peer = await self._find_peer(first.peer_id, context)
+        await self._open_stream(peer, True, context)
+        reading = asyncio.create_task(self._read_commands(peer, first, commands))
+        reading.add_done_callback(lambda task: _failure(task) and peer.stop_events())
+        try:
+            async for update in peer.get_events():
+                yield update
+        finally:
+            reading.cancel()
+            peer.close_stream()
+        failure = _failure(reading)
+        if failure is not None:
+            LOG.error("Failed handling commands from %r", peer, exc_info=failure)
+            await context.abort(grpc.StatusCode.INTERNAL, "Failed handling command: %r" % failure)
+        await _abort_disconnected(context)
+
+    @staticmethod
+    async def _open_stream(peer: GrpcPeer, play: bool, context: grpc.aio.ServicerContext):
+        if not peer.open_stream(play):
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Events are already streamed to this peer")
+
+    async def _read_commands(self, peer: GrpcPeer, first: messages_pb2.Command, commands):
+        peer.queue_command(first)
+        self._commands_received()
+        async for command in commands:
+            peer.queue_command(command)
+            self._commands_received()
+
+
+def _failure(task: asyncio.Task) -> Optional[BaseException]:
+    """The exception a finished task raised, or None if it is still running, was cancelled or succeeded"""
+    if not task.done() or task.cancelled():
+        return None
+    return task.exception()
+
+
+async def _abort_disconnected(context: grpc.aio.ServicerContext):
+    await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Disconnected for falling too far behind on events")
+
+
+def _encoded(event: peer.EncodedEvent) -> bytes:
+    return event.data
+
+
+# A PlayUpdate holding only an event is the event field tag, the length of the event and the event itself
+_PLAY_UPDATE_EVENT_TAG = bytes([2 << 3 | 2])
+
+
+def _varint(value: int) -> bytes:
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append(value & 0x7f | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _encoded_play_update(update: peer.EncodedEvent | messages_pb2.CommandReply) -> bytes:
+    if isinstance(update, peer.EncodedEvent):
+        data = update.data
+        return _PLAY_UPDATE_EVENT_TAG + _varint(len(data)) + data
+    return messages_pb2.PlayUpdate(command_reply=update).SerializeToString()
+
+
+def add_servicer_to_server(servicer: CodeTanksServicer, server) -> None:
+    """Register the servicer like the generated add_CodeTanksServicer_to_server
 
+    The difference is that GetEvent and Play stream EncodedEvents, which are sent using the bytes
+    already serialized for the other peers, instead of serializing the event once more per stream.
+    """
+    rpc_method_handlers = {
+        "Register": grpc.unary_unary_rpc_method_handler(
+            servicer.Register,
+            request_deserializer=messages_pb2.Registration.FromString,
+            response_serializer=messages_pb2.RegistrationReply.SerializeToString,
+        ),
+        "SendCommand": grpc.unary_unary_rpc_method_handler(
+            servicer.SendCommand,
+            request_deserializer=messages_pb2.Command.FromString,
+            response_serializer=messages_pb2.CommandReply.SerializeToString,
+        ),
+        "GetEvent": grpc.unary_stream_rpc_method_handler(
+            servicer.GetEvent,
+            request_deserializer=messages_pb2.EventRequest.FromString,
+            response_serializer=_encoded,
+        ),
+        "Play": grpc.stream_stream_rpc_method_handler(
+            servicer.Play,
+            request_deserializer=messages_pb2.Command.FromString,
+            response_serializer=_encoded_play_update,
+        ),
+    }
+    service_name = messages_pb2.DESCRIPTOR.services_by_name["CodeTanks"].full_name
+    generic_handler = grpc.method_handlers_generic_handler(service_name, rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers(service_name, rpc_method_handlers)
 
-def serve(game_server) -> None:
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    messages_pb2_grpc.add_CodeTanksServicer_to_server(CodeTanksServicer(game_server.add_peer), server)
-    serving_port = server.add_insecure_port(f"localhost:{settings.grpc_port}")
-    server.start()
-    grpc_thread = threading.Thread(target=server.wait_for_termination, daemon=True)
-    grpc_thread.start()
-    LOG.info("GRPC Server started on port %d", serving_port)
 
+async def serve(match_manager) -> grpc.aio.Server:
+    """Start serving gRPC on the running asyncio event loop, shared with the matches"""
+    server = grpc.aio.server()
+    add_servicer_to_server(CodeTanksServicer(match_manager.add_peer, match_manager.handle_commands), server)
+    if settings.transport == Transport.IPC:
+        address = f"unix:{settings.ipc_dir}/{settings.grpc_port}"
+    else:
+        address = f"localhost:{settings.grpc_port}"
+    server.add_insecure_port(address)
+    await server.start()
+    LOG.info("GRPC Server started on %s", address)
+    return server
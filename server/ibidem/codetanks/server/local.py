@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from ibidem.codetanks.domain import messages_pb2
+from ibidem.codetanks.domain.messages_pb2 import ClientType, Id
+
+from ibidem.codetanks.server.game_server import GameServer
+from ibidem.codetanks.server.peer import Peer, EncodedEvent
+
+"""Bots running in the same process as the GameServer, with no sockets and no serialization
+
+A bot is given the Event objects for its tank through direct calls, and returns the Command it wants
+to run next. The game is driven by the caller, one step at a time.
+"""
+
+LOG = logging.getLogger(__name__)
+
+
+class LocalBot(object):
+    """Base for bots running in the server process
+
+    Subclasses must be possible to create without arguments, so they can be named in a tournament.
+    """
+
+    def handle_event(self, event: messages_pb2.Event) -> Optional[messages_pb2.Command]:
+        """React to an event for this bot, and return the next command, or None to wait for the next event"""
+        return None
+
+    def handle_reply(self, reply: messages_pb2.CommandReply) -> None:
+        """The server's reply to the last command returned"""
+
+
+class LocalPeer(Peer):
+    """A bot in the server process, called directly by the GameServer
+
+    A command returned by the bot is handled on the next step. If the bot returns another command before
+    that, the new command replaces it.
+    """
+
+    def __init__(self, bot: LocalBot, name: str):
+        self.bot = bot
+        self.id = Id(name=name, version=1)
+        self.client_type = ClientType.BOT
+        self._command = None
+
+    def handle_event(self, event: EncodedEvent) -> None:
+        command = self.bot.handle_event(event.event)
+        if command is not None:
+            self._command = command
+
+    def next_command(self) -> Optional[messages_pb2.Command]:
+        cmd, self._command = self._command, None
+        return cmd
+
+    def command_reply(self, reply: messages_pb2.CommandReply):
+        self.bot.handle_reply(reply)
+
+    def __repr__(self):
+        return "LocalPeer(%r)" % self.bot
+
+
+class LocalGame(object):
+    """A game between bots in the server process, with the GameServer stepped directly by the caller"""
+
+    def __init__(self, world, clock, bots, names=None, keyframe_interval=30):
+        self.server = GameServer(world, timedelta(0), clock, keyframe_interval)
+        if names is None:
+            names = [type(bot).__name__ for bot in bots]
+        self.peers = [LocalPeer(bot, name) for bot, name in zip(bots, names)]
+        for peer in self.peers:
+            reply = self.server.add_peer(peer)
+            if reply.result != messages_pb2.RegistrationResult.SUCCESS:
+                raise ValueError("No room for %r in the game" % peer)
+
+    @property
+    def game_time(self):
+        return self.server.game_time
+
+    def start(self):
+        self.server.start()
+
+    def step(self, limit=None):
+        """Handle the commands from the bots, and advance the game by one tick of the clock"""
+        self.server.step(limit)
+
+    def finished(self):
+        return self.server.finished()
+
+    def run(self, max_time=None):
+        """Play until at most one tank is left, or max_time milliseconds of game time have passed
+
+        With the event clock, no time passes while every tank is idle, so give a max_time unless the bots
+        are sure to keep busy. Either way the bots are told the game is over, like in a networked match.
+        """
+        self.start()
+        while not self.finished():
+            if max_time is None:
+                self.step()
+            elif self.game_time < max_time:
+                self.step(max_time - self.game_time)
+            else:
+                break
+        self.server._end_game()
+
+
+if __name__ == "__main__":
+    pass
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8
 
+import asyncio
 import logging
 from datetime import timedelta
 
@@ -8,8 +9,11 @@ import pinject
 from ibidem.codetanks.domain.messages_pb2 import Registration
 
 from ibidem.codetanks.server import grpc_service
-from ibidem.codetanks.server.config import settings
+from ibidem.codetanks.server.array_world import ArrayWorld
+from ibidem.codetanks.server.clock import RealTimeClock, EventClock, FixedStepClock
+from ibidem.codetanks.server.config import settings, Engine, ClockMode
 from ibidem.codetanks.server.game_server import GameServer
+from ibidem.codetanks.server.match_manager import MatchManager
 from ibidem.codetanks.server.world import World
 from ibidem.codetanks.server.zeromq import Channel, ChannelType, ZeroMQServer
 
@@ -20,12 +24,22 @@ class ObjectGraph(pinject.BindingSpec):
         bind("world_height", to_instance=500)
         bind("registration_port", to_instance=settings.registration_port)
         bind("viewer_port", to_instance=settings.viewer_port)
-        bind("event_port_range", to_instance=settings.event_port_range)
-        bind("cmd_port_range", to_instance=settings.cmd_port_range)
+        bind("event_port", to_instance=settings.event_port)
+        bind("cmd_port", to_instance=settings.cmd_port)
         bind("debug", to_instance=settings.debug)
-        bind("world", to_class=World)
+        bind("world", to_class=ArrayWorld if settings.engine == Engine.ARRAY else World, in_scope=pinject.PROTOTYPE)
         bind("zeromq_server", to_class=ZeroMQServer)
         bind("victory_delay", to_instance=timedelta(seconds=30))
+        bind("keyframe_interval", to_instance=settings.keyframe_interval)
+        bind("match_count", to_instance=settings.match_count)
+        bind("persistent", to_instance=settings.persistent)
+
+    def provide_new_match(self, provide_world, victory_delay, keyframe_interval):
+        def new_match():
+            world = provide_world()
+            return GameServer(world, victory_delay, create_clock(world), keyframe_interval)
+
+        return new_match
 
     def provide_viewer_channel(self, viewer_port):
         return Channel(ChannelType.PUBLISH, viewer_port)
@@ -33,20 +47,19 @@ class ObjectGraph(pinject.BindingSpec):
     def provide_registration_channel(self, registration_port):
         return Channel(ChannelType.REPLY, registration_port, Registration)
 
-    def provide_channel_factory(self, event_port_range, cmd_port_range):
-        publish_ports = [i for i in range(event_port_range[0], event_port_range[1] + 1)]
-        reply_ports = [i for i in range(cmd_port_range[0], cmd_port_range[1] + 1)]
+    def provide_event_channel(self, event_port):
+        return Channel(ChannelType.PUBLISH, event_port)
+
+    def provide_cmd_channel(self, cmd_port):
+        return Channel(ChannelType.ROUTER, cmd_port)
 
-        def factory(channel_type):
-            if channel_type == ChannelType.PUBLISH:
-                port = publish_ports.pop(0)
-            elif channel_type == ChannelType.REPLY:
-                port = reply_ports.pop(0)
-            else:
-                raise ValueError("Invalid channel type")
-            return Channel(channel_type, port)
 
-        return factory
+def create_clock(world):
+    if settings.clock == ClockMode.EVENT:
+        return EventClock(world)
+    if settings.clock == ClockMode.FIXED_STEP:
+        return FixedStepClock(settings.clock_step)
+    return RealTimeClock()
 
 
 def main():
@@ -55,9 +68,16 @@ def main():
         loglevel = logging.DEBUG
     logging.basicConfig(level=loglevel)
     obj_graph = pinject.new_object_graph(modules=None, binding_specs=[ObjectGraph()])
-    game_server = obj_graph.provide(GameServer)
-    grpc_service.serve(game_server)
-    game_server.run()
+    match_manager = obj_graph.provide(MatchManager)
+    asyncio.run(serve(match_manager))
+
+
+async def serve(match_manager):
+    grpc_server = await grpc_service.serve(match_manager)
+    try:
+        await match_manager.run_async()
+    finally:
+        await grpc_server.stop(None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import asyncio
+import logging
+from contextlib import suppress
+
+from ibidem.codetanks.domain.messages_pb2 import ClientType, RegistrationReply, RegistrationResult
+
+from ibidem.codetanks.server.peer import Peer
+
+LOG = logging.getLogger(__name__)
+
+
+class MatchManager(object):
+    """Host several independent matches in one process
+
+    Every match has its own World, clock and GameServer, but they share the transports, and their ticks
+    are all scheduled on the same asyncio event loop. Bots are routed at registration, to the first
+    match that still has room, and only get the broadcasts of that match. Viewers watch the first match.
+
+    When persistent, every match is reset after the victory celebrations and played again, with the
+    same peers, for as long as the process runs.
+    """
+
+    def __init__(self, zeromq_server, new_match, match_count, persistent):
+        self._zeromq_server = zeromq_server
+        self._persistent = persistent
+        self._matches = [new_match() for _ in range(match_count)]
+
+    @property
+    def matches(self):
+        return tuple(self._matches)
+
+    def add_peer(self, peer: Peer) -> RegistrationReply:
+        if peer.client_type != ClientType.BOT:
+            return self._matches[0].add_peer(peer)
+        for index, match in enumerate(self._matches):
+            if not match.game_full():
+                LOG.info("Routing %r to match %d", peer, index)
+                peer.join_match(index)
+                return match.add_peer(peer)
+        LOG.info("All %d matches are full, refusing %r", len(self._matches), peer)
+        return RegistrationReply(
+            result=RegistrationResult.FAILURE,
+            game_info=self._matches[0].build_game_info()
+        )
+
+    def handle_commands(self):
+        """Handle the commands waiting from bots in all matches"""
+        for match in self._matches:
+            match.handle_commands()
+
+    async def run_async(self):
+        """Play all matches on the running asyncio event loop, and return when every one has ended"""
+        playing = asyncio.gather(*(self._play(match) for match in self._matches))
+        serving = asyncio.create_task(self._zeromq_server.serve(self.add_peer, self.handle_commands))
+        try:
+            await playing
+        finally:
+            playing.cancel()
+            serving.cancel()
+            with suppress(asyncio.CancelledError):
+                await serving
+
+    async def _play(self, match):
+        await match.play_match()
+        while self._persistent:
+            match.reset()
+            await match.play_match()
+
+
+if __name__ == "__main__":
+    pass
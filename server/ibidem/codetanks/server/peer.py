@@ -1,4 +1,7 @@
+import logging
+import time
 from abc import abstractmethod, ABC
+from collections import deque
 from typing import Optional
 
 from ibidem.codetanks.domain import messages_pb2
@@ -8,6 +11,115 @@ from ibidem.codetanks.domain import messages_pb2
 A peer is either a viewer, or a bot.
 """
 
+LOG = logging.getLogger(__name__)
+
+_FRAMES = ("game_data", "game_data_delta")
+
+
+class EncodedEvent(object):
+    """An event on its way to peers, serialized at most once however many peers it is sent to
+
+    A broadcast is an event that goes to all bots, which transports that can publish to everyone at
+    once only need to send once. The event must not be modified once it has been handed to a peer.
+    """
+    __slots__ = ("event", "broadcast", "_data")
+
+    def __init__(self, event: messages_pb2.Event, broadcast: bool = False):
+        self.event = event
+        self.broadcast = broadcast
+        self._data = None
+
+    @property
+    def data(self) -> bytes:
+        """The serialized event"""
+        if self._data is None:
+            self._data = self.event.SerializeToString()
+        return self._data
+
+    @property
+    def is_frame(self) -> bool:
+        """True if the event is a GameData keyframe or delta"""
+        return self.event.WhichOneof("event") in _FRAMES
+
+    @property
+    def is_keyframe(self) -> bool:
+        return self.event.WhichOneof("event") == "game_data"
+
+    def __repr__(self):
+        return "EncodedEvent(%r)" % self.event
+
+
+class EventQueue(object):
+    """The events waiting to be sent to one peer, bounded so a slow consumer can not use up the server
+
+    Frames are conflated, so at most one is waiting. Every delta builds on the frame before it, so only
+    a keyframe may replace a waiting frame. A delta arriving while a frame is waiting is dropped instead,
+    and so is every delta after it, until the next keyframe. Meanwhile keyframe_wanted is set, so the
+    server can send that keyframe right away. Other events, like command replies and gameplay events,
+    are kept until max_size are waiting. Beyond that they are dropped, and a peer staying full for more
+    than disconnect_after seconds is disconnected. The dropped and conflated counters tell how much a
+    peer has missed.
+    """
+
+    def __init__(self, max_size: int, conflate_frames: bool = True, disconnect_after: Optional[float] = None,
+                 clock=time.monotonic):
+        self._max_size = max_size
+        self._conflate_frames = conflate_frames
+        self._disconnect_after = disconnect_after
+        self._clock = clock
+        self._items = deque()
+        self._frame = None
+        self._full_since = None
+        self.dropped = 0
+        self.conflated = 0
+        self.keyframe_wanted = False
+        self.disconnected = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item) -> None:
+        if self.disconnected:
+            return
+        if self._conflate_frames and isinstance(item, EncodedEvent) and item.is_frame:
+            if item.is_keyframe:
+                self.keyframe_wanted = False
+            elif self._frame is not None or self.keyframe_wanted:
+                self.keyframe_wanted = True
+                self.conflated += 1
+                return
+            if self._frame is not None:
+                # By identity, as other items may compare equal to the frame
+                self._items = deque(waiting for waiting in self._items if waiting is not self._frame)
+                self.conflated += 1
+            self._frame = item
+            self._items.append(item)
+            return
+        if len(self._items) - (self._frame is not None) < self._max_size:
+            self._full_since = None
+            self._items.append(item)
+            return
+        self.dropped += 1
+        now = self._clock()
+        if self._full_since is None:
+            LOG.warning("Event queue full, dropping events until consumer catches up")
+            self._full_since = now
+        elif self._disconnect_after is not None and now - self._full_since > self._disconnect_after:
+            LOG.warning("Consumer behind for more than %.1f seconds, disconnecting. %d events dropped, %d conflated",
+                        self._disconnect_after, self.dropped, self.conflated)
+            self.disconnected = True
+            self._items.clear()
+            self._frame = None
+
+    def get(self):
+        """The next item, or None if nothing is waiting"""
+        if not self._items:
+            return None
+        item = self._items.popleft()
+        if item is self._frame:
+            self._frame = None
+        return item
+
 
 class Peer(ABC):
     """A description of a Peer for the GameServer and the interface it implements"""
@@ -17,8 +129,12 @@ class Peer(ABC):
     client_type: messages_pb2.ClientType
 
     @abstractmethod
-    def handle_event(self, event: messages_pb2.Event) -> None:
-        """Send the event on to the peer via appropriate transport"""
+    def handle_event(self, event: EncodedEvent) -> None:
+        """Send the event on to the peer via appropriate transport
+
+        The same EncodedEvent is given to every peer receiving it, so transports should send its
+        data rather than serializing the event again.
+        """
 
     @abstractmethod
     def next_command(self) -> Optional[messages_pb2.Command]:
@@ -27,3 +143,10 @@ class Peer(ABC):
     @abstractmethod
     def command_reply(self, reply: messages_pb2.CommandReply):
         """The servers reply to the last returned command"""
+
+    def join_match(self, match: int) -> None:
+        """Called with the number of the match the peer is routed to, before it is added to that match"""
+
+    def wants_keyframe(self) -> bool:
+        """True if the peer has missed a GameData delta, and can not catch up before the next keyframe"""
+        return False
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import logging
+import math
+import random
+
+from ibidem.codetanks.domain.messages_pb2 import Command, CommandType, BotStatus
+
+from ibidem.codetanks.server.local import LocalBot
+
+"""Simple bots running in the server process, for tournaments and testing"""
+
+LOG = logging.getLogger(__name__)
+
+
+class SittingDuck(LocalBot):
+    """Never does anything"""
+
+
+class Randomizer(LocalBot):
+    """Moves, turns, aims and fires at random, like the Groovy randomizer"""
+
+    def handle_event(self, event):
+        if event.WhichOneof("event") in ("game_over", "death"):
+            return None
+        choice = random.randrange(4)
+        if choice == 0:
+            return Command(type=CommandType.MOVE, value=random.randint(10, 100))
+        if choice == 1:
+            return Command(type=CommandType.ROTATE, value=random.randint(-180, 180))
+        if choice == 2:
+            return Command(type=CommandType.AIM, value=random.randint(-180, 180))
+        return Command(type=CommandType.FIRE)
+
+
+class Hunter(LocalBot):
+    """Sweeps the turret around scanning, and fires at the closest tank found
+
+    After a full sweep without finding anything, it turns and moves somewhere else.
+    """
+    SCAN_ANGLE = 30
+
+    def __init__(self):
+        self._on_target = False
+        self._misses = 0
+
+    def handle_event(self, event):
+        kind = event.WhichOneof("event")
+        if kind in ("game_over", "death"):
+            return None
+        if kind == "scan_complete":
+            return self._aim_at_closest(event.scan_complete)
+        if kind == "aiming_complete" and self._on_target:
+            self._on_target = False
+            return Command(type=CommandType.FIRE)
+        if kind == "rotation_complete":
+            return Command(type=CommandType.MOVE, value=100)
+        return Command(type=CommandType.SCAN, value=self.SCAN_ANGLE)
+
+    def _aim_at_closest(self, scan):
+        you = scan.you
+        others = [tank for tank in scan.tanks if tank.id != you.id and tank.status != BotStatus.DEAD]
+        if not others:
+            self._misses += 1
+            if self._misses * self.SCAN_ANGLE >= 360:
+                self._misses = 0
+                return Command(type=CommandType.ROTATE, value=45)
+            return Command(type=CommandType.AIM, value=self.SCAN_ANGLE)
+        self._misses = 0
+        target = min(others, key=lambda tank: math.hypot(tank.position.x - you.position.x,
+                                                         tank.position.y - you.position.y))
+        bearing = math.atan2(target.position.y - you.position.y, target.position.x - you.position.x)
+        turn = math.degrees(math.remainder(bearing - math.atan2(you.turret.y, you.turret.x), 2 * math.pi))
+        self._on_target = True
+        return Command(type=CommandType.AIM, value=round(turn))
+
+
+if __name__ == "__main__":
+    pass
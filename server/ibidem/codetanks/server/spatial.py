@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+from collections import defaultdict
+
+
+class SpatialHash(object):
+    """Uniform grid mapping cells to the items whose position falls inside them
+
+    Items are indexed by their center only, so a query must use a radius covering both the
+    querying vehicle and the largest item that can be indexed.
+    """
+
+    def __init__(self, cell_size):
+        self._cell_size = float(cell_size)
+        self._cells = defaultdict(set)
+        self._item_cells = {}
+
+    def _cell(self, x, y):
+        return int(x // self._cell_size), int(y // self._cell_size)
+
+    def update(self, item, x, y):
+        cell = self._cell(x, y)
+        old = self._item_cells.get(item)
+        if old == cell:
+            return
+        if old is not None:
+            self._discard(item, old)
+        self._cells[cell].add(item)
+        self._item_cells[item] = cell
+
+    def remove(self, item):
+        old = self._item_cells.pop(item, None)
+        if old is not None:
+            self._discard(item, old)
+
+    def _discard(self, item, cell):
+        items = self._cells[cell]
+        items.discard(item)
+        if not items:
+            del self._cells[cell]
+
+    def query(self, x, y, radius):
+        """Yield every item in the cells touched by the square around (x, y)"""
+        min_x, min_y = self._cell(x - radius, y - radius)
+        max_x, max_y = self._cell(x + radius, y + radius)
+        cells = self._cells
+        for cx in range(min_x, max_x + 1):
+            for cy in range(min_y, max_y + 1):
+                items = cells.get((cx, cy))
+                if items:
+                    yield from items
+
+    def __contains__(self, item):
+        return item in self._item_cells
+
+    def __len__(self):
+        return len(self._item_cells)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import argparse
+import importlib
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from enum import Enum
+from functools import partial
+
+from ibidem.codetanks.server.array_world import ArrayWorld
+from ibidem.codetanks.server.clock import EventClock
+from ibidem.codetanks.server.config import Engine
+from ibidem.codetanks.server.constants import PLAYER_COUNT
+from ibidem.codetanks.server.local import LocalGame
+from ibidem.codetanks.server.world import World
+
+LOG = logging.getLogger(__name__)
+
+WORLD_WIDTH = 500
+WORLD_HEIGHT = 500
+# Bots named without a module are looked up here
+SAMPLE_BOTS = "ibidem.codetanks.server.sample_bots"
+
+Match = namedtuple("Match", ("index", "round", "bots", "seed"))
+
+
+class Format(str, Enum):
+    ROUND_ROBIN = "round-robin"
+    SWISS = "swiss"
+
+
+def load_bot(spec):
+    """The bot class named by spec, either module:Class or the name of one of the sample bots"""
+    module_name, _, class_name = spec.rpartition(":")
+    module = importlib.import_module(module_name or SAMPLE_BOTS)
+    return getattr(module, class_name)
+
+
+def play_match(match, engine, max_time):
+    """Play a match without transports or a display, and return its result
+
+    Every bot runs in this process as a LocalBot. The match is run on the event clock, so no time is
+    spent waiting, and ends when there is at most one tank left, or after max_time milliseconds of game
+    time.
+    """
+    random.seed(match.seed)
+    world_class = ArrayWorld if engine == Engine.ARRAY else World
+    world = world_class(WORLD_WIDTH, WORLD_HEIGHT, False)
+    game = LocalGame(world, EventClock(world), [load_bot(spec)() for spec in match.bots], match.bots)
+    game.run(max_time)
+    survivors = [match.bots[tank.tank_id] for tank in world.get_live_bots()]
+    return {
+        "match": match.index,
+        "round": match.round,
+        "seed": match.seed,
+        "bots": list(match.bots),
+        "winner": survivors[0] if len(survivors) == 1 else None,
+        "survivors": survivors,
+        "game_time": game.game_time,
+    }
+
+
+def round_robin(bots, rounds):
+    """Every group of PLAYER_COUNT bots plays each other once per round"""
+    groups = list(itertools.combinations(bots, PLAYER_COUNT))
+    return [(round, group) for round in range(rounds) for group in groups]
+
+
+class Standings(object):
+    """Wins and byes for every bot, as results come in"""
+
+    def __init__(self, bots):
+        self.wins = {bot: 0 for bot in bots}
+        self.byes = {bot: 0 for bot in bots}
+
+    def record(self, result):
+        if result["winner"] is not None:
+            self.wins[result["winner"]] += 1
+
+    def ranking(self):
+        return sorted(self.wins, key=lambda bot: -self.wins[bot])
+
+    def swiss_round(self):
+        """Groups for the next Swiss round, of bots with similar scores
+
+        When the bots don't divide into full groups, the lowest ranked of those with the fewest byes sit out.
+        """
+        ranking = self.ranking()
+        sitting_out = len(ranking) % PLAYER_COUNT
+        if sitting_out:
+            fewest = min(self.byes.values())
+            candidates = [bot for bot in reversed(ranking) if self.byes[bot] == fewest]
+            candidates += [bot for bot in reversed(ranking) if self.byes[bot] != fewest]
+            for bot in candidates[:sitting_out]:
+                self.byes[bot] += 1
+                ranking.remove(bot)
+        return [tuple(ranking[i:i + PLAYER_COUNT]) for i in range(0, len(ranking), PLAYER_COUNT)]
+
+
+class Tournament(object):
+    """Play the matches of a tournament across a pool of processes, and write results as they come in
+
+    Results are written to results_file as JSON, one line per match, in the order matches end.
+    """
+
+    def __init__(self, bots, tournament_format, rounds, engine, max_time, seed):
+        if len(bots) < PLAYER_COUNT:
+            raise ValueError("A tournament needs at least %d bots" % PLAYER_COUNT)
+        if len(set(bots)) != len(bots):
+            raise ValueError("Every bot can only enter a tournament once")
+        for spec in bots:
+            load_bot(spec)
+        self.standings = Standings(bots)
+        self._bots = bots
+        self._format = tournament_format
+        self._rounds = rounds
+        self._play = partial(play_match, engine=engine, max_time=max_time)
+        self._seeds = random.Random(seed)
+        self._match_index = itertools.count()
+
+    def run(self, executor, results_file):
+        if self._format == Format.ROUND_ROBIN:
+            self._play_matches(executor, results_file, round_robin(self._bots, self._rounds))
+        else:
+            for round in range(self._rounds):
+                groups = self.standings.swiss_round()
+                self._play_matches(executor, results_file, [(round, group) for group in groups])
+        return self.standings
+
+    def _play_matches(self, executor, results_file, groups):
+        matches = [Match(next(self._match_index), round, group, self._seeds.getrandbits(32))
+                   for round, group in groups]
+        LOG.info("Playing %d matches", len(matches))
+        futures = [executor.submit(self._play, match) for match in matches]
+        for future in as_completed(futures):
+            result = future.result()
+            self.standings.record(result)
+            results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+            LOG.debug("Match %d won by %s", result["match"], result["winner"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a tournament between bots running in this process")
+    parser.add_argument("bots", nargs="+", help="Bots as module:Class, or the name of a sample bot")
+    parser.add_argument("--format", type=Format, default=Format.ROUND_ROBIN, choices=list(Format),
+                        help="How bots are grouped into matches")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--engine", type=Engine, default=Engine.OBJECT, choices=list(Engine))
+    parser.add_argument("--max-time", type=int, default=300000, help="Game time limit per match in milliseconds")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes to play matches in")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--results", default="results.jsonl", help="File to write match results to")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    try:
+        tournament = Tournament(args.bots, args.format, args.rounds, args.engine, args.max_time, args.seed)
+    except (ValueError, ImportError, AttributeError) as e:
+        parser.error(str(e))
+    with ProcessPoolExecutor(max_workers=args.workers) as executor, open(args.results, "w") as results_file:
+        standings = tournament.run(executor, results_file)
+    for bot in standings.ranking():
+        print("%5d %s" % (standings.wins[bot], bot))
+
+
+if __name__ == "__main__":
+    main()
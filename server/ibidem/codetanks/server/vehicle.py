@@ -6,7 +6,7 @@ import logging
 import math
 from euclid import Point2, Vector2
 
-from ibidem.codetanks.domain.messages_pb2 import Point, Death, BotStatus, Event
+from ibidem.codetanks.domain.messages_pb2 import Death, BotStatus, Event
 from ibidem.codetanks.server.commands import Idle, Move, Rotate, Aim, Fire, Scan, Dead
 from ibidem.codetanks.server.constants import TANK_SPEED, TANK_RADIUS, BULLET_SPEED, BULLET_RADIUS, BULLET_DAMAGE
 
@@ -14,84 +14,170 @@ LOG = logging.getLogger(__name__)
 
 
 class Vehicle(object):
+    """Base for everything that moves in the World
+
+    The kinematic state is kept in plain floats, and only written to the protobuf entity when a
+    snapshot is taken through the `entity` property.
+    """
+    __slots__ = ("_entity", "_world", "_command", "_x", "_y", "_dx", "_dy")
     radius = None
 
     def __init__(self, entity, world):
-        self.entity = entity
+        self._entity = entity
         self._world = world
+        self._x = entity.position.x
+        self._y = entity.position.y
+        self._dx = entity.direction.x
+        self._dy = entity.direction.y
         self._command = Idle(self)
 
-    def calculate_new_position(self, distance):
-        return self.position + (self.direction * distance)
+    @property
+    def entity(self):
+        self._sync()
+        return self._entity
+
+    def _sync(self):
+        entity = self._entity
+        position = entity.position
+        position.x = self._x
+        position.y = self._y
+        direction = entity.direction
+        direction.x = self._dx
+        direction.y = self._dy
+
+    def ignores(self, other):
+        """True if this vehicle passes through other without colliding"""
+        return other is self or other.status == BotStatus.DEAD
 
     def collide(self, other):
-        if other is self:
-            return False
-        if other.status == BotStatus.DEAD:
+        if self.ignores(other):
             return False
-        pos = self.position
-        other_pos = other.position
-        xdistance = pos.x - other_pos.x
-        ydistance = pos.y - other_pos.y
-        squared = xdistance ** 2 + ydistance ** 2
-        return squared <= (other.radius + self.radius) ** 2
+        xdistance = self._x - other._x
+        ydistance = self._y - other._y
+        squared = xdistance * xdistance + ydistance * ydistance
+        reach = other.radius + self.radius
+        return squared <= reach * reach
 
     def update(self, ticks):
         self._command, event = self._command.update(ticks)
         if event is not None:
-            self._world.add_event(self.entity.id, event)
+            self._world.add_event(self._entity.id, event)
 
     def is_tank(self):
         return False
 
+    def sweep(self, x, y):
+        return self._world.sweep(self, x, y)
+
+    def remaining_ticks(self):
+        return self._command.remaining_ticks()
+
+    @property
+    def velocity(self):
+        return self._command.velocity
+
+    @property
+    def location(self):
+        return self._x, self._y
+
+    def place(self, x, y):
+        self._x = x
+        self._y = y
+        self._moved()
+
     @property
     def position(self):
-        return Point2(self.entity.position.x, self.entity.position.y)
+        return Point2(self._x, self._y)
 
     @position.setter
     def position(self, value):
-        self.entity.position.CopyFrom(Point(x=value.x, y=value.y))
+        self.place(value.x, value.y)
+
+    def _moved(self):
+        pass
 
     @property
     def direction(self):
-        return Vector2(self.entity.direction.x, self.entity.direction.y)
+        return Vector2(self._dx, self._dy)
 
     @direction.setter
     def direction(self, value):
-        value.normalize()
-        self.entity.direction.CopyFrom(Point(x=value.x, y=value.y))
+        self._dx, self._dy = _normalized(value.x, value.y)
+
+    @property
+    def heading_vector(self):
+        return self._dx, self._dy
+
+    @property
+    def heading(self):
+        return math.atan2(self._dy, self._dx)
+
+    @heading.setter
+    def heading(self, angle):
+        self._dx = math.cos(angle)
+        self._dy = math.sin(angle)
 
 
 class Armour(Vehicle):
+    __slots__ = ("_tx", "_ty")
     radius = TANK_RADIUS
 
+    def __init__(self, entity, world):
+        self._tx = entity.turret.x
+        self._ty = entity.turret.y
+        super(Armour, self).__init__(entity, world)
+
+    def _sync(self):
+        super(Armour, self)._sync()
+        turret = self._entity.turret
+        turret.x = self._tx
+        turret.y = self._ty
+
+    def _moved(self):
+        self._world.tank_moved(self)
+
     @property
     def turret(self):
-        return Vector2(self.entity.turret.x, self.entity.turret.y)
+        return Vector2(self._tx, self._ty)
 
     @turret.setter
     def turret(self, value):
-        value.normalize()
-        self.entity.turret.CopyFrom(Point(x=value.x, y=value.y))
+        self._tx, self._ty = _normalized(value.x, value.y)
+
+    @property
+    def turret_vector(self):
+        return self._tx, self._ty
+
+    @property
+    def turret_heading(self):
+        return math.atan2(self._ty, self._tx)
+
+    @turret_heading.setter
+    def turret_heading(self, angle):
+        self._tx = math.cos(angle)
+        self._ty = math.sin(angle)
 
     @property
     def status(self):
-        return self.entity.status
+        return self._entity.status
 
     @status.setter
     def status(self, value):
-        self.entity.status = value
+        old = self._entity.status
+        self._entity.status = value
+        if old != value:
+            self._world.status_changed(self, old, value)
 
     @property
     def health(self):
-        return self.entity.health
+        return self._entity.health
 
     @property
     def tank_id(self):
-        return self.entity.id
+        return self._entity.id
 
     def inflict(self, damage, perpetrator):
-        self.entity.health -= damage
+        self._entity.health -= damage
         LOG.debug("%r has received %d in damage from %r", self, damage, perpetrator)
         if self.health <= 0:
             self._command = Dead(self)
@@ -100,16 +186,6 @@ class Armour(Vehicle):
     def is_collision(self):
         return self._world.is_collision(self)
 
-    def calculate_new_direction(self, theta):
-        new = self.direction.rotate(theta)
-        new.normalize()
-        return new
-
-    def calculate_new_turret(self, theta):
-        new = self.turret.rotate(theta)
-        new.normalize()
-        return new
-
     def is_tank(self):
         return True
 
@@ -145,37 +221,53 @@ class Armour(Vehicle):
 
 
 class Missile(Vehicle):
+    __slots__ = ("_parent", "_obstacle", "status", "slot", "spent")
     radius = BULLET_RADIUS
 
     def __init__(self, entity, world, parent):
         super(Missile, self).__init__(entity, world)
-        self._parent = parent
-        arena = world.arena
         LOG.debug("Missile %r created" % self)
+        self.slot = None
+        self._start(parent)
+
+    def launch(self, bullet_id, parent):
+        """Reuse a spent missile for a new shot from parent"""
+        self._entity.id = bullet_id
+        self._x, self._y = parent.location
+        self._dx, self._dy = parent.turret_vector
+        self._start(parent)
+
+    def _start(self, parent):
+        self._parent = parent
+        self.spent = False
+        arena = self._world.arena
         self._command = Move(self, BULLET_SPEED, arena.width + arena.height)
-        self._is_collision = True
+        self._obstacle = True
 
     def update(self, ticks):
         super(Missile, self).update(ticks)
-        if self._is_collision:
-            LOG.debug("Bullet collided with %r", self._is_collision)
-            if isinstance(self._is_collision, Armour):
-                self._is_collision.inflict(BULLET_DAMAGE, self._parent)
+        if self._obstacle:
+            LOG.debug("Bullet collided with %r", self._obstacle)
+            if isinstance(self._obstacle, Armour):
+                self._obstacle.inflict(BULLET_DAMAGE, self._parent)
             self._world.remove_bullet(self)
 
-    def is_collision(self):
-        self._is_collision = self._world.is_collision(self)
-        return self._is_collision
+    def sweep(self, x, y):
+        self._obstacle, fraction = super(Missile, self).sweep(x, y)
+        return self._obstacle, fraction
 
-    def collide(self, other):
-        if other is self._parent:
-            return False
-        return super(Missile, self).collide(other)
+    def ignores(self, other):
+        return other is self._parent or super(Missile, self).ignores(other)
 
     def __repr__(self):
         keys = ("entity", "position", "direction")
         return "Missile(%s)" % ", ".join("%s=%r" % (key, getattr(self, key)) for key in keys)
 
 
+def _normalized(x, y):
+    length = math.hypot(x, y)
+    return x / length, y / length
+
+
 if __name__ == "__main__":
     pass
@@ -2,14 +2,18 @@
 # -*- coding: utf-8
 
 import logging
+import math
 from collections import defaultdict
 from random import randint
 
-import math
-from euclid import LineSegment2, Circle
+import numpy as np
+from euclid import LineSegment2
 
 from ibidem.codetanks.domain.messages_pb2 import GameData, Arena, Tank, Point, Bullet, BotStatus
-from ibidem.codetanks.server.constants import MAX_HEALTH
+from ibidem.codetanks.server.constants import MAX_HEALTH, TANK_RADIUS
+from ibidem.codetanks.server.geometry import sector_hits, scan_radius, time_to_contact, time_to_boundary, \
+    time_to_stop
+from ibidem.codetanks.server.spatial import SpatialHash
 from ibidem.codetanks.server.vehicle import Armour, Missile
 
 LOG = logging.getLogger(__name__)
@@ -21,10 +25,31 @@ class World(object):
     def __init__(self, world_width, world_height, debug):
         LOG.debug("Creating world %dx%d (debug: %r)", world_width, world_height, debug)
         self.arena = Arena(width=world_width, height=world_height)
+        self._debug = debug
+        self.reset()
+
+    def reset(self):
+        """Remove all tanks and bullets, ready for a new match"""
+        # Bullets keep their slot for as long as they fly. Free slots are reused, and spent bullets are
+        # only taken out at the end of an update, then kept for the next shot.
         self._bullets = []
+        self._free_slots = []
+        self._spent_bullets = []
+        self._bullet_pool = []
         self._tanks = []
+        # Kept up to date as tanks change status, in the order the tanks were added
+        self._tanks_by_id = {}
+        self._live_tanks = {}
+        self._tanks_by_status = defaultdict(dict)
+        self._tank_index = SpatialHash(2 * TANK_RADIUS)
+        # Where tanks were when the current update started, and the furthest any has moved since
+        self._origins = {}
+        self._drift = 0.0
+        # Where each moving tank stops in the current update, as the obstacle and fraction of a sweep
+        self._stops = {}
         self._events = defaultdict(list)
-        self._debug = debug
+        # The last snapshot, reused for as long as nothing in it has changed
+        self._gamedata = None
 
     def add_tank(self, bot_id, tank_id):
         armour = Armour(Tank(
@@ -38,20 +63,64 @@ class World(object):
         ), self)
         self._set_valid_position(armour)
         self._tanks.append(armour)
+        self._tanks_by_id[tank_id] = armour
+        self._gamedata = None
+        self._tanks_by_status[armour.status][armour] = None
+        if armour.status != BotStatus.DEAD:
+            self._live_tanks[armour] = None
         return armour
 
+    def status_changed(self, armour, old, new):
+        if self._tanks_by_id.get(armour.tank_id) is not armour:
+            return
+        self._gamedata = None
+        self._tanks_by_status[old].pop(armour, None)
+        self._tanks_by_status[new][armour] = None
+        if new == BotStatus.DEAD:
+            self._live_tanks.pop(armour, None)
+
     def add_bullet(self, parent):
-        position = Point(x=parent.position.x, y=parent.position.y)
-        direction = Point(x=parent.turret.x, y=parent.turret.y)
-        bullet = Missile(Bullet(id=next(_bullet_generator), position=position, direction=direction), self, parent)
-        self._bullets.append(bullet)
+        if self._bullet_pool:
+            bullet = self._bullet_pool.pop()
+            bullet.launch(next(_bullet_generator), parent)
+        else:
+            x, y = parent.location
+            dx, dy = parent.turret_vector
+            entity = Bullet(id=next(_bullet_generator), position=Point(x=x, y=y), direction=Point(x=dx, y=dy))
+            bullet = Missile(entity, self, parent)
+        self._gamedata = None
+        if self._free_slots:
+            bullet.slot = self._free_slots.pop()
+            self._bullets[bullet.slot] = bullet
+        else:
+            bullet.slot = len(self._bullets)
+            self._bullets.append(bullet)
 
     def remove_bullet(self, missile):
-        self._bullets.remove(missile)
+        """Mark a bullet as spent, to be taken out at the end of the update"""
+        if not missile.spent:
+            missile.spent = True
+            self._spent_bullets.append(missile)
+
+    def _clear_spent_bullets(self):
+        for bullet in self._spent_bullets:
+            self._bullets[bullet.slot] = None
+            self._free_slots.append(bullet.slot)
+            self._bullet_pool.append(bullet)
+        self._spent_bullets = []
+
+    def _flying_bullets(self):
+        return [bullet for bullet in self._bullets if bullet is not None and not bullet.spent]
 
     @property
     def gamedata(self):
-        return GameData(bullets=self.bullets, tanks=self.tanks)
+        """Snapshot of all tanks and bullets
+
+        The same snapshot is returned until something in the world changes, so it must not be modified.
+        """
+        if self._gamedata is None:
+            self._gamedata = GameData(bullets=self.bullets, tanks=self.tanks)
+        return self._gamedata
 
     @property
     def tanks(self):
@@ -59,24 +128,77 @@ class World(object):
 
     @property
     def bullets(self):
-        return [w.entity for w in self._bullets]
+        return [w.entity for w in self._flying_bullets()]
 
     @property
     def number_of_live_bots(self):
-        return len([w for w in self._tanks if w.status != BotStatus.DEAD])
+        return len(self._live_tanks)
 
     def get_live_bots(self):
-        return [w for w in self._tanks if w.status != BotStatus.DEAD]
+        return list(self._live_tanks)
+
+    def get_tank(self, tank_id):
+        return self._tanks_by_id[tank_id]
+
+    def get_tanks_with_status(self, status):
+        return list(self._tanks_by_status[status])
+
+    def tank_moved(self, armour):
+        x, y = armour.location
+        self._tank_index.update(armour, x, y)
+        self._gamedata = None
+
+    def sweep(self, vehicle, x, y):
+        """Find the first obstacle vehicle runs into, moving in a straight line from where it is to (x, y)
+
+        Returns the obstacle and how far along the way contact is made, as a fraction between 0 and 1.
+        The obstacle is True for the edge of the arena, or the tank run into. When the way is clear,
+        the obstacle is False and the fraction is 1.
+
+        During an update, tanks that move stop where they meet, since all of them move at the same time,
+        and bullets are swept against tanks along the way the tanks moved from where they started. That
+        way the outcome does not depend on how long the update is.
+        """
+        stop = self._stops.get(vehicle)
+        if stop is not None:
+            return stop
+        x0, y0 = vehicle.location
+        return self._sweep(vehicle, x0, y0, x, y)
+
+    def _sweep(self, vehicle, x0, y0, x, y):
+        dx, dy = x - x0, y - y0
+        radius = vehicle.radius
+        obstacle, fraction = False, 1.0
+        boundary = float(time_to_boundary((x0, y0), (dx, dy), radius, self.arena.width, self.arena.height)[0])
+        if boundary <= fraction:
+            obstacle, fraction = True, boundary
+        reach = math.hypot(dx, dy) / 2. + self._drift + radius + TANK_RADIUS
+        tanks = [tank for tank in self._tank_index.query(x0 + dx / 2., y0 + dy / 2., reach)
+                 if not vehicle.ignores(tank)]
+        if tanks:
+            offsets, velocities = [], []
+            for tank in tanks:
+                x1, y1 = tank.location
+                ox, oy = self._origins.get(tank, (x1, y1))
+                offsets.append((x0 - ox, y0 - oy))
+                velocities.append((dx - (x1 - ox), dy - (y1 - oy)))
+            times = time_to_contact(offsets, velocities, radius + TANK_RADIUS).tolist()
+            time, tank = min(zip(times, tanks), key=lambda pair: (pair[0], pair[1].tank_id))
+            if time < fraction or (obstacle is False and time <= fraction):
+                obstacle, fraction = tank, time
+        return obstacle, fraction
 
     def is_collision(self, vehicle):
-        position = vehicle.position
-        for attr, upper_bound in ((position.x, self.arena.width), (position.y, self.arena.height)):
-            if not vehicle.radius <= attr <= (upper_bound - vehicle.radius):
-                return True
-        for tank in self._tanks:
-            if vehicle.collide(tank):
-                return tank
-        return False
+        """Check if vehicle overlaps the edge of the arena or a tank"""
+        x, y = vehicle.location
+        radius = vehicle.radius
+        if not (radius <= x <= self.arena.width - radius and radius <= y <= self.arena.height - radius):
+            return True
+        hit = False
+        for tank in self._tank_index.query(x, y, radius + TANK_RADIUS):
+            if vehicle.collide(tank) and (hit is False or tank.tank_id < hit.tank_id):
+                hit = tank
+        return hit
 
     def _set_valid_position(self, armour):
         armour.position = Point(x=randint(0, self.arena.width), y=randint(0, self.arena.height))
@@ -88,59 +210,132 @@ class World(object):
         y = randint(-1, 1)
         while x == y == 0:
             y = randint(-1, 1)
-        return Point(x=x, y=y)
+        length = math.hypot(x, y)
+        return Point(x=x / length, y=y / length)
 
     def update(self, ticks):
+        resting = len(self._tanks_by_status[BotStatus.IDLE]) + len(self._tanks_by_status[BotStatus.DEAD])
+        if resting < len(self._tanks) or self._flying_bullets():
+            self._gamedata = None
+        self._origins = {tank: tank.location for tank in self._tanks}
+        self._stops = self._plan_moves(ticks)
         for tank in self._tanks:
             tank.update(ticks)
+            x0, y0 = self._origins[tank]
+            x1, y1 = tank.location
+            self._drift = max(self._drift, math.hypot(x1 - x0, y1 - y0))
         for bullet in self._bullets:
-            bullet.update(ticks)
+            if bullet is not None and not bullet.spent:
+                bullet.update(ticks)
+        self._clear_spent_bullets()
+        self._origins = {}
+        self._drift = 0.0
+        self._stops = {}
+
+    def _plan_moves(self, ticks):
+        """Find where every moving tank stops in an update of ticks, with all of them moving at the same time"""
+        tanks = list(self._live_tanks)
+        movers = [tank for tank in tanks if tank.velocity != (0.0, 0.0)]
+        if not movers:
+            return {}
+        indices = {tank: i for i, tank in enumerate(tanks)}
+        positions = np.array([tank.location for tank in tanks])
+        displacements = np.zeros_like(positions)
+        for tank in movers:
+            vx, vy = tank.velocity
+            moving = min(ticks, tank.remaining_ticks())
+            displacements[indices[tank]] = (vx * moving, vy * moving)
+        drift = float(np.max(np.hypot(displacements[:, 0], displacements[:, 1])))
+        first, second = [], []
+        for tank in movers:
+            x, y = tank.location
+            dx, dy = displacements[indices[tank]]
+            reach = math.hypot(dx, dy) / 2. + drift + tank.radius + TANK_RADIUS
+            for other in self._tank_index.query(x + dx / 2., y + dy / 2., reach):
+                if not tank.ignores(other):
+                    first.append(indices[tank])
+                    second.append(indices[other])
+        moving = [indices[tank] for tank in movers]
+        boundary = time_to_boundary(positions[moving], displacements[moving], TANK_RADIUS,
+                                    self.arena.width, self.arena.height)
+        fractions = np.zeros(len(tanks))
+        fractions[moving] = np.minimum(boundary, 1.0)
+        walled = np.zeros(len(tanks), dtype=bool)
+        walled[moving] = boundary <= 1.0
+        fractions, hits = time_to_stop(positions, displacements, fractions, walled, first, second, 2 * TANK_RADIUS)
+        stops = {}
+        for tank, i in zip(movers, moving):
+            obstacle = tanks[hits[i]] if hits[i] >= 0 else bool(walled[i])
+            stops[tank] = obstacle, float(fractions[i])
+        return stops
+
+    def next_event(self):
+        """Ticks until the next command completes, and until the next contact
+
+        A contact is a moving vehicle reaching the edge of the arena, or another tank. Either is None
+        when nothing is pending.
+        """
+        vehicles = list(self._live_tanks) + self._flying_bullets()
+        return self._next_completion(vehicles), self._next_contact(vehicles)
+
+    def next_completion(self):
+        """Ticks until the next command completes, or None when nothing is pending
+
+        Only vehicles with a command to complete are moving, so this is None whenever next_event is.
+        """
+        return self._next_completion(list(self._live_tanks) + self._flying_bullets())
+
+    def _next_completion(self, vehicles):
+        completions = [t for t in (vehicle.remaining_ticks() for vehicle in vehicles) if t is not None]
+        return min(completions) if completions else None
+
+    def _next_contact(self, vehicles):
+        """Tanks move at the same time, so every vehicle is checked against the tanks moving as well"""
+        moving = [vehicle for vehicle in vehicles if vehicle.velocity != (0.0, 0.0)]
+        if not moving:
+            return None
+        contact = float(np.min(time_to_boundary([vehicle.location for vehicle in moving],
+                                                [vehicle.velocity for vehicle in moving],
+                                                [vehicle.radius for vehicle in moving],
+                                                self.arena.width, self.arena.height)))
+        offsets, velocities, reaches = [], [], []
+        for vehicle in moving:
+            x, y = vehicle.location
+            vx, vy = vehicle.velocity
+            for tank in self._tanks:
+                if vehicle.ignores(tank):
+                    continue
+                tx, ty = tank.location
+                tvx, tvy = tank.velocity
+                offsets.append((x - tx, y - ty))
+                velocities.append((vx - tvx, vy - tvy))
+                reaches.append(vehicle.radius + tank.radius)
+        if offsets:
+            contact = min(contact, float(np.min(time_to_contact(offsets, velocities, np.array(reaches)))))
+        return None if np.isinf(contact) else contact
 
     def scan(self, ray, theta):
         radius = self._calculate_scan_radius(theta)
         LOG.debug("Scanning along %r, with spread %.2f, radius is %d", ray, theta, radius)
-        hits = []
-        for tank in self._tanks:
-            if tank.position == ray.p:
-                continue
-            if self._is_hit(ray, theta, tank):
-                hits.append(tank.entity)
-        return hits
+        if not self._tanks:
+            return []
+        positions = [(tank.position.x, tank.position.y) for tank in self._tanks]
+        hits = sector_hits((ray.p.x, ray.p.y), (ray.v.x, ray.v.y), theta, radius, positions, TANK_RADIUS)
+        if self._debug:
+            self._plot_scan(ray, theta, radius)
+        return [tank.entity for tank, hit in zip(self._tanks, hits) if hit]
 
     def _calculate_scan_radius(self, theta):
-        return max(math.pi - theta, 0.0) * (self.arena.height * 0.318)
+        return scan_radius(theta, self.arena.height)
 
-    def _is_hit(self, ray, theta, tank):
-        radius = self._calculate_scan_radius(theta)
+    def _plot_scan(self, ray, theta, radius):
+        from ibidem.codetanks.server.debug_util import ScanPlot
         center_line = LineSegment2(ray.p, ray.v, radius)
-        center_vector = ray.v
-        target_line = LineSegment2(ray.p, tank.position)
-        tank_circle = Circle(tank.position, float(tank.radius))
         bounds = theta / 2.
-        if theta == 0.:
-            left = right = center_line
-        else:
-            left = LineSegment2(ray.p, center_vector.rotate(bounds), radius)
-            right = LineSegment2(ray.p, center_vector.rotate(-bounds), radius)
-        LOG.debug("Checking if %r is inside sector between %r and %r with radius %r", tank.position, left, right,
-                  radius)
-        if self._debug:
-            from ibidem.codetanks.server.debug_util import ScanPlot
+        left = LineSegment2(ray.p, ray.v.rotate(bounds), radius)
+        right = LineSegment2(ray.p, ray.v.rotate(-bounds), radius)
+        for tank in self._tanks:
             ScanPlot(self.arena.width, self.arena.height, left, right, center_line, radius, tank).plot()
-        if target_line.length > radius:
-            LOG.debug("Outside because %r is %r from center, which is more than radius %r", tank.position,
-                      target_line.length, radius)
-            return False
-        for side in left, right:
-            intersect = side.intersect(tank_circle)
-            if intersect:
-                LOG.debug("Inside because tank intersects side vector (%r) at %r", side, intersect)
-                return True
-        if target_line.v.angle(center_line.v) > bounds:
-            LOG.debug("Outside because %r is further from the center line than %r", target_line.v, bounds)
-            return False
-        LOG.debug("Inside sector")
-        return True
 
     def get_events(self):
         events = self._events
@@ -1,30 +1,44 @@
 #!/usr/bin/env python
 # -*- coding: utf-8
 import logging
+import uuid
 from collections import namedtuple
 from typing import Optional
 
-import sys
+import os
+import asyncio
 import zmq
+import zmq.asyncio
 from ibidem.codetanks.domain import messages_pb2
-from ibidem.codetanks.domain.messages_pb2 import CommandReply, Command, Event, ClientType
+from ibidem.codetanks.domain.messages_pb2 import CommandReply, Command, Event, ClientType, CommandResult
 
 from ibidem.codetanks.server import peer
-from ibidem.codetanks.server.config import settings
+from ibidem.codetanks.server.config import settings, Transport
 
 LOG = logging.getLogger(__name__)
 
+# Bot events go out on one shared socket, each message prefixed by a topic. Topics end in a slash, so no
+# topic is a prefix of another.
+def bot_topic(peer_id):
+    return "bot/%s/" % peer_id
+
+
+def match_topic(match):
+    """The topic for broadcasts to the bots in one match"""
+    return "match/%d/" % match
+
 
 class ChannelType(object):
     _Type = namedtuple("_Type", ["socket", "clz"])
     REQUEST = _Type(zmq.REQ, CommandReply)
     REPLY = _Type(zmq.REP, Command)
+    ROUTER = _Type(zmq.ROUTER, Command)
     PUBLISH = _Type(zmq.PUB, None)
     SUBSCRIBE = _Type(zmq.SUB, Event)
 
 
 class Channel(object):
-    url_scheme = "tcp"
+    url_scheme = settings.transport.value
     url_wildcard = "*"
 
     def __init__(self, channel_type, port=None, override_clz=None):
@@ -32,9 +46,19 @@ class Channel(object):
         self._channel_type = channel_type
         self._clz = override_clz or channel_type.clz
         self.zmq_socket = ctx.socket(channel_type.socket)
+        if channel_type == ChannelType.PUBLISH:
+            self.zmq_socket.set(zmq.SNDHWM, settings.event_queue_size)
         self.port = self._bind_socket(port)
+        self._last_broadcast = None
 
     def _bind_socket(self, port):
+        if self.url_scheme != Transport.TCP:
+            if not port:
+                raise ValueError("A port is needed to name %s endpoints" % self.url_scheme)
+            if self.url_scheme == Transport.IPC:
+                os.makedirs(settings.ipc_dir, exist_ok=True)
+            self.zmq_socket.bind(self._create_url(self._local_endpoint(port)))
+            return port
         if port:
             self.zmq_socket.bind(self._create_url(self.url_wildcard, port))
         else:
@@ -45,12 +69,20 @@ class Channel(object):
         url = "%s://%s" % (self.url_scheme, host)
         return "%s:%d" % (url, port) if port else url
 
+    def _local_endpoint(self, port):
+        """The endpoint name standing in for host and port with the ipc and inproc transports"""
+        if self.url_scheme == Transport.IPC:
+            return "%s/%d" % (settings.ipc_dir, port)
+        return "codetanks/%d" % port
+
     @property
     def url(self):
+        if self.url_scheme != Transport.TCP:
+            return self._create_url(self._local_endpoint(self.port))
         return self._create_url(settings.advertise_address, self.port)
 
     def ready(self):
-        return self.zmq_socket.poll(1) == zmq.POLLIN
+        return self.zmq_socket.poll(0) == zmq.POLLIN
 
     def wait(self):
         return self.zmq_socket.poll()
@@ -60,10 +92,37 @@ class Channel(object):
         value = deserialize(self._clz(), data.buffer)
         return value
 
+    def recv_routed(self):
+        """Receive a message on a ROUTER socket, along with the routing id of the sender"""
+        frames = self.zmq_socket.recv_multipart(copy=False)
+        value = deserialize(self._clz(), frames[-1].buffer)
+        return frames[0].bytes, value
+
+    def send_routed(self, routing_id: bytes, value):
+        """Send a message from a ROUTER socket to the REQ socket with the given routing id"""
+        self.zmq_socket.send_multipart((routing_id, b"", serialize(value)), copy=False)
+
     def send(self, value):
         data = serialize(value)
         self.zmq_socket.send(data, copy=False)
 
+    def send_encoded(self, data: bytes):
+        """Send a message that has already been serialized"""
+        self.zmq_socket.send(data, copy=False)
+
+    def publish(self, topic: bytes, data: bytes):
+        """Publish a message that has already been serialized, to subscribers of topic"""
+        self.zmq_socket.send_multipart((topic, data), copy=False)
+
+    def broadcast(self, topic: bytes, event: peer.EncodedEvent):
+        """Publish an event to subscribers of the broadcast topic of a match
+
+        Every peer in the match passes the broadcast on, but it is only published the first time.
+        """
+        if event is not self._last_broadcast:
+            self._last_broadcast = event
+            self.publish(topic, event.data)
+
     def __repr__(self):
         return f"Channel(url={self.url}, channel_type={self._channel_type})"
 
@@ -72,50 +131,98 @@ class ZeroMQPeer(peer.Peer):
     id: messages_pb2.Id
     client_type: messages_pb2.ClientType
 
-    def __init__(self, registration: messages_pb2.Registration, event_channel: Channel, cmd_channel: Optional[Channel]):
+    def __init__(self, registration: messages_pb2.Registration, event_channel: Channel, cmd_channel: Optional[Channel],
+                 topic: Optional[str] = None):
         self.id = registration.id
         self.client_type = registration.client_type
         self._event_channel = event_channel
         self._cmd_channel = cmd_channel
+        self._topic = topic.encode() if topic else None
+        self._broadcast_topic = match_topic(0).encode()
+        self._routing_id = None
+        self._command = None
+
+    @property
+    def broadcast_topic(self) -> str:
+        return self._broadcast_topic.decode()
 
-    def handle_event(self, event: messages_pb2.Event) -> None:
-        self._event_channel.send(event)
+    def join_match(self, match: int) -> None:
+        self._broadcast_topic = match_topic(match).encode()
+
+    def handle_event(self, event: peer.EncodedEvent) -> None:
+        if self._topic is None:
+            self._event_channel.send_encoded(event.data)
+        elif event.broadcast:
+            self._event_channel.broadcast(self._broadcast_topic, event)
+        else:
+            self._event_channel.publish(self._topic, event.data)
+
+    def queue_command(self, routing_id: bytes, cmd: messages_pb2.Command) -> None:
+        self._routing_id = routing_id
+        self._command = cmd
 
     def next_command(self) -> Optional[messages_pb2.Command]:
-        if self._cmd_channel.ready():
-            return self._cmd_channel.recv()
-        return None
+        cmd, self._command = self._command, None
+        return cmd
 
     def command_reply(self, reply: messages_pb2.CommandReply):
-        self._cmd_channel.send(reply)
+        self._cmd_channel.send_routed(self._routing_id, reply)
 
 
 class ZeroMQServer:
-    def __init__(self, viewer_channel, registration_channel):
+    """Registrations and commands from all ZeroMQ peers, served on the asyncio event loop
+
+    Bots send their commands to one shared ROUTER socket, and include the peer_id they got when
+    registering, so commands are routed to the right peer. The peer_id is random, so one bot can not
+    send commands as another.
+    """
+
+    def __init__(self, viewer_channel, registration_channel, event_channel, cmd_channel):
         self._viewer_channel = viewer_channel
         self._registration_channel = registration_channel
+        self._event_channel = event_channel
+        self._cmd_channel = cmd_channel
 
         LOG.info("ZeroMQServer accepting registrations at %s", self._registration_channel.url)
         LOG.debug("Creating ZeroMQServer with:")
         LOG.debug("\tviewer_channel: %r", self._viewer_channel)
         LOG.debug("\tregistration_channel: %r", self._registration_channel)
+        LOG.debug("\tevent_channel: %r", self._event_channel)
+        LOG.debug("\tcmd_channel: %r", self._cmd_channel)
 
-        event_port_range = settings.event_port_range
-        cmd_port_range = settings.cmd_port_range
-        self._publish_ports = iter(range(event_port_range[0], event_port_range[1] + 1))
-        self._reply_ports = iter(range(cmd_port_range[0], cmd_port_range[1] + 1))
-        self._peer_ids = iter(range(sys.maxsize))
         self._peers = {}
-        self._game_info = None
-
-    def _channel_factory(self, channel_type):
-        if channel_type == ChannelType.PUBLISH:
-            port = next(self._publish_ports)
-        elif channel_type == ChannelType.REPLY:
-            port = next(self._reply_ports)
-        else:
-            raise ValueError("Invalid channel type")
-        return Channel(channel_type, port)
+        self._viewer_peer = None
+
+    async def serve(self, add_peer, commands_received):
+        """Take in registrations and commands as they arrive, on the running asyncio event loop
+
+        commands_received is called after commands have been queued on their peers, so they can be
+        handled right away instead of on the next tick.
+        """
+        await asyncio.gather(self._serve_registrations(add_peer), self._serve_commands(commands_received))
+
+    async def _serve_registrations(self, add_peer):
+        socket = zmq.asyncio.Socket.from_socket(self._registration_channel.zmq_socket)
+        while True:
+            await socket.poll(flags=zmq.POLLIN)
+            self.register_waiting(add_peer)
+
+    async def _serve_commands(self, commands_received):
+        socket = zmq.asyncio.Socket.from_socket(self._cmd_channel.zmq_socket)
+        while True:
+            await socket.poll(flags=zmq.POLLIN)
+            self._receive_commands()
+            commands_received()
+
+    def _receive_commands(self):
+        while self._cmd_channel.ready():
+            routing_id, cmd = self._cmd_channel.recv_routed()
+            peer = self._peers.get(cmd.peer_id)
+            if peer is None:
+                LOG.warning("Received command from unknown peer %r", cmd.peer_id)
+                self._cmd_channel.send_routed(routing_id, CommandReply(result=CommandResult.BUSY))
+                continue
+            peer.queue_command(routing_id, cmd)
 
     def register_waiting(self, add_peer):
         while self._registration_channel.ready():
@@ -126,33 +233,28 @@ class ZeroMQServer:
                 self._register_bot(registration, add_peer)
 
     def _register_viewer(self, registration: messages_pb2.Registration, add_peer):
-        if self._game_info:
-            LOG.info("Registering viewer %r using existing game info", registration)
-            registration_reply = messages_pb2.RegistrationReply(
-                result=messages_pb2.RegistrationResult.SUCCESS,
-                game_info=self._game_info,
-                event_url=self._viewer_channel.url
-            )
-        else:
+        if self._viewer_peer is None:
             LOG.info("Registering viewer %r as first viewer", registration)
-            peer = ZeroMQPeer(registration, self._viewer_channel, None)
-            registration_reply: messages_pb2.RegistrationReply = add_peer(peer)
-            if registration_reply.result == messages_pb2.RegistrationResult.SUCCESS:
-                self._game_info = registration_reply.game_info
-                registration_reply.event_url = self._viewer_channel.url
+            self._viewer_peer = ZeroMQPeer(registration, self._viewer_channel, None)
+        else:
+            LOG.info("Registering viewer %r on the shared viewer channel", registration)
+        registration_reply: messages_pb2.RegistrationReply = add_peer(self._viewer_peer)
+        if registration_reply.result == messages_pb2.RegistrationResult.SUCCESS:
+            registration_reply.event_url = self._viewer_channel.url
         self._registration_channel.send(registration_reply)
 
     def _register_bot(self, registration: messages_pb2.Registration, add_peer):
         LOG.info("Registering bot %r", registration)
-        event_channel = self._channel_factory(ChannelType.PUBLISH)
-        cmd_channel = self._channel_factory(ChannelType.REPLY)
-        peer = ZeroMQPeer(registration, event_channel, cmd_channel)
-        peer_id = next(self._peer_ids)
+        peer_id = str(uuid.uuid4())
+        topic = bot_topic(peer_id)
+        peer = ZeroMQPeer(registration, self._event_channel, self._cmd_channel, topic)
         registration_reply: messages_pb2.RegistrationReply = add_peer(peer)
         if registration_reply.result == messages_pb2.RegistrationResult.SUCCESS:
             self._peers[peer_id] = peer
-            registration_reply.event_url = event_channel.url
-            registration_reply.cmd_url = cmd_channel.url
+            registration_reply.event_url = self._event_channel.url
+            registration_reply.event_topics.extend((topic, peer.broadcast_topic))
+            registration_reply.cmd_url = self._cmd_channel.url
+            registration_reply.peer_id = peer_id
         self._registration_channel.send(registration_reply)
 
 
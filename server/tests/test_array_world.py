@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import math
+import random
+
+import pytest
+from euclid import Point2, Vector2, Ray2
+
+from ibidem.codetanks.domain.messages_pb2 import Arena, Id, Tank, BotStatus, Event, GameData, ShotFired
+from ibidem.codetanks.server.array_world import ArrayWorld
+from ibidem.codetanks.server.constants import TANK_RADIUS, TANK_SPEED, ROTATION, CANNON_RELOAD, MAX_HEALTH, \
+    BULLET_DAMAGE, PLAYER_COUNT
+from ibidem.codetanks.server.world import World
+
+WIDTH = 500
+HEIGTH = 500
+BOT_ID = Id(name="bot", version=1)
+TICKS = 5
+
+
+@pytest.fixture
+def world():
+    return ArrayWorld(WIDTH, HEIGTH, False)
+
+
+def _place(world, tank, position, direction=(1., 0.), turret=(1., 0.)):
+    world._tank_position[tank._index] = position
+    world._tank_direction[tank._index] = direction
+    world._tank_turret[tank._index] = turret
+
+
+class TestArrayWorld:
+    def test_arena_is_given_size(self, world):
+        assert isinstance(world.arena, Arena)
+        assert world.arena.width == WIDTH
+        assert world.arena.height == HEIGTH
+
+    def test_tank_has_sensible_values(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        entity = tank.entity
+        assert isinstance(entity, Tank)
+        assert entity.health == MAX_HEALTH
+        assert entity.status == BotStatus.IDLE
+        assert entity.bot_id == BOT_ID
+        assert TANK_RADIUS <= entity.position.x <= WIDTH - TANK_RADIUS
+        assert TANK_RADIUS <= entity.position.y <= HEIGTH - TANK_RADIUS
+
+    def test_tanks_are_placed_apart(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(20)]
+        for tank in tanks:
+            for other in tanks:
+                if tank is not other:
+                    assert abs(tank.position - other.position) > 2 * TANK_RADIUS
+
+    def test_tanks_start_like_in_world_for_the_same_seed(self, world):
+        reference = World(WIDTH, HEIGTH, False)
+        random.seed(7)
+        expected = [reference.add_tank(BOT_ID, i).entity for i in range(PLAYER_COUNT)]
+        random.seed(7)
+        tanks = [world.add_tank(BOT_ID, i).entity for i in range(PLAYER_COUNT)]
+        for tank, other in zip(tanks, expected):
+            assert (tank.position.x, tank.position.y) == (other.position.x, other.position.y)
+            assert (tank.direction.x, tank.direction.y) == pytest.approx((other.direction.x, other.direction.y))
+            assert (tank.turret.x, tank.turret.y) == pytest.approx((other.turret.x, other.turret.y))
+
+    def test_gamedata_reflects_state(self, world):
+        world.add_tank(BOT_ID, 0)
+        world.add_tank(BOT_ID, 1)
+        assert world.gamedata == GameData(tanks=world.tanks, bullets=world.bullets)
+        assert [t.id for t in world.gamedata.tanks] == [0, 1]
+
+    def test_live_bots(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        tanks[1].status = BotStatus.DEAD
+        assert world.number_of_live_bots == 2
+        assert world.get_live_bots() == [tanks[0], tanks[2]]
+
+    def test_tank_lookups(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        tanks[1].move(10)
+        assert world.get_tank(2) is tanks[2]
+        assert world.get_tanks_with_status(BotStatus.IDLE) == [tanks[0], tanks[2]]
+        assert world.get_tanks_with_status(BotStatus.MOVING) == [tanks[1]]
+
+    def test_reset_removes_tanks_and_bullets(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        tanks[0].fire()
+        world.update(1)
+        assert world.bullets
+        tanks[1].status = BotStatus.DEAD
+        world.reset()
+        assert world.tanks == []
+        assert world.bullets == []
+        assert world.number_of_live_bots == 0
+        tank = world.add_tank(BOT_ID, 0)
+        assert world.get_live_bots() == [tank]
+
+
+class TestArenas:
+    def test_bullets_only_hit_tanks_in_own_arena(self, world):
+        tank = world.add_tank(BOT_ID, 0, arena=0)
+        stranger = world.add_tank(BOT_ID, 1, arena=1)
+        other = world.add_tank(BOT_ID, 2, arena=0)
+        _place(world, tank, (100., 100.))
+        _place(world, stranger, (200., 100.))
+        _place(world, other, (300., 100.))
+        tank.fire()
+        for _ in range(100):
+            world.update(TICKS)
+        assert stranger.health == MAX_HEALTH
+        assert other.health == MAX_HEALTH - BULLET_DAMAGE
+
+    def test_tanks_in_other_arenas_are_not_in_the_way(self, world):
+        tank = world.add_tank(BOT_ID, 0, arena=0)
+        stranger = world.add_tank(BOT_ID, 1, arena=1)
+        _place(world, tank, (100., 100.))
+        _place(world, stranger, (150., 100.))
+        tank.move(100)
+        world.update(100 / TANK_SPEED)
+        assert tank.position == Point2(200., 100.)
+
+    def test_scan_only_sees_own_arena(self, world):
+        tank = world.add_tank(BOT_ID, 0, arena=0)
+        stranger = world.add_tank(BOT_ID, 1, arena=1)
+        other = world.add_tank(BOT_ID, 2, arena=0)
+        _place(world, tank, (100., 100.))
+        _place(world, stranger, (200., 100.))
+        _place(world, other, (300., 100.))
+        tank.scan(10)
+        world.update(TICKS)
+        scan = world.get_events()[0][0].scan_complete
+        assert [hit.id for hit in scan.tanks] == [2]
+
+
+class TestMove:
+    def test_move_forwards(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        _place(world, tank, (100., 100.))
+        tank.move(10)
+        updates = 0
+        while tank.status == BotStatus.MOVING:
+            world.update(TICKS)
+            updates += 1
+        assert updates == math.ceil(10 / (TANK_SPEED * TICKS))
+        assert tank.position == Point2(110., 100.)
+        events = world.get_events()[0]
+        assert len(events) == 1
+        assert events[0].HasField("movement_complete")
+
+    def test_move_backwards_is_illegal(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        tank.move(-10)
+        assert tank.status == BotStatus.IDLE
+
+    def test_move_is_stopped_by_boundary(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        _place(world, tank, (WIDTH - TANK_RADIUS - 0.5, 100.))
+        tank.move(10)
+        world.update(TICKS)
+        assert tank.status == BotStatus.IDLE
+        assert tank.position.x == pytest.approx(WIDTH - TANK_RADIUS)
+        assert tank.position.y == 100.
+
+    def test_move_is_stopped_by_other_tank(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        _place(world, tank, (100., 100.))
+        _place(world, other, (100. + 2 * TANK_RADIUS + 0.5, 100.))
+        tank.move(10)
+        world.update(TICKS)
+        assert tank.status == BotStatus.IDLE
+        assert tank.position.x == pytest.approx(100.5)
+        assert tank.position.y == 100.
+
+    def test_head_on_tanks_stop_at_contact(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        _place(world, tank, (100., 100.))
+        _place(world, other, (100. + 2 * TANK_RADIUS + 10., 100.), direction=(-1., 0.))
+        tank.move(100)
+        other.move(100)
+        world.update(1000)
+        assert tank.status == other.status == BotStatus.IDLE
+        assert tank.position.x == pytest.approx(105.)
+        assert other.position.x == pytest.approx(105. + 2 * TANK_RADIUS)
+
+    @pytest.mark.parametrize("ticks", (1, 16, 50, 500, 5000))
+    def test_head_on_tanks_do_not_overlap_at_any_tick_length(self, world, ticks):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        _place(world, tank, (100., 100.))
+        _place(world, other, (300., 100.), direction=(-1., 0.))
+        tank.move(300)
+        other.move(300)
+        while BotStatus.MOVING in (tank.status, other.status):
+            world.update(ticks)
+        assert tank.position.x == pytest.approx(200. - TANK_RADIUS)
+        assert other.position.x == pytest.approx(200. + TANK_RADIUS)
+
+    def test_long_tick_does_not_pass_through_tank(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        _place(world, tank, (100., 100.))
+        _place(world, other, (200., 100.))
+        tank.move(300)
+        world.update(300 / TANK_SPEED)
+        assert tank.status == BotStatus.IDLE
+        assert tank.position.x == pytest.approx(200. - 2 * TANK_RADIUS)
+
+    def test_tanks_do_not_move_into_dead_tanks(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        _place(world, tank, (100., 100.))
+        _place(world, other, (100. + 2 * TANK_RADIUS + 0.5, 100.))
+        other.status = BotStatus.DEAD
+        tank.move(10)
+        world.update(TICKS)
+        assert tank.status == BotStatus.MOVING
+
+
+class TestRotateAndAim:
+    @pytest.mark.parametrize("angle, expected", (
+            (90, Vector2(0., 1.)),
+            (-90, Vector2(0., -1.)),
+    ))
+    def test_rotate(self, world, angle, expected):
+        tank = world.add_tank(BOT_ID, 0)
+        _place(world, tank, (100., 100.))
+        tank.rotate(angle)
+        assert tank.status == BotStatus.ROTATING
+        updates = 0
+        while tank.status == BotStatus.ROTATING:
+            world.update(TICKS)
+            updates += 1
+        assert updates == math.ceil(math.pi / 2 / (ROTATION * TICKS))
+        assert tank.direction.x == pytest.approx(expected.x)
+        assert tank.direction.y == pytest.approx(expected.y)
+        assert world.get_events()[0][0].HasField("rotation_complete")
+
+    def test_aim(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        _place(world, tank, (100., 100.))
+        tank.aim(180)
+        while tank.status == BotStatus.AIMING:
+            world.update(TICKS)
+        assert tank.turret.x == pytest.approx(-1.)
+        assert tank.turret.y == pytest.approx(0., abs=1e-9)
+        assert tank.direction == Vector2(1., 0.)
+        assert world.get_events()[0][0].HasField("aiming_complete")
+
+
+class TestFire:
+    def test_shot_is_fired_and_reloaded(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        _place(world, tank, (100., 100.))
+        tank.fire()
+        world.update(TICKS)
+        assert len(world.bullets) == 1
+        updates = 0
+        while tank.status == BotStatus.FIRING:
+            world.update(CANNON_RELOAD / 4)
+            updates += 1
+        assert updates == 4
+        events = world.get_events()[0]
+        assert events == [Event(shot_fired=ShotFired(you=tank.entity))]
+
+    def test_bullet_damages_tank_in_line_of_fire(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        _place(world, tank, (100., 100.))
+        _place(world, other, (200., 100.))
+        tank.fire()
+        for _ in range(100):
+            world.update(TICKS)
+        assert other.health == MAX_HEALTH - BULLET_DAMAGE
+        assert tank.health == MAX_HEALTH
+        assert world.bullets == []
+
+    def test_bullet_does_not_pass_through_tank_in_long_update(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        _place(world, tank, (50., 100.))
+        _place(world, other, (300., 100.))
+        tank.fire()
+        world.update(TICKS)
+        world.update(2000)
+        assert other.health == MAX_HEALTH - BULLET_DAMAGE
+        assert world.bullets == []
+
+    def test_bullet_disappears_at_boundary(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        _place(world, tank, (100., 100.), turret=(0., 1.))
+        tank.fire()
+        world.update(TICKS)
+        assert len(world.bullets) == 1
+        world.update(1000)
+        assert world.bullets == []
+
+    def test_tank_dies_when_health_runs_out(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        _place(world, tank, (100., 100.))
+        _place(world, other, (200., 100.))
+        world._tank_health[other._index] = BULLET_DAMAGE
+        tank.fire()
+        for _ in range(100):
+            world.update(TICKS)
+        assert other.status == BotStatus.DEAD
+        assert world.number_of_live_bots == 1
+        death = world.get_events()[1][0]
+        assert death.death.victim.id == 1
+        assert death.death.perpetrator.id == 0
+
+
+class TestScan:
+    @pytest.mark.parametrize("angle", range(0, 91, 5))
+    def test_scan_hits_same_tanks_as_world(self, world, angle):
+        reference = World(WIDTH, HEIGTH, False)
+        scanner = world.add_tank(BOT_ID, 0)
+        _place(world, scanner, (200., 200.), turret=(1., 1.))
+        for i in range(1, 30):
+            reference_tank = reference.add_tank(BOT_ID, i)
+            # Keep clear of the exact boundary cases, where rounding differs between the implementations
+            reference_tank.position = reference_tank.position + Vector2(0.123, 0.456)
+            tank = world.add_tank(BOT_ID, i)
+            _place(world, tank, (reference_tank.position.x, reference_tank.position.y))
+        ray = Ray2(Point2(200., 200.), Vector2(1., 1.))
+        expected = [t.id for t in reference.scan(ray, math.radians(angle))]
+        scanner.scan(angle)
+        world.update(TICKS)
+        event = world.get_events()[0][0]
+        assert [t.id for t in event.scan_complete.tanks] == expected
+        assert scanner.status == BotStatus.IDLE
+
+    def test_scan_above_90_degrees_is_ignored(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        tank.scan(91)
+        assert tank.status == BotStatus.IDLE
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import numpy as np
+import pytest
+
+from ibidem.codetanks.domain.messages_pb2 import BotStatus, CommandType
+from ibidem.codetanks.server.batch import BatchEnvironment, NO_COMMAND, OBSERVATION_FIELDS, WIN_REWARD
+from ibidem.codetanks.server.clock import FRAME_TIME
+from ibidem.codetanks.server.constants import MAX_HEALTH, BULLET_DAMAGE, TANK_SPEED, ROTATION, PLAYER_COUNT
+
+WORLDS = 3
+X, Y, DIRECTION_X, DIRECTION_Y, TURRET_X, TURRET_Y, HEALTH, STATUS = range(len(OBSERVATION_FIELDS))
+
+
+@pytest.fixture
+def env():
+    env = BatchEnvironment(WORLDS, tanks_per_world=2)
+    env.reset()
+    return env
+
+
+def _face_off(env, world):
+    """Put the two tanks in world 100 apart, with turrets pointing at each other"""
+    tanks = env._world
+    first, second = world * 2, world * 2 + 1
+    tanks._tank_position[first] = (100., 100.)
+    tanks._tank_position[second] = (200., 100.)
+    tanks._tank_turret[first] = (1., 0.)
+    tanks._tank_turret[second] = (-1., 0.)
+
+
+def _no_commands(env):
+    return np.full(env.shape, NO_COMMAND)
+
+
+class TestBatchEnvironment(object):
+    def test_observations_are_stacked_per_world(self):
+        env = BatchEnvironment(WORLDS)
+        observations = env.reset()
+        assert observations.shape == (WORLDS, PLAYER_COUNT, len(OBSERVATION_FIELDS))
+        assert np.all(observations[..., HEALTH] == MAX_HEALTH)
+        assert np.all(observations[..., STATUS] == BotStatus.IDLE)
+
+    def test_step_returns_arrays_per_world(self, env):
+        observations, rewards, done = env.step(_no_commands(env))
+        assert observations.shape == (WORLDS, 2, len(OBSERVATION_FIELDS))
+        assert rewards.shape == (WORLDS, 2)
+        assert done.shape == (WORLDS,)
+        assert not done.any()
+        assert np.all(env.game_time == FRAME_TIME)
+
+    def test_commands_are_applied_per_tank(self, env):
+        before = env.reset()
+        commands = _no_commands(env)
+        values = np.zeros(env.shape)
+        commands[0, 0], values[0, 0] = CommandType.MOVE, 10
+        commands[1, 1], values[1, 1] = CommandType.AIM, 90
+        commands[2, 0], values[2, 0] = CommandType.SCAN, 10
+        observations, _, _ = env.step(commands, values)
+        assert observations[0, 0, STATUS] == BotStatus.MOVING
+        moved = np.hypot(*(observations[0, 0, X:Y + 1] - before[0, 0, X:Y + 1]))
+        assert moved == pytest.approx(TANK_SPEED * FRAME_TIME)
+        assert observations[1, 1, STATUS] == BotStatus.AIMING
+        assert observations[2, 0, STATUS] == BotStatus.IDLE
+        untouched = np.ones(env.shape, dtype=bool)
+        untouched[0, 0] = untouched[1, 1] = False
+        assert np.all(observations[untouched][:, STATUS] == BotStatus.IDLE)
+
+    def test_commands_follow_the_rules(self, env):
+        before = env.reset()
+        commands = _no_commands(env)
+        values = np.zeros(env.shape)
+        commands[0, 0], values[0, 0] = CommandType.MOVE, -10
+        commands[1, 0], values[1, 0] = CommandType.SCAN, 100
+        commands[2, 0], values[2, 0] = CommandType.ROTATE, 180
+        observations, _, _ = env.step(commands, values)
+        assert observations[0, 0, STATUS] == BotStatus.IDLE
+        assert observations[1, 0, STATUS] == BotStatus.IDLE
+        assert observations[2, 0, STATUS] == BotStatus.ROTATING
+        commands[2, 0], values[2, 0] = CommandType.FIRE, 0
+        observations, _, _ = env.step(commands, values)
+        assert observations[2, 0, STATUS] == BotStatus.ROTATING
+        steps = 2
+        while observations[2, 0, STATUS] == BotStatus.ROTATING:
+            observations, _, _ = env.step(_no_commands(env))
+            steps += 1
+        assert steps == np.ceil(np.pi / (ROTATION * FRAME_TIME))
+        direction = observations[2, 0, DIRECTION_X:DIRECTION_Y + 1]
+        assert direction == pytest.approx(-before[2, 0, DIRECTION_X:DIRECTION_Y + 1])
+
+    def test_hits_are_rewarded_in_own_world_only(self, env):
+        _face_off(env, 1)
+        commands = _no_commands(env)
+        commands[1, 0] = CommandType.FIRE
+        total = np.zeros(env.shape)
+        for _ in range(20):
+            _, rewards, _ = env.step(commands)
+            total += rewards
+            commands = _no_commands(env)
+        assert total[1].tolist() == [BULLET_DAMAGE, -BULLET_DAMAGE]
+        assert not total[[0, 2]].any()
+
+    def test_finished_world_is_restarted_and_winner_rewarded(self, env):
+        _face_off(env, 2)
+        env._world._tank_health[5] = BULLET_DAMAGE
+        commands = _no_commands(env)
+        commands[2, 0] = CommandType.FIRE
+        for _ in range(20):
+            observations, rewards, done = env.step(commands)
+            commands = _no_commands(env)
+            if done.any():
+                break
+        assert done.tolist() == [False, False, True]
+        assert rewards[2].tolist() == [BULLET_DAMAGE + WIN_REWARD, -BULLET_DAMAGE]
+        assert np.all(observations[2, :, HEALTH] == MAX_HEALTH)
+        assert np.all(observations[2, :, STATUS] == BotStatus.IDLE)
+        assert env.game_time[2] == 0
+        assert env.game_time[0] > 0
+
+    def test_games_end_at_max_time(self):
+        env = BatchEnvironment(WORLDS, max_time=FRAME_TIME * 3)
+        env.reset()
+        done = [env.step(np.full(env.shape, NO_COMMAND))[2] for _ in range(3)]
+        assert [d.tolist() for d in done] == [[False] * WORLDS, [False] * WORLDS, [True] * WORLDS]
+        assert np.all(env.game_time == 0)
+
+
+if __name__ == "__main__":
+    pass
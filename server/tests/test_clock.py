@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import pytest
+from euclid import Point2, Vector2
+from mock import create_autospec, MagicMock
+
+from ibidem.codetanks.domain.messages_pb2 import Id, BotStatus
+from ibidem.codetanks.server.array_world import ArrayWorld
+from ibidem.codetanks.server.clock import EventClock, FixedStepClock, RealTimeClock, FRAME_TIME
+from ibidem.codetanks.server.constants import TANK_SPEED, TANK_RADIUS, CANNON_RELOAD
+from ibidem.codetanks.server.world import World
+
+BOT_ID = Id(name="bot", version=1)
+
+
+class TestRealTimeClock:
+    def test_caller_waits_out_rest_of_frame(self):
+        clock = RealTimeClock()
+        clock._get_ticks = MagicMock(side_effect=[100, 105, 117, 120, 200])
+        clock.start()
+        assert clock.time_to_next_tick() == FRAME_TIME - 5
+        assert clock.tick() == 17
+        assert clock.time_to_next_tick() == FRAME_TIME - 3
+        assert clock.time_to_next_tick() == 0
+
+
+class TestFixedStepClock:
+    def test_ticks_are_fixed(self):
+        clock = FixedStepClock(16)
+        clock.start()
+        assert [clock.tick() for _ in range(3)] == [16, 16, 16]
+
+    def test_ticks_are_limited(self):
+        assert FixedStepClock(16).tick(10) == 10
+
+
+class TestEventClock:
+    @pytest.fixture
+    def world(self):
+        return create_autospec(World)
+
+    @pytest.mark.parametrize("completion, contact, expected", (
+            (None, None, 0),
+            (100., None, 100),
+            (99.5, None, 100),
+            (0., None, 1),
+            (None, 100., 99),
+            (None, 99.5, 99),
+            (None, 0.5, 1),
+            (50., 100., 50),
+            (100., 50., 49),
+    ))
+    def test_ticks_to_next_event(self, world, completion, contact, expected):
+        world.next_event.return_value = (completion, contact)
+        assert EventClock(world).tick() == expected
+
+    def test_limit_is_waited_for_when_nothing_is_pending(self, world):
+        world.next_event.return_value = (None, None)
+        assert EventClock(world).tick(1000) == 1000
+
+    def test_limit_cuts_short_waiting_for_event(self, world):
+        world.next_event.return_value = (2000., None)
+        assert EventClock(world).tick(1000) == 1000
+
+    @pytest.mark.parametrize("completion, expected", (
+            (None, None),
+            (100., 0),
+    ))
+    def test_next_tick_waits_for_command_when_nothing_is_pending(self, world, completion, expected):
+        world.next_completion.return_value = completion
+        assert EventClock(world).time_to_next_tick() == expected
+        world.next_event.assert_not_called()
+
+
+class TestEventClockInWorld:
+    @pytest.fixture(params=(World, ArrayWorld))
+    def world(self, request):
+        return request.param(500, 500, False)
+
+    def _place(self, world, tank, x, y):
+        if isinstance(world, ArrayWorld):
+            world._tank_position[tank._index] = (x, y)
+            world._tank_direction[tank._index] = (1., 0.)
+        else:
+            tank.position = Point2(x, y)
+            tank.direction = Vector2(1., 0.)
+
+    def _run(self, world, tank):
+        clock = EventClock(world)
+        steps = 0
+        while tank.status != BotStatus.IDLE:
+            world.update(clock.tick())
+            steps += 1
+        return steps
+
+    def test_next_tick_is_due_while_anything_moves(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        self._place(world, tank, 100., 100.)
+        clock = EventClock(world)
+        assert clock.time_to_next_tick() is None
+        tank.move(100)
+        assert clock.time_to_next_tick() == 0
+        world.update(clock.tick())
+        assert clock.time_to_next_tick() is None
+
+    def test_move_completes_in_one_step(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        self._place(world, tank, 100., 100.)
+        tank.move(100)
+        assert EventClock(world).tick() == 100 / TANK_SPEED
+        assert self._run(world, tank) == 1
+        assert tank.position.x == pytest.approx(200.)
+
+    def test_fire_completes_after_reload(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        self._place(world, tank, 100., 100.)
+        tank.fire()
+        clock = EventClock(world)
+        world.update(clock.tick())
+        assert clock.tick() <= CANNON_RELOAD
+
+    def test_move_stops_at_other_tank(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        self._place(world, tank, 100., 100.)
+        self._place(world, other, 200.5, 100.)
+        tank.move(100)
+        assert self._run(world, tank) == 2
+        assert tank.position.x == pytest.approx(200.5 - 2 * TANK_RADIUS)
+
+    def test_move_stops_at_boundary(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        self._place(world, tank, 400.1, 100.)
+        tank.move(200)
+        self._run(world, tank)
+        assert tank.position.x == pytest.approx(500 - TANK_RADIUS)
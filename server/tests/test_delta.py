@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import pytest
+from ibidem.codetanks.domain.messages_pb2 import GameData, Tank, Bullet, Point, BotStatus, Id
+
+from ibidem.codetanks.server.delta import GameDataStream
+
+
+def _sequence():
+    ids = iter(range(1, 1000))
+    return lambda: next(ids)
+
+
+def _game_data(health=100, x=10.0, status=BotStatus.MOVING, bullets=(), tank_count=2):
+    tanks = [
+        Tank(id=0, bot_id=Id(name="first", version=1), position=Point(x=x, y=20.0), direction=Point(x=1.0, y=0.0),
+             turret=Point(x=0.0, y=1.0), health=health, status=status),
+        Tank(id=1, bot_id=Id(name="second", version=1), position=Point(x=50.0, y=60.0),
+             direction=Point(x=0.0, y=1.0), turret=Point(x=1.0, y=0.0), health=100, status=BotStatus.IDLE),
+    ]
+    return GameData(tanks=tanks[:tank_count], bullets=list(bullets))
+
+
+def _bullet(id, x):
+    return Bullet(id=id, position=Point(x=x, y=0.0), direction=Point(x=1.0, y=0.0))
+
+
+class TestGameDataStream(object):
+    @pytest.fixture
+    def stream(self):
+        return GameDataStream(keyframe_interval=5)
+
+    def test_first_frame_is_keyframe(self, stream):
+        game_data = _game_data()
+        event = stream.next_frame(game_data, _sequence())
+        assert event.WhichOneof("event") == "game_data"
+        assert event.game_data == game_data
+        assert event.sequence_id == 1
+
+    def test_unchanged_snapshot_sends_nothing(self, stream):
+        game_data = _game_data()
+        next_sequence_id = _sequence()
+        stream.next_frame(game_data, next_sequence_id)
+        assert stream.next_frame(game_data, next_sequence_id) is None
+
+    def test_delta_only_has_changed_tanks_and_fields(self, stream):
+        next_sequence_id = _sequence()
+        stream.next_frame(_game_data(), next_sequence_id)
+        event = stream.next_frame(_game_data(x=12.0), next_sequence_id)
+        delta = event.game_data_delta
+        assert delta.base_sequence_id == 1
+        assert len(delta.tanks) == 1
+        tank = delta.tanks[0]
+        assert tank.id == 0
+        assert tank.HasField("position")
+        assert not tank.HasField("direction")
+        assert not tank.HasField("health")
+        assert not tank.HasField("bot_id")
+
+    def test_keyframe_sent_at_interval(self, stream):
+        next_sequence_id = _sequence()
+        kinds = [stream.next_frame(_game_data(x=float(x)), next_sequence_id).WhichOneof("event") for x in range(6)]
+        assert kinds == ["game_data", "game_data_delta", "game_data_delta", "game_data_delta", "game_data_delta",
+                         "game_data"]
+
+    def test_requested_keyframe_sent_on_next_frame(self, stream):
+        game_data = _game_data()
+        next_sequence_id = _sequence()
+        stream.next_frame(game_data, next_sequence_id)
+        stream.request_keyframe()
+        event = stream.next_frame(game_data, next_sequence_id)
+        assert event.WhichOneof("event") == "game_data"
+
+
+    def test_new_tank_sent_in_full_with_bot_id(self, stream):
+        next_sequence_id = _sequence()
+        stream.next_frame(_game_data(tank_count=1), next_sequence_id)
+        current = _game_data()
+        delta = stream.next_frame(current, next_sequence_id).game_data_delta
+        assert len(delta.tanks) == 1
+        tank = delta.tanks[0]
+        assert tank.bot_id == current.tanks[1].bot_id
+        assert tank.position == current.tanks[1].position
+        assert tank.status == BotStatus.IDLE
+
+    def test_moved_bullets_and_removed_bullets(self, stream):
+        next_sequence_id = _sequence()
+        stream.next_frame(_game_data(bullets=[_bullet(1, 3.0), _bullet(2, 4.0), _bullet(4, 5.0)]), next_sequence_id)
+        current = _game_data(bullets=[_bullet(2, 8.0), _bullet(3, 1.0), _bullet(4, 5.0)])
+        delta = stream.next_frame(current, next_sequence_id).game_data_delta
+        assert list(delta.removed_bullets) == [1]
+        assert list(delta.bullets) == [_bullet(2, 8.0), _bullet(3, 1.0)]
+        assert len(delta.tanks) == 0
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 # -*- coding: utf-8
+import asyncio
 from datetime import datetime, timedelta
 
 import pytest
@@ -9,6 +10,7 @@ from ibidem.codetanks.domain.messages_pb2 import GameData, ClientType, Id, Regis
 from mock import create_autospec, MagicMock, PropertyMock
 
 from ibidem.codetanks.server import peer
+from ibidem.codetanks.server.clock import RealTimeClock, FixedStepClock
 from ibidem.codetanks.server.constants import PLAYER_COUNT, MAX_HEALTH, BULLET_DAMAGE, TANK_SPEED, ROTATION, \
     BULLET_SPEED, TANK_RADIUS, BULLET_RADIUS, CANNON_RELOAD
 from ibidem.codetanks.server.game_server import GameServer
@@ -17,6 +19,7 @@ from ibidem.codetanks.server.world import World
 from ibidem.codetanks.server.zeromq import ZeroMQServer
 
 VICTORY_DELAY = timedelta(seconds=1)
+KEYFRAME_INTERVAL = 30
 BOT_CLIENT_ID = Id(name="bot", version=1)
 
 
@@ -34,14 +37,27 @@ def zeromq_server():
 
 
 @pytest.fixture
-def server(world, zeromq_server):
-    return GameServer(zeromq_server, world, VICTORY_DELAY)
+def server(world):
+    return GameServer(world, VICTORY_DELAY, RealTimeClock(), KEYFRAME_INTERVAL)
+
+
+def _serve_and_play(server, zeromq_server):
+    """Play a match on a new event loop, with the transport served alongside it"""
+    async def run():
+        serving = asyncio.create_task(zeromq_server.serve(server.add_peer, server.handle_commands))
+        try:
+            await server.play_match()
+        finally:
+            serving.cancel()
+
+    asyncio.run(run())
 
 
 def _make_peer(client_type, id):
     m = MagicMock(peer.Peer, instance=True)
     m.client_type = client_type
     m.id = id
+    m.wants_keyframe.return_value = False
     return m
 
 
@@ -79,7 +95,7 @@ class TestBotRegistration:
 
     def test_bot_cmd_channel_is_polled(self, server, bot_peer):
         server.add_peer(bot_peer)
-        server._run_once()
+        server.step()
         peer, bot = server._bots[0]
         peer.next_command.assert_called_once()
 
@@ -89,7 +105,7 @@ class TestBotRegistration:
         server.add_peer(bot_peer)
         peer, bot = server._bots[0]
         bot.handle_command = MagicMock()
-        server._run_once()
+        server.step()
         peer.next_command.assert_called_once()
         bot.handle_command.assert_called_once_with(cmd)
 
@@ -117,29 +133,32 @@ class TestGame:
         server.add_peer(viewer_peer)
         game_data = GameData(bullets=[], tanks=[])
         type(world).gamedata = PropertyMock(return_value=game_data)
-        server._run_once()
-        viewer_peer.handle_event.assert_called_with(Event(game_data=game_data))
+        server.step()
+        viewer_peer.handle_event.assert_called_once()
+        assert viewer_peer.handle_event.call_args.args[0].event.game_data == game_data
 
     def test_events_gathered_once_per_loop(self, server, world):
         world.get_events.return_value = {}
-        server._run_once()
+        server.step()
         world.get_events.assert_called_once_with()
 
     def test_events_sent_when_gathered(self, server, world, bot, bot_peer):
         scan_result = Event(scan_complete=ScanComplete(tanks=[]))
         world.get_events.return_value = {bot.tank_id: [scan_result]}
-        server._run_once()
-        bot_peer.handle_event.assert_called_once_with(scan_result)
+        server.step()
+        bot_peer.handle_event.assert_called_once()
+        assert bot_peer.handle_event.call_args.args[0].event == scan_result
 
     def test_events_sent_to_all_when_no_tank_id(self, server, world, bot, bot_peer):
         death = Event(death=Death(victim=Tank(), perpetrator=Tank()))
         world.get_events.return_value = {None: [death]}
-        server._run_once()
-        bot_peer.handle_event.assert_called_once_with(death)
+        server.step()
+        bot_peer.handle_event.assert_called_once()
+        assert bot_peer.handle_event.call_args.args[0].event == death
 
     def test_bot_command_receives_reply(self, server, bot, bot_peer):
         bot_peer.next_command.return_value = Command(type=CommandType.MOVE, value=10)
-        server._run_once()
+        server.step()
         bot_peer.command_reply.assert_called_once_with(CommandReply(result=CommandResult.ACCEPTED))
 
     @pytest.mark.parametrize("command, name, param", (
@@ -155,7 +174,7 @@ class TestGame:
     ))
     def test_command(self, server, bot, bot_peer, command, name, param):
         bot_peer.next_command.return_value = command
-        server._run_once()
+        server.step()
         if param is None:
             getattr(bot.tank, name).assert_called_once_with()
         else:
@@ -173,7 +192,7 @@ class TestGame:
     def test_command_abort_if_busy(self, server, bot, bot_peer, command_abort_if_busy_states, command):
         bot.tank.status = command_abort_if_busy_states
         bot_peer.next_command.return_value = command
-        server._run_once()
+        server.step()
         getattr(bot.tank, CommandType.Name(command.type).lower()).assert_not_called()
         bot_peer.command_reply.assert_called_once_with(CommandReply(result=CommandResult.BUSY))
 
@@ -187,13 +206,35 @@ class TestGame:
         assert server.game_full()
 
     def test_update_not_called_before_game_started(self, server, world):
-        server._run_once()
+        server.step()
         world.update.assert_not_called()
 
     def test_game_does_not_end_when_only_one_bot_registered(self, server, world):
         world.number_of_live_bots = 1
         assert not server.finished()
 
+    def test_async_game_starts_when_registrations_fill_the_game(self, server, world, zeromq_server, bot, bot_peer):
+        server.clock = FixedStepClock(300)
+        world.add_tank.return_value = Armour(Tank(), world)
+        bot.tank = Armour(Tank(), world)
+        bot_peer.next_command.return_value = None
+        world.number_of_live_bots = 1
+        world.get_live_bots.return_value = [Armour(Tank(), world)]
+
+        async def serve(add_peer, commands_received):
+            # One from fixture, and another three here
+            for i in range(PLAYER_COUNT - 1):
+                await asyncio.sleep(0)
+                assert not server.started()
+                add_peer(_make_peer(ClientType.BOT, Id(name="bot", version=1)))
+            await asyncio.Event().wait()
+
+        zeromq_server.serve.side_effect = serve
+        _serve_and_play(server, zeromq_server)
+        assert server.started()
+        ticks = [c.args[0] for c in world.update.call_args_list]
+        assert ticks == [300, 300, 300, 100]
+
 
 class TestStartedGame:
     @pytest.fixture
@@ -212,9 +253,77 @@ class TestStartedGame:
     def test_world_updated_once_per_loop(self, server, world):
         server.clock = MagicMock()
         server.clock.tick.return_value = 30
-        server._run_once()
+        server.clock.time_to_next_tick.return_value = 0
+        server.start()
+        server.step()
         world.update.assert_called_once_with(30)
 
+    def test_step_does_not_wait_for_the_next_tick(self, server, world):
+        bot_peer, _ = server._bots[0]
+        server.clock = MagicMock()
+        server.clock.tick.return_value = 16
+        server.clock.time_to_next_tick.return_value = 1000
+        server.start()
+        server.step()
+        bot_peer.next_command.assert_called_once_with()
+        world.update.assert_called_once_with(16)
+
+    def test_no_game_data_built_without_viewers(self, server, world):
+        gamedata = PropertyMock(return_value=GameData())
+        type(world).gamedata = gamedata
+        server.clock = FixedStepClock(16)
+        server.start()
+        server._tick()
+        gamedata.assert_not_called()
+
+    def test_first_frame_to_viewers_is_a_keyframe(self, server, world, viewer_peer):
+        world.gamedata = GameData(tanks=[Tank(id=1)])
+        server.add_peer(viewer_peer)
+        server.step()
+        event = viewer_peer.handle_event.call_args.args[0].event
+        assert event.WhichOneof("event") == "game_data"
+        assert event.game_data == world.gamedata
+
+    def test_nothing_sent_to_viewers_while_game_data_is_unchanged(self, server, world, viewer_peer):
+        server.add_peer(viewer_peer)
+        server.step()
+        server.step()
+        viewer_peer.handle_event.assert_called_once()
+
+    def test_changes_sent_to_viewers_as_delta(self, server, world, viewer_peer):
+        world.gamedata = GameData(tanks=[Tank(id=1, health=MAX_HEALTH)])
+        server.add_peer(viewer_peer)
+        server.step()
+        keyframe = viewer_peer.handle_event.call_args.args[0].event
+        world.gamedata = GameData(tanks=[Tank(id=1, health=MAX_HEALTH - BULLET_DAMAGE)])
+        server.step()
+        event = viewer_peer.handle_event.call_args.args[0].event
+        assert event.WhichOneof("event") == "game_data_delta"
+        assert event.game_data_delta.base_sequence_id == keyframe.sequence_id
+        assert event.sequence_id > keyframe.sequence_id
+
+    def test_keyframe_sent_when_a_viewer_missed_a_delta(self, server, world, viewer_peer):
+        server.add_peer(viewer_peer)
+        server.step()
+        viewer_peer.wants_keyframe.return_value = True
+        world.gamedata = GameData(tanks=[Tank(id=1)])
+        server.step()
+        viewer_peer.wants_keyframe.return_value = False
+        world.gamedata = GameData(tanks=[Tank(id=2)])
+        server.step()
+        kinds = [c.args[0].event.WhichOneof("event") for c in viewer_peer.handle_event.call_args_list]
+        assert kinds == ["game_data", "game_data_delta", "game_data"]
+
+    def test_new_viewer_triggers_keyframe(self, server, world, viewer_peer):
+        server.add_peer(viewer_peer)
+        server.step()
+        world.gamedata = GameData(tanks=[Tank(id=1)])
+        server.add_peer(viewer_peer)
+        server.step()
+        event = viewer_peer.handle_event.call_args.args[0].event
+        assert event.WhichOneof("event") == "game_data"
+        assert server._viewers == [viewer_peer]
+
     def test_game_ends_when_only_one_bot_left(self, server, world):
         world.number_of_live_bots = 1
         assert server.finished()
@@ -227,10 +336,73 @@ class TestStartedGame:
         world.number_of_live_bots = 1
         world.get_live_bots.return_value = [Armour(Tank(), world)]
         start = datetime.now()
-        server.run()
+        asyncio.run(server.play_match())
         end = datetime.now()
         assert (end - start).total_seconds() == pytest.approx(VICTORY_DELAY.total_seconds(), abs=0.2)
 
+    def test_victory_delay_is_simulated_with_fixed_step_clock(self, server, world):
+        server.clock = FixedStepClock(300)
+        world.number_of_live_bots = 1
+        world.get_live_bots.return_value = [Armour(Tank(), world)]
+        start = datetime.now()
+        asyncio.run(server.play_match())
+        end = datetime.now()
+        assert (end - start).total_seconds() < VICTORY_DELAY.total_seconds() / 2
+        ticks = [c.args[0] for c in world.update.call_args_list]
+        assert ticks == [300, 300, 300, 100]
+
+    def test_async_commands_handled_when_transport_receives_them(self, server, world, zeromq_server):
+        server.clock = FixedStepClock(300)
+        world.number_of_live_bots = 1
+        world.get_live_bots.return_value = [Armour(Tank(), world)]
+        bot_peer, bot = server._bots[0]
+        bot_peer.next_command.return_value = None
+        handled = []
+
+        async def serve(add_peer, commands_received):
+            bot_peer.next_command.return_value = Command(type=CommandType.FIRE)
+            commands_received()
+            handled.append(bot_peer.command_reply.call_count)
+            await asyncio.Event().wait()
+
+        zeromq_server.serve.side_effect = serve
+        _serve_and_play(server, zeromq_server)
+        assert handled and handled[0] > 0
+
+    def test_idle_clock_waits_for_commands_instead_of_ticking(self, server, world, zeromq_server):
+        server.clock = MagicMock()
+        server.clock.time_to_next_tick.return_value = None
+        server.clock.tick.return_value = 100
+        bot_peer, _ = server._bots[0]
+        bot_peer.next_command.return_value = None
+        updates_while_idle = []
+
+        async def serve(add_peer, commands_received):
+            await asyncio.sleep(0.3)
+            updates_while_idle.append(world.update.call_count)
+            world.number_of_live_bots = 1
+            world.get_live_bots.return_value = [Armour(Tank(), world)]
+            bot_peer.next_command.return_value = Command(type=CommandType.FIRE)
+            commands_received()
+            bot_peer.next_command.return_value = None
+            await asyncio.Event().wait()
+
+        zeromq_server.serve.side_effect = serve
+        _serve_and_play(server, zeromq_server)
+        assert updates_while_idle == [0]
+        assert world.update.call_count > 0
+
+    def test_reset_puts_same_bots_in_a_cleared_world(self, server, world):
+        server.start()
+        peers = [p for p, _ in server._bots]
+        world.add_tank.reset_mock()
+        server.reset()
+        world.reset.assert_called_once_with()
+        assert not server.started()
+        assert [p for p, _ in server._bots] == peers
+        assert [c.args[1] for c in world.add_tank.call_args_list] == list(range(PLAYER_COUNT))
+        assert server.game_full()
+
     def test_new_bots_are_refused_when_game_started(self, server, world):
         reply = server.add_peer(_make_peer(ClientType.BOT, Id(name="bot", version=1)))
         game_info = GameInfo(
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import math
+
+import numpy as np
+import pytest
+
+from ibidem.codetanks.server.geometry import sector_hits, scan_radius, rotate, time_to_contact, time_to_boundary, \
+    time_to_stop
+
+RADIUS = 16
+ORIGIN = (200., 200.)
+DIRECTION = (1., 0.)
+
+
+class TestSectorHits:
+    def test_circles_are_tested_in_one_pass(self):
+        positions = [
+            (300., 200.),  # Straight ahead
+            (300., 240.),  # Inside a 60 degree sector
+            (300., 320.),  # Outside the sector
+            (100., 200.),  # Behind
+            (600., 200.),  # Too far away
+        ]
+        hits = sector_hits(ORIGIN, DIRECTION, math.radians(60), 300., positions, RADIUS)
+        assert hits.tolist() == [True, True, False, False, False]
+
+    def test_circle_at_origin_is_ignored(self):
+        hits = sector_hits(ORIGIN, DIRECTION, math.radians(60), 300., [ORIGIN], RADIUS)
+        assert hits.tolist() == [False]
+
+    def test_circle_touching_edge_is_caught(self):
+        edge = rotate(np.array(DIRECTION), math.radians(30)) * 100.
+        normal = rotate(edge, math.pi / 2) / 100.
+        position = np.array(ORIGIN) + edge + normal * (RADIUS - 1)
+        hits = sector_hits(ORIGIN, DIRECTION, math.radians(60), 300., [position], RADIUS)
+        assert hits.tolist() == [True]
+
+    def test_narrow_scan_catches_circle_near_center_line(self):
+        hits = sector_hits(ORIGIN, DIRECTION, 0., 300., [(300., 210.), (300., 220.)], RADIUS)
+        assert hits.tolist() == [True, False]
+
+    def test_direction_does_not_need_to_be_normalized(self):
+        hits = sector_hits(ORIGIN, (5., 5.), math.radians(10), 300., [(300., 300.)], RADIUS)
+        assert hits.tolist() == [True]
+
+
+class TestTimeToContact:
+    def test_pairs_are_tested_in_one_pass(self):
+        offsets = [
+            (-100., 0.),  # Closing in head on
+            (-100., 0.),  # Moving apart
+            (-100., 100.),  # Passing by
+            (-100., 0.),  # Standing still
+            (-10., 0.),  # Overlapping and closing in
+            (-10., 0.),  # Overlapping and moving apart
+            (-2 * RADIUS, 0.),  # Touching and closing in
+        ]
+        velocities = [(1., 0.), (-1., 0.), (1., 0.), (0., 0.), (1., 0.), (-1., 0.), (1., 0.)]
+        times = time_to_contact(offsets, velocities, 2 * RADIUS)
+        assert times.tolist() == [100. - 2 * RADIUS, np.inf, np.inf, np.inf, 0., np.inf, 0.]
+
+    def test_glancing_contact(self):
+        times = time_to_contact([(-100., 2 * RADIUS - 1.)], [(2., 0.)], 2 * RADIUS)
+        reach = math.sqrt((2 * RADIUS) ** 2 - (2 * RADIUS - 1.) ** 2)
+        assert times[0] == pytest.approx((100. - reach) / 2.)
+
+
+class TestTimeToStop:
+    def test_circles_meeting_head_on_stop_at_contact(self):
+        fractions, hits = time_to_stop([(100., 0.), (300., 0.)], [(300., 0.), (-300., 0.)], [1., 1.],
+                                       [False, False], [0, 1], [1, 0], 2 * RADIUS)
+        assert fractions.tolist() == pytest.approx([(100. - RADIUS) / 300.] * 2)
+        assert hits.tolist() == [1, 0]
+
+    def test_circle_goes_on_when_the_one_ahead_stops_early(self):
+        positions = [(100., 0.), (200., 0.), (300., 0.)]
+        displacements = [(200., 0.), (200., 0.), (0., 0.)]
+        fractions, hits = time_to_stop(positions, displacements, [1., 1., 0.], [False, False, False],
+                                       [0, 0, 1, 1], [1, 2, 0, 2], 2 * RADIUS)
+        assert fractions.tolist() == pytest.approx([(200. - 4 * RADIUS) / 200., (100. - 2 * RADIUS) / 200., 0.])
+        assert hits.tolist() == [1, 2, -1]
+
+    def test_blocked_circle_keeps_its_obstacle_on_a_tie(self):
+        fractions, hits = time_to_stop([(100., 0.), (200., 0.)], [(100. - 2 * RADIUS, 0.), (0., 0.)], [1., 0.],
+                                       [True, False], [0], [1], 2 * RADIUS)
+        assert fractions.tolist() == [1., 0.]
+        assert hits.tolist() == [-1, -1]
+
+
+class TestTimeToBoundary:
+    def test_circles_are_tested_in_one_pass(self):
+        positions = [(100., 100.), (100., 100.), (100., 100.), (400., 400.)]
+        velocities = [(1., 0.), (0., -2.), (0., 0.), (1., 1.)]
+        times = time_to_boundary(positions, velocities, RADIUS, 500, 450)
+        assert times.tolist() == [400. - RADIUS, (100. - RADIUS) / 2., np.inf, 50. - RADIUS]
+
+    def test_radius_can_be_given_per_circle(self):
+        times = time_to_boundary([(100., 100.), (100., 100.)], [(-1., 0.), (-1., 0.)], [RADIUS, 2.], 500, 500)
+        assert times.tolist() == [100. - RADIUS, 98.]
+
+
+@pytest.mark.parametrize("theta, factor", (
+        (math.pi, 0.0),
+        (math.pi / 2, 0.5),
+        (0.0, 1.0),
+))
+def test_scan_radius(theta, factor):
+    assert scan_radius(theta, 500) == pytest.approx(500 * factor, abs=2.)
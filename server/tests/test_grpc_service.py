@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import grpc
+import pytest
+from mock import MagicMock
+
+from ibidem.codetanks.domain.messages_pb2 import Registration, ClientType, Id, Command, CommandType, CommandReply, \
+    CommandResult, Event, EventRequest, RegistrationReply, RegistrationResult, PlayUpdate, GameData, Tank
+from ibidem.codetanks.domain.messages_pb2_grpc import CodeTanksStub
+from ibidem.codetanks.server.grpc_service import GrpcPeer, CodeTanksServicer, add_servicer_to_server, \
+    _encoded_play_update
+from ibidem.codetanks.server.peer import EncodedEvent, EventQueue
+
+PEER_ID = "peer-id"
+
+
+def _registration(client_type=ClientType.BOT):
+    return Registration(client_type=client_type, id=Id(name="test", version=1))
+
+
+@asynccontextmanager
+async def _served(game):
+    """A stub for a gRPC server running on the loop, handing peers and commands to game"""
+    server = grpc.aio.server()
+    add_servicer_to_server(CodeTanksServicer(game.add_peer, game.handle_commands), server)
+    port = server.add_insecure_port("localhost:0")
+    await server.start()
+    try:
+        async with grpc.aio.insecure_channel("localhost:%d" % port) as channel:
+            yield CodeTanksStub(channel)
+    finally:
+        await server.stop(None)
+
+
+class TestGrpcPeer(object):
+    def test_next_command_is_none_when_nothing_queued(self):
+        assert GrpcPeer(_registration()).next_command() is None
+
+    def test_reply_awaited_until_command_handled(self):
+        peer = GrpcPeer(_registration())
+        command = Command(type=CommandType.FIRE)
+
+        async def run():
+            peer.queue_command(command)
+            waiting = asyncio.create_task(peer.next_reply())
+            await asyncio.sleep(0)
+            assert not waiting.done()
+            assert peer.next_command() == command
+            peer.command_reply(CommandReply(result=CommandResult.ACCEPTED))
+            return await waiting
+
+        assert asyncio.run(run()) == CommandReply(result=CommandResult.ACCEPTED)
+
+    def test_event_stream_ends_when_peer_falls_too_far_behind(self):
+        peer = GrpcPeer(_registration())
+        peer.event_queue = EventQueue(1, disconnect_after=0.0)
+
+        async def run():
+            peer.handle_event(EncodedEvent(Event(sequence_id=1)))
+            peer.handle_event(EncodedEvent(Event(sequence_id=2)))
+            await asyncio.sleep(0.001)
+            peer.handle_event(EncodedEvent(Event(sequence_id=3)))
+            return [event async for event in peer.get_events()]
+
+        assert asyncio.run(asyncio.wait_for(run(), 5)) == []
+
+
+class TestCodeTanksServicer(object):
+    @pytest.fixture
+    def context(self):
+        return MagicMock()
+
+    def test_command_handled_as_soon_as_it_arrives(self, context):
+        peer = GrpcPeer(_registration())
+
+        def commands_received():
+            command = peer.next_command()
+            peer.command_reply(CommandReply(result=CommandResult.ACCEPTED if command else CommandResult.BUSY))
+
+        async def run():
+            servicer = CodeTanksServicer(MagicMock(), commands_received)
+            servicer._peers[PEER_ID] = peer
+            return await servicer.SendCommand(Command(type=CommandType.FIRE, peer_id=PEER_ID), context)
+
+        assert asyncio.run(run()).result == CommandResult.ACCEPTED
+
+    def test_event_streams_are_not_limited_by_threads(self, context):
+        stream_count = 50
+        peers = []
+
+        def add_peer(p):
+            peers.append(p)
+            return RegistrationReply(result=RegistrationResult.SUCCESS)
+
+        async def stream(servicer, peer_id):
+            async for event in servicer.GetEvent(EventRequest(peer_id=peer_id), context):
+                return event
+
+        async def run():
+            servicer = CodeTanksServicer(add_peer, MagicMock())
+            replies = [await servicer.Register(_registration(ClientType.VIEWER), context) for _ in range(stream_count)]
+            streams = [asyncio.create_task(stream(servicer, reply.peer_id)) for reply in replies]
+            await asyncio.sleep(0)
+            event = EncodedEvent(Event(sequence_id=1))
+            for p in peers:
+                p.handle_event(event)
+            return await asyncio.wait_for(asyncio.gather(*streams), 5)
+
+        assert [event.event for event in asyncio.run(run())] == [Event(sequence_id=1)] * stream_count
+
+
+class TestPlay(object):
+    @pytest.fixture
+    def game(self):
+        """A stand-in for the game server, accepting every bot and every command"""
+        game = MagicMock()
+        game.peers = []
+
+        def add_peer(p):
+            game.peers.append(p)
+            return RegistrationReply(result=RegistrationResult.SUCCESS)
+
+        def commands_received():
+            for p in game.peers:
+                command = p.next_command()
+                if command is not None:
+                    p.command_reply(CommandReply(result=CommandResult.ACCEPTED))
+                    p.handle_event(EncodedEvent(Event(sequence_id=command.value)))
+
+        game.add_peer.side_effect = add_peer
+        game.handle_commands.side_effect = commands_received
+        return game
+
+    def test_replies_and_events_on_one_stream_in_order(self, game):
+        async def run():
+            async with _served(game) as stub:
+                reply = await stub.Register(_registration())
+                game.peers[0].handle_event(EncodedEvent(Event(sequence_id=1)))
+                stream = stub.Play()
+                await stream.write(Command(type=CommandType.SCAN, value=2, peer_id=reply.peer_id))
+                updates = [await stream.read() for _ in range(3)]
+                await stream.write(Command(type=CommandType.SCAN, value=3))
+                updates += [await stream.read() for _ in range(2)]
+                stream.cancel()
+                return updates
+
+        updates = asyncio.run(asyncio.wait_for(run(), 5))
+        assert updates == [
+            PlayUpdate(event=Event(sequence_id=1)),
+            PlayUpdate(command_reply=CommandReply(result=CommandResult.ACCEPTED)),
+            PlayUpdate(event=Event(sequence_id=2)),
+            PlayUpdate(command_reply=CommandReply(result=CommandResult.ACCEPTED)),
+            PlayUpdate(event=Event(sequence_id=3)),
+        ]
+
+    def test_events_read_by_one_stream_at_a_time(self, game):
+        async def refused(call):
+            with pytest.raises(grpc.aio.AioRpcError) as e:
+                await call
+            return e.value.code()
+
+        async def run():
+            async with _served(game) as stub:
+                reply = await stub.Register(_registration())
+                peer = game.peers[0]
+                play = stub.Play()
+                await play.write(Command(type=CommandType.SCAN, value=2, peer_id=reply.peer_id))
+                await play.read()
+                codes = [
+                    await refused(stub.GetEvent(EventRequest(peer_id=reply.peer_id)).read()),
+                    await refused(stub.SendCommand(Command(type=CommandType.FIRE, peer_id=reply.peer_id))),
+                ]
+                play.cancel()
+                while peer.playing:
+                    await asyncio.sleep(0.01)
+                command_reply = await stub.SendCommand(Command(type=CommandType.FIRE, peer_id=reply.peer_id))
+                events = stub.GetEvent(EventRequest(peer_id=reply.peer_id))
+                await events.read()
+                play = stub.Play()
+                await play.write(Command(type=CommandType.SCAN, value=4, peer_id=reply.peer_id))
+                codes.append(await refused(play.read()))
+                events.cancel()
+                return codes, command_reply
+
+        codes, command_reply = asyncio.run(asyncio.wait_for(run(), 5))
+        assert codes == [grpc.StatusCode.FAILED_PRECONDITION] * 3
+        assert command_reply.result == CommandResult.ACCEPTED
+
+    def test_stream_aborted_when_handling_a_command_fails(self, game):
+        def commands_received():
+            raise TypeError("FIRE takes no value")
+
+        game.handle_commands.side_effect = commands_received
+
+        async def run():
+            async with _served(game) as stub:
+                reply = await stub.Register(_registration())
+                play = stub.Play()
+                await play.write(Command(type=CommandType.FIRE, value=1, peer_id=reply.peer_id))
+                with pytest.raises(grpc.aio.AioRpcError) as e:
+                    await play.read()
+                return e.value.code(), e.value.details(), game.peers[0].playing
+
+        code, details, playing = asyncio.run(asyncio.wait_for(run(), 5))
+        assert code == grpc.StatusCode.INTERNAL
+        assert "FIRE takes no value" in details
+        assert not playing
+
+    def test_event_update_encoded_like_protobuf(self):
+        event = Event(sequence_id=300, game_data=GameData(tanks=[Tank(id=1, health=100)] * 20))
+        assert _encoded_play_update(EncodedEvent(event)) == PlayUpdate(event=event).SerializeToString()
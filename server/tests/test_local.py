@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import pytest
+from ibidem.codetanks.domain.messages_pb2 import Event, Command, CommandType, CommandReply, CommandResult, \
+    ClientType, BotStatus, GameOver
+from mock import MagicMock
+
+from ibidem.codetanks.server.clock import EventClock, FixedStepClock
+from ibidem.codetanks.server.constants import PLAYER_COUNT
+from ibidem.codetanks.server.local import LocalBot, LocalPeer, LocalGame
+from ibidem.codetanks.server.peer import EncodedEvent
+from ibidem.codetanks.server.sample_bots import SittingDuck, Hunter
+from ibidem.codetanks.server.world import World
+
+
+class Recorder(LocalBot):
+    """Moves once, and remembers everything it is told"""
+
+    def __init__(self):
+        self.events = []
+        self.replies = []
+
+    def handle_event(self, event):
+        self.events.append(event)
+        if event.WhichOneof("event") == "game_started":
+            return Command(type=CommandType.MOVE, value=10)
+        return None
+
+    def handle_reply(self, reply):
+        self.replies.append(reply)
+
+
+@pytest.fixture
+def world():
+    return World(500, 500, False)
+
+
+class TestLocalPeer(object):
+    def test_is_a_bot(self):
+        peer = LocalPeer(LocalBot(), "test")
+        assert peer.client_type == ClientType.BOT
+        assert peer.id.name == "test"
+
+    def test_event_handed_to_bot_without_serializing(self):
+        bot = MagicMock(LocalBot, instance=True)
+        bot.handle_event.return_value = None
+        event = EncodedEvent(Event(sequence_id=1))
+        LocalPeer(bot, "test").handle_event(event)
+        bot.handle_event.assert_called_once_with(event.event)
+        assert event._data is None
+
+    def test_command_from_bot_is_next_command(self):
+        bot = MagicMock(LocalBot, instance=True)
+        peer = LocalPeer(bot, "test")
+        bot.handle_event.return_value = Command(type=CommandType.FIRE)
+        peer.handle_event(EncodedEvent(Event()))
+        bot.handle_event.return_value = None
+        peer.handle_event(EncodedEvent(Event()))
+        assert peer.next_command() == Command(type=CommandType.FIRE)
+        assert peer.next_command() is None
+
+    def test_newer_command_replaces_waiting_one(self):
+        bot = MagicMock(LocalBot, instance=True)
+        peer = LocalPeer(bot, "test")
+        for command_type in (CommandType.FIRE, CommandType.SCAN):
+            bot.handle_event.return_value = Command(type=command_type)
+            peer.handle_event(EncodedEvent(Event()))
+        assert peer.next_command() == Command(type=CommandType.SCAN)
+
+    def test_reply_handed_to_bot(self):
+        bot = MagicMock(LocalBot, instance=True)
+        reply = CommandReply(result=CommandResult.ACCEPTED)
+        LocalPeer(bot, "test").command_reply(reply)
+        bot.handle_reply.assert_called_once_with(reply)
+
+
+class TestLocalGame(object):
+    def test_game_needs_room_for_every_bot(self, world):
+        with pytest.raises(ValueError):
+            LocalGame(world, FixedStepClock(16), [LocalBot() for _ in range(PLAYER_COUNT + 1)])
+
+    def test_bots_are_named_by_class(self, world):
+        game = LocalGame(world, FixedStepClock(16), [SittingDuck(), Recorder()])
+        assert [peer.id.name for peer in game.peers] == ["SittingDuck", "Recorder"]
+
+    def test_commands_from_events_run_on_next_step(self, world):
+        recorder = Recorder()
+        game = LocalGame(world, FixedStepClock(16), [recorder, SittingDuck()])
+        game.start()
+        assert recorder.events[0].WhichOneof("event") == "game_started"
+        assert recorder.events[0].game_started.you.id == 0
+        assert recorder.replies == []
+        game.step()
+        assert recorder.replies == [CommandReply(result=CommandResult.ACCEPTED)]
+        assert world.get_tank(0).status == BotStatus.MOVING
+        while recorder.events[-1].WhichOneof("event") != "movement_complete":
+            game.step()
+        assert game.game_time > 0
+
+    def test_run_ends_at_max_time(self, world):
+        game = LocalGame(world, EventClock(world), [SittingDuck() for _ in range(PLAYER_COUNT)])
+        game.run(5000)
+        assert game.game_time == 5000
+        assert not game.finished()
+
+    def test_run_ends_when_one_is_left(self, world):
+        game = LocalGame(world, EventClock(world), [SittingDuck(), Hunter()])
+        game.run(60000)
+        assert game.finished()
+        assert world.get_tank(1).status != BotStatus.DEAD
+
+    def test_bots_are_told_the_winner_when_run_ends(self, world):
+        recorders = [Recorder(), Recorder()]
+        game = LocalGame(world, EventClock(world), [Hunter()] + recorders)
+        game.run(120000)
+        assert game.finished()
+        for recorder in recorders:
+            assert recorder.events[-1].WhichOneof("event") == "game_over"
+            assert recorder.events[-1].game_over.winner.id == 0
+
+    def test_bots_are_told_game_is_over_without_winner_at_max_time(self, world):
+        recorders = [Recorder(), Recorder()]
+        LocalGame(world, EventClock(world), recorders).run(5000)
+        for recorder in recorders:
+            assert recorder.events[-1].game_over == GameOver()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+import zmq
+import zmq.asyncio
+from ibidem.codetanks.domain.messages_pb2 import ClientType, Id, RegistrationResult, Command, CommandType, \
+    BotStatus, Registration, RegistrationReply, Event
+from mock import MagicMock, create_autospec, patch
+
+from ibidem.codetanks.server import peer
+from ibidem.codetanks.server.clock import FixedStepClock
+from ibidem.codetanks.server.constants import PLAYER_COUNT
+from ibidem.codetanks.server.game_server import GameServer
+from ibidem.codetanks.server.match_manager import MatchManager
+from ibidem.codetanks.server.world import World
+from ibidem.codetanks.server.zeromq import ZeroMQServer, Channel, ChannelType
+
+MATCH_COUNT = 3
+
+
+def _make_peer(client_type):
+    m = MagicMock(peer.Peer, instance=True)
+    m.client_type = client_type
+    m.id = Id(name="test", version=1)
+    m.next_command.return_value = None
+    return m
+
+
+@pytest.fixture
+def zeromq_server():
+    return MagicMock(ZeroMQServer, instance=True)
+
+
+@pytest.fixture
+def manager(zeromq_server):
+    def new_match():
+        world = World(500, 500, False)
+        return GameServer(world, timedelta(seconds=1), FixedStepClock(100), 30)
+
+    return MatchManager(zeromq_server, new_match, MATCH_COUNT, False)
+
+
+class TestRouting(object):
+    def test_matches_are_independent(self, manager):
+        worlds = {id(match._world) for match in manager.matches}
+        assert len(worlds) == MATCH_COUNT
+
+    def test_bots_fill_one_match_before_the_next(self, manager):
+        for _ in range(PLAYER_COUNT + 1):
+            reply = manager.add_peer(_make_peer(ClientType.BOT))
+            assert reply.result == RegistrationResult.SUCCESS
+        assert manager.matches[0].game_full()
+        assert len(manager.matches[1]._bots) == 1
+        assert len(manager.matches[2]._bots) == 0
+
+    def test_bots_refused_when_all_matches_are_full(self, manager):
+        for _ in range(PLAYER_COUNT * MATCH_COUNT):
+            manager.add_peer(_make_peer(ClientType.BOT))
+        reply = manager.add_peer(_make_peer(ClientType.BOT))
+        assert reply.result == RegistrationResult.FAILURE
+        assert reply.game_info.player_count == PLAYER_COUNT
+
+    def test_viewers_watch_the_first_match(self, manager):
+        viewer = _make_peer(ClientType.VIEWER)
+        reply = manager.add_peer(viewer)
+        assert reply.result == RegistrationResult.SUCCESS
+        assert manager.matches[0]._viewers == [viewer]
+        assert all(not match._viewers for match in manager.matches[1:])
+
+    def test_commands_handled_in_every_match(self, manager):
+        peers = [_make_peer(ClientType.BOT) for _ in range(PLAYER_COUNT + 1)]
+        for p in peers:
+            manager.add_peer(p)
+        peers[0].next_command.return_value = Command(type=CommandType.FIRE)
+        peers[-1].next_command.return_value = Command(type=CommandType.FIRE)
+        manager.handle_commands()
+        peers[0].command_reply.assert_called_once()
+        peers[-1].command_reply.assert_called_once()
+        peers[1].command_reply.assert_not_called()
+
+
+class TestBroadcasts(object):
+    @pytest.fixture
+    def transport(self, request):
+        base_url = "inproc://%s" % request.node.name
+        with patch.object(Channel, "_create_url", lambda self, host, port=None: "%s/%d" % (base_url, port)):
+            channels = [Channel(ChannelType.PUBLISH, 1), Channel(ChannelType.REPLY, 2, Registration),
+                        Channel(ChannelType.PUBLISH, 3), Channel(ChannelType.ROUTER, 4)]
+            yield ZeroMQServer(*channels), base_url
+            for channel in channels:
+                channel.zmq_socket.close(linger=0)
+
+    @staticmethod
+    def _subscribe_bots(zeromq_server, manager, base_url, count):
+        """Register count bots, and return sockets subscribed to the topics in their replies"""
+        async def register():
+            ctx = zmq.asyncio.Context.shadow(zmq.Context.instance().underlying)
+            replies = []
+            for _ in range(count):
+                socket = ctx.socket(zmq.REQ)
+                socket.connect(base_url + "/2")
+                await socket.send(Registration(client_type=ClientType.BOT, id=Id(name="bot", version=1))
+                                  .SerializeToString())
+                replies.append(RegistrationReply.FromString(await socket.recv()))
+                socket.close(linger=0)
+            return replies
+
+        async def run():
+            serving = asyncio.create_task(zeromq_server.serve(manager.add_peer, manager.handle_commands))
+            try:
+                return await asyncio.wait_for(register(), 5)
+            finally:
+                serving.cancel()
+
+        subscribers = []
+        for reply in asyncio.run(run()):
+            subscriber = zmq.Context.instance().socket(zmq.SUB)
+            for topic in reply.event_topics:
+                subscriber.set(zmq.SUBSCRIBE, topic.encode())
+            subscriber.connect(reply.event_url)
+            subscribers.append(subscriber)
+        return subscribers
+
+    @staticmethod
+    def _received(subscriber):
+        events = []
+        while subscriber.poll(100):
+            events.append(Event.FromString(subscriber.recv_multipart()[-1]).WhichOneof("event"))
+        return events
+
+    def test_game_over_only_reaches_bots_in_the_match(self, transport):
+        zeromq_server, base_url = transport
+
+        def new_match():
+            return GameServer(World(500, 500, False), timedelta(seconds=1), FixedStepClock(100), 30)
+
+        manager = MatchManager(zeromq_server, new_match, 2, False)
+        subscribers = self._subscribe_bots(zeromq_server, manager, base_url, PLAYER_COUNT + 1)
+        try:
+            manager.matches[0]._end_game()
+            assert [self._received(s) for s in subscribers] == [["game_over"]] * PLAYER_COUNT + [[]]
+            manager.matches[1]._end_game()
+            assert [self._received(s) for s in subscribers] == [[]] * PLAYER_COUNT + [["game_over"]]
+        finally:
+            for subscriber in subscribers:
+                subscriber.close(linger=0)
+
+
+class TestRun(object):
+    def test_all_matches_played_on_one_loop(self, manager, zeromq_server):
+        async def serve(add_peer, commands_received):
+            for _ in range(PLAYER_COUNT * MATCH_COUNT):
+                await asyncio.sleep(0)
+                add_peer(_make_peer(ClientType.BOT))
+            while not all(match.started() for match in manager.matches):
+                await asyncio.sleep(0.01)
+            for match in manager.matches:
+                for _, bot in match._bots[1:]:
+                    bot.tank.status = BotStatus.DEAD
+            await asyncio.Event().wait()
+
+        zeromq_server.serve.side_effect = serve
+        asyncio.run(asyncio.wait_for(manager.run_async(), 30))
+        zeromq_server.serve.assert_called_once_with(manager.add_peer, manager.handle_commands)
+        for match in manager.matches:
+            assert match.started()
+            assert match.finished()
+
+    def test_persistent_matches_start_again_with_same_peers(self, zeromq_server):
+        match = create_autospec(GameServer, instance=True)
+        played = []
+
+        async def play_match():
+            played.append(True)
+            if len(played) == 3:
+                raise RuntimeError("Stop playing")
+
+        match.play_match.side_effect = play_match
+        manager = MatchManager(zeromq_server, lambda: match, 1, True)
+        with pytest.raises(RuntimeError):
+            asyncio.run(manager.run_async())
+        assert len(played) == 3
+        assert match.reset.call_count == 2
+
+    def test_serving_stopped_when_a_match_fails(self, manager, zeromq_server):
+        serving_cancelled = []
+
+        async def serve(add_peer, commands_received):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                serving_cancelled.append(True)
+                raise
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError("Match failed")
+
+        zeromq_server.serve.side_effect = serve
+        manager.matches[1].play_match = fail
+        with pytest.raises(RuntimeError):
+            asyncio.run(manager.run_async())
+        assert serving_cancelled == [True]
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import pytest
+from mock import MagicMock
+
+from ibidem.codetanks.domain.messages_pb2 import Event, GameData, GameDataDelta, ShotFired, CommandReply
+from ibidem.codetanks.server.peer import EncodedEvent, EventQueue
+
+
+def _frame(sequence_id):
+    return EncodedEvent(Event(game_data=GameData(), sequence_id=sequence_id))
+
+
+def _delta(sequence_id):
+    return EncodedEvent(Event(game_data_delta=GameDataDelta(), sequence_id=sequence_id))
+
+
+def _gameplay(sequence_id):
+    return EncodedEvent(Event(shot_fired=ShotFired(), sequence_id=sequence_id))
+
+
+def _drain(queue):
+    items = []
+    while (item := queue.get()) is not None:
+        items.append(item)
+    return items
+
+
+class TestEventQueue(object):
+    @pytest.fixture
+    def clock(self):
+        clock = MagicMock()
+        clock.return_value = 0.0
+        return clock
+
+    def test_items_come_out_in_order(self):
+        queue = EventQueue(10)
+        items = [_gameplay(1), _frame(2), CommandReply(), _gameplay(3)]
+        for item in items:
+            queue.put(item)
+        assert _drain(queue) == items
+
+    def test_keyframe_replaces_waiting_frame(self):
+        queue = EventQueue(10)
+        for item in (_delta(1), _gameplay(2), _frame(3), _frame(4)):
+            queue.put(item)
+        assert [item.event.sequence_id for item in _drain(queue)] == [2, 4]
+        assert queue.conflated == 2
+        assert not queue.keyframe_wanted
+
+    def test_waiting_keyframe_is_never_replaced_by_delta(self):
+        queue = EventQueue(10)
+        for item in (_frame(1), _gameplay(2), _delta(3)):
+            queue.put(item)
+        assert [item.event.sequence_id for item in _drain(queue)] == [1, 2]
+        assert queue.conflated == 1
+        assert queue.keyframe_wanted
+
+    def test_deltas_dropped_until_next_keyframe(self):
+        queue = EventQueue(10)
+        queue.put(_delta(1))
+        queue.put(_delta(2))
+        assert queue.get().event.sequence_id == 1
+        queue.put(_delta(3))
+        assert queue.get() is None
+        queue.put(_frame(4))
+        assert not queue.keyframe_wanted
+        assert queue.get().event.sequence_id == 4
+        queue.put(_delta(5))
+        assert [item.event.sequence_id for item in _drain(queue)] == [5]
+        assert queue.conflated == 2
+
+    def test_frames_kept_when_not_conflating(self):
+        queue = EventQueue(10, conflate_frames=False)
+        for item in (_frame(1), _delta(2)):
+            queue.put(item)
+        assert len(_drain(queue)) == 2
+        assert queue.conflated == 0
+
+    def test_frame_sent_after_drain_is_not_conflated(self):
+        queue = EventQueue(10)
+        queue.put(_frame(1))
+        queue.get()
+        queue.put(_frame(2))
+        assert [item.event.sequence_id for item in _drain(queue)] == [2]
+        assert queue.conflated == 0
+
+    def test_gameplay_events_dropped_beyond_max_size(self):
+        queue = EventQueue(2)
+        for i in range(5):
+            queue.put(_gameplay(i))
+        queue.put(_frame(5))
+        assert [item.event.sequence_id for item in _drain(queue)] == [0, 1, 5]
+        assert queue.dropped == 3
+
+    def test_disconnected_when_full_for_too_long(self, clock):
+        queue = EventQueue(1, disconnect_after=5.0, clock=clock)
+        queue.put(_gameplay(0))
+        queue.put(_gameplay(1))
+        clock.return_value = 5.0
+        queue.put(_gameplay(2))
+        assert not queue.disconnected
+        clock.return_value = 5.1
+        queue.put(_gameplay(3))
+        assert queue.disconnected
+        assert queue.get() is None
+        queue.put(_gameplay(4))
+        assert len(queue) == 0
+
+    def test_catching_up_resets_disconnect_timer(self, clock):
+        queue = EventQueue(1, disconnect_after=5.0, clock=clock)
+        queue.put(_gameplay(0))
+        queue.put(_gameplay(1))
+        queue.get()
+        queue.put(_gameplay(2))
+        clock.return_value = 10.0
+        queue.put(_gameplay(3))
+        assert not queue.disconnected
+
+    def test_never_disconnected_without_timeout(self, clock):
+        queue = EventQueue(1, clock=clock)
+        queue.put(_gameplay(0))
+        for t in range(100):
+            clock.return_value = float(t)
+            queue.put(_gameplay(t))
+        assert not queue.disconnected
+        assert queue.dropped == 100
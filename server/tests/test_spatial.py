@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import pytest
+
+from ibidem.codetanks.server.spatial import SpatialHash
+
+CELL_SIZE = 32
+
+
+@pytest.fixture
+def index():
+    return SpatialHash(CELL_SIZE)
+
+
+class TestSpatialHash:
+    def test_item_is_found_near_its_position(self, index):
+        index.update("a", 100, 100)
+        assert list(index.query(110, 90, 16)) == ["a"]
+
+    def test_item_is_not_found_far_away(self, index):
+        index.update("a", 100, 100)
+        assert list(index.query(300, 300, 16)) == []
+
+    def test_query_covers_neighbouring_cells(self, index):
+        index.update("a", CELL_SIZE - 1, 10)
+        index.update("b", CELL_SIZE + 1, 10)
+        assert sorted(index.query(CELL_SIZE, 10, 2)) == ["a", "b"]
+
+    def test_moved_item_is_only_found_at_new_position(self, index):
+        index.update("a", 100, 100)
+        index.update("a", 400, 400)
+        assert list(index.query(100, 100, 16)) == []
+        assert list(index.query(400, 400, 16)) == ["a"]
+        assert len(index) == 1
+
+    def test_removed_item_is_not_found(self, index):
+        index.update("a", 100, 100)
+        index.remove("a")
+        assert list(index.query(100, 100, 16)) == []
+        assert "a" not in index
+
+    def test_negative_positions_are_indexed(self, index):
+        index.update("a", -10, -10)
+        assert list(index.query(0, 0, 16)) == ["a"]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from ibidem.codetanks.server.config import Engine
+from ibidem.codetanks.server.constants import PLAYER_COUNT
+from ibidem.codetanks.server.sample_bots import Hunter
+from ibidem.codetanks.server.tournament import load_bot, play_match, round_robin, Match, Standings, Tournament, \
+    Format
+
+MAX_TIME = 60000
+BOTS = ("Hunter", "Randomizer", "SittingDuck", "ibidem.codetanks.server.sample_bots:Hunter",
+        "ibidem.codetanks.server.sample_bots:Randomizer")
+
+
+class TestLoadBot(object):
+    def test_sample_bot_by_name(self):
+        assert load_bot("Hunter") is Hunter
+
+    def test_bot_by_module_and_class(self):
+        assert load_bot("ibidem.codetanks.server.sample_bots:Hunter") is Hunter
+
+    def test_unknown_bot(self):
+        with pytest.raises(AttributeError):
+            load_bot("NoSuchBot")
+
+
+class TestPlayMatch(object):
+    @pytest.fixture(params=(Engine.OBJECT, Engine.ARRAY))
+    def engine(self, request):
+        return request.param
+
+    def test_hunter_beats_sitting_ducks(self, engine):
+        match = Match(3, 1, ("SittingDuck", "Hunter", "SittingDuck", "SittingDuck"), 42)
+        result = play_match(match, engine, MAX_TIME)
+        assert result["winner"] == "Hunter"
+        assert result["survivors"] == ["Hunter"]
+        assert result["match"] == 3
+        assert result["round"] == 1
+        assert 0 < result["game_time"] < MAX_TIME
+
+    def test_match_without_winner_ends_at_time_limit(self, engine):
+        match = Match(0, 0, ("SittingDuck",) * PLAYER_COUNT, 42)
+        result = play_match(match, engine, MAX_TIME)
+        assert result["winner"] is None
+        assert len(result["survivors"]) == PLAYER_COUNT
+        assert result["game_time"] == MAX_TIME
+
+    def test_same_seed_gives_same_result(self):
+        match = Match(0, 0, ("Hunter", "Randomizer", "Hunter", "Randomizer"), 7)
+        assert play_match(match, Engine.OBJECT, MAX_TIME) == play_match(match, Engine.OBJECT, MAX_TIME)
+
+
+class TestPairings(object):
+    def test_round_robin_plays_every_group_once_per_round(self):
+        bots = ["a", "b", "c", "d", "e"]
+        groups = round_robin(bots, 2)
+        assert len(groups) == 10
+        assert len({group for _, group in groups}) == 5
+        assert [round for round, _ in groups] == [0] * 5 + [1] * 5
+
+    def test_swiss_groups_bots_by_wins(self):
+        bots = ["a", "b", "c", "d", "e", "f", "g", "h"]
+        standings = Standings(bots)
+        for winner in ("h", "g", "f", "e"):
+            standings.record({"winner": winner})
+        assert [set(group) for group in standings.swiss_round()] == [{"e", "f", "g", "h"}, {"a", "b", "c", "d"}]
+
+    def test_swiss_byes_go_round(self):
+        bots = ["a", "b", "c", "d", "e"]
+        standings = Standings(bots)
+        standings.record({"winner": "a"})
+        sitting_out = []
+        for _ in bots:
+            playing = {bot for group in standings.swiss_round() for bot in group}
+            sitting_out.extend(set(bots) - playing)
+        assert sorted(sitting_out) == bots
+
+
+class TestTournament(object):
+    def test_too_few_bots(self):
+        with pytest.raises(ValueError):
+            Tournament(list(BOTS[:PLAYER_COUNT - 1]), Format.ROUND_ROBIN, 1, Engine.OBJECT, MAX_TIME, 1)
+
+    def test_bots_enter_once(self):
+        with pytest.raises(ValueError):
+            Tournament(["Hunter"] * PLAYER_COUNT, Format.ROUND_ROBIN, 1, Engine.OBJECT, MAX_TIME, 1)
+
+    @pytest.mark.parametrize("tournament_format, matches", ((Format.ROUND_ROBIN, 10), (Format.SWISS, 2)))
+    def test_results_written_as_json_lines(self, tournament_format, matches):
+        tournament = Tournament(list(BOTS), tournament_format, 2, Engine.OBJECT, MAX_TIME, 1)
+        results_file = io.StringIO()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            standings = tournament.run(executor, results_file)
+        results = [json.loads(line) for line in results_file.getvalue().splitlines()]
+        assert sorted(result["match"] for result in results) == list(range(matches))
+        winners = [result["winner"] for result in results if result["winner"] is not None]
+        assert sum(standings.wins.values()) == len(winners)
+
+
+if __name__ == "__main__":
+    pass
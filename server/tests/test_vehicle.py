@@ -7,7 +7,8 @@ from mock import create_autospec, call
 
 from ibidem.codetanks.domain.messages_pb2 import Tank, Id, Point, BotStatus, Bullet, Arena, Death, Event, ScanComplete
 from ibidem.codetanks.server.commands import Idle
-from ibidem.codetanks.server.constants import TANK_RADIUS, BULLET_RADIUS, MAX_HEALTH, BULLET_DAMAGE
+from ibidem.codetanks.server.constants import TANK_RADIUS, BULLET_RADIUS, MAX_HEALTH, BULLET_DAMAGE, TANK_SPEED, \
+    BULLET_SPEED
 from ibidem.codetanks.server.vehicle import Armour, Missile
 from ibidem.codetanks.server.world import World
 
@@ -23,6 +24,7 @@ def world():
     world = create_autospec(World)
     world.arena = Arena(width=500, height=500)
     world.is_collision.return_value = False
+    world.sweep.return_value = (False, 1.0)
     return world
 
 
@@ -93,25 +95,39 @@ class TestVehicle(Shared):
         assert missile.direction.x == bullet.direction.x
         assert missile.direction.y == bullet.direction.y
 
-    def test_setting_position_is_applied_to_entity(self, armour, tank, missile, bullet):
+    def test_setting_position_is_applied_to_entity_snapshot(self, armour, tank, missile, bullet):
         new_position = Point2(20, 40)
         for vehicle, entity in (armour, tank), (missile, bullet):
             vehicle.position = new_position
+            assert vehicle.entity is entity
             assert entity.position.x == new_position.x
             assert entity.position.y == new_position.y
 
-    def test_setting_direction_is_applied_to_entity(self, armour, tank, missile, bullet):
+    def test_setting_direction_is_applied_to_entity_snapshot(self, armour, tank, missile, bullet):
         new_direction = Point2(1, -1)
+        expected = new_direction.normalized()
         for vehicle, entity in (armour, tank), (missile, bullet):
             vehicle.direction = new_direction
-            assert entity.direction.x == new_direction.x
-            assert entity.direction.y == new_direction.y
+            assert vehicle.entity is entity
+            assert entity.direction.x == pytest.approx(expected.x)
+            assert entity.direction.y == pytest.approx(expected.y)
 
-    def test_setting_turret_is_applied_to_entity(self, armour, tank):
+    def test_setting_turret_is_applied_to_entity_snapshot(self, armour, tank):
         new_turret = Point2(1, -1)
+        expected = new_turret.normalized()
         armour.turret = new_turret
-        assert tank.turret.x == new_turret.x
-        assert tank.turret.y == new_turret.y
+        assert armour.entity is tank
+        assert tank.turret.x == pytest.approx(expected.x)
+        assert tank.turret.y == pytest.approx(expected.y)
+
+    def test_entity_is_not_written_until_snapshot(self, armour, tank):
+        armour.position = Point2(20, 40)
+        assert tank.position.x == self.initial_x
+        assert armour.entity.position.x == 20
+
+    def test_vehicles_have_no_instance_dict(self, armour, missile):
+        for vehicle in armour, missile:
+            assert not hasattr(vehicle, "__dict__")
 
     def test_setting_status_is_applied_to_entity(self, armour, tank):
         status = BotStatus.MOVING
@@ -140,6 +156,14 @@ class TestMove(Shared):
         assert armour.position.x == target_x
         assert armour.position.y == self.initial_y
 
+    def test_move_does_not_overshoot_target(self, armour):
+        distance = 10
+        armour.move(distance)
+        armour.update(1000)
+        assert isinstance(armour._command, Idle)
+        assert armour.position.x == self.initial_x + distance
+        assert armour.position.y == self.initial_y
+
     def test_move_backwards_is_illegal(self, armour):
         armour.move(-10)
         armour.update(TICKS)
@@ -150,14 +174,14 @@ class TestMove(Shared):
     def test_world_is_checked_for_valid_position(self, armour, world):
         armour.move(1)
         armour.update(10)
-        world.is_collision.assert_called_once_with(armour)
+        world.sweep.assert_called_once_with(armour, self.initial_x + 1, self.initial_y)
 
     def test_world_is_checked_for_valid_position_for_missile(self, missile, world):
         missile.update(TICKS)
-        world.is_collision.assert_called_once_with(missile)
+        world.sweep.assert_called_once_with(missile, self.initial_x + TICKS * BULLET_SPEED, self.initial_y)
 
     def test_vehicle_is_not_moved_if_new_position_invalid(self, world, armour, missile):
-        world.is_collision.return_value = True
+        world.sweep.return_value = (True, 0.0)
         missile.update(TICKS)
         assert missile.position.x == self.initial_x
         assert missile.position.y == self.initial_y
@@ -166,18 +190,26 @@ class TestMove(Shared):
         assert armour.position.x == self.initial_x
         assert armour.position.y == self.initial_y
 
+    def test_vehicle_stops_where_contact_is_made(self, world, armour):
+        world.sweep.return_value = (True, 0.25)
+        armour.move(100)
+        armour.update(100)
+        assert isinstance(armour._command, Idle)
+        assert armour.position.x == pytest.approx(self.initial_x + 100 * TANK_SPEED * 0.25)
+        assert armour.position.y == self.initial_y
+
     def test_missile_disappears_when_hitting_boundary(self, world, missile):
-        world.is_collision.return_value = True
+        world.sweep.return_value = (True, 0.5)
         missile.update(TICKS)
         world.remove_bullet.assert_called_with(missile)
 
     def test_missile_disappears_when_hitting_other_tank(self, world, missile, other):
-        world.is_collision.return_value = other
+        world.sweep.return_value = (other, 0.5)
         missile.update(TICKS)
         world.remove_bullet.assert_called_with(missile)
 
     def test_missile_inflicts_damage_when_hitting_other_tank(self, world, missile, other):
-        world.is_collision.return_value = other
+        world.sweep.return_value = (other, 0.5)
         missile.update(TICKS)
         assert other.health == MAX_HEALTH - BULLET_DAMAGE
 
@@ -259,6 +291,13 @@ class TestRotate(RotateAndAim):
     def test_rotation(self, angle, target_vector, armour):
         self._test("", angle, target_vector, armour)
 
+    def test_rotation_takes_shortest_way_around(self, armour):
+        armour.rotate(270)
+        armour.update(1000)
+        assert isinstance(armour._command, Idle)
+        assert armour.direction.x == pytest.approx(0.0)
+        assert armour.direction.y == pytest.approx(-1.0)
+
 
 class TestAim(RotateAndAim):
     def _get_starting_status(self):
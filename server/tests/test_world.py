@@ -11,7 +11,7 @@ from mock import create_autospec, patch
 
 from ibidem.codetanks.domain.messages_pb2 import Arena, Id, Tank, BotStatus, Bullet, Death, Event, Point, ScanComplete
 from ibidem.codetanks.server.commands import Move
-from ibidem.codetanks.server.constants import TANK_RADIUS
+from ibidem.codetanks.server.constants import TANK_RADIUS, TANK_SPEED, MAX_HEALTH, BULLET_DAMAGE
 from ibidem.codetanks.server.vehicle import Armour, Missile
 from ibidem.codetanks.server.world import World
 
@@ -49,6 +49,19 @@ class TestWorld:
         assert world.bullets == list(world.gamedata.bullets)
         assert world.tanks == list(world.gamedata.tanks)
 
+    def test_reset_removes_tanks_and_bullets(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        tanks[0].fire()
+        world.update(1)
+        assert world.bullets
+        tanks[1].status = BotStatus.DEAD
+        world.reset()
+        assert world.tanks == []
+        assert world.bullets == []
+        assert world.number_of_live_bots == 0
+        tank = world.add_tank(BOT_ID, 0)
+        assert world.get_live_bots() == [tank]
+
     def _bounds_test(self, world, vehicle_class, entity, parent, position, is_outside_bounds):
         entity.position.CopyFrom(Point(x=position.x, y=position.y))
         entity.direction.CopyFrom(Point(x=1, y=1))
@@ -99,6 +112,115 @@ class TestWorld:
         tank1.position = Point2(50, 50)
         assert world.is_collision(tank0) == tank1
 
+    def test_collision_is_found_after_tank_moves(self, world):
+        tank0 = world.add_tank(BOT_ID, 0)
+        tank1 = world.add_tank(BOT_ID, 1)
+        tank0.position = Point2(50, 50)
+        tank1.position = Point2(400, 400)
+        assert world.is_collision(tank0) is False
+        tank1.position = Point2(50 + 2 * TANK_RADIUS, 50)
+        assert world.is_collision(tank0) == tank1
+
+    def test_first_tank_is_returned_when_colliding_with_several(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        for tank in tanks:
+            tank.position = Point2(250, 250)
+        assert world.is_collision(tanks[2]) == tanks[0]
+        assert world.is_collision(tanks[0]) == tanks[1]
+
+    def test_sweep_finds_first_tank_in_the_way(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        tanks[0].position = Point2(50, 50)
+        tanks[1].position = Point2(300, 50)
+        tanks[2].position = Point2(200, 50)
+        obstacle, fraction = world.sweep(tanks[0], 450, 50)
+        assert obstacle == tanks[2]
+        assert fraction == pytest.approx((150 - 2 * TANK_RADIUS) / 400)
+
+    def test_sweep_finds_edge_of_arena(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        tank.position = Point2(50, 50)
+        obstacle, fraction = world.sweep(tank, 50, 50 - 100)
+        assert obstacle is True
+        assert fraction == pytest.approx((50 - TANK_RADIUS) / 100)
+
+    def test_sweep_is_clear_past_tanks_out_of_the_way(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(2)]
+        tanks[0].position = Point2(50, 50)
+        tanks[1].position = Point2(200, 50 + 2 * TANK_RADIUS + 1)
+        assert world.sweep(tanks[0], 400, 50) == (False, 1.0)
+
+    def test_sweep_finds_tank_passed_through(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(2)]
+        tanks[0].position = Point2(50, 50)
+        tanks[1].position = Point2(200, 50)
+        obstacle, fraction = world.sweep(tanks[0], 400, 50)
+        assert obstacle == tanks[1]
+        assert fraction < 1.0
+        tanks[0].position = Point2(400, 50)
+        assert world.is_collision(tanks[0]) is False
+
+    def test_head_on_tanks_stop_at_contact(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        tank.position = Point2(100., 100.)
+        tank.direction = Vector2(1., 0.)
+        other.position = Point2(100. + 2 * TANK_RADIUS + 10., 100.)
+        other.direction = Vector2(-1., 0.)
+        tank.move(100)
+        other.move(100)
+        world.update(1000)
+        assert tank.status == other.status == BotStatus.IDLE
+        assert tank.position.x == pytest.approx(105.)
+        assert other.position.x == pytest.approx(105. + 2 * TANK_RADIUS)
+
+    @pytest.mark.parametrize("ticks", (1, 16, 50, 500, 5000))
+    def test_head_on_tanks_do_not_overlap_at_any_tick_length(self, world, ticks):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        tank.position = Point2(100., 100.)
+        tank.direction = Vector2(1., 0.)
+        other.position = Point2(300., 100.)
+        other.direction = Vector2(-1., 0.)
+        tank.move(300)
+        other.move(300)
+        while BotStatus.MOVING in (tank.status, other.status):
+            world.update(ticks)
+        assert tank.position.x == pytest.approx(200. - TANK_RADIUS)
+        assert other.position.x == pytest.approx(200. + TANK_RADIUS)
+
+    def test_long_tick_does_not_pass_through_tank(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        other = world.add_tank(BOT_ID, 1)
+        tank.position = Point2(100., 100.)
+        tank.direction = Vector2(1., 0.)
+        other.position = Point2(200., 100.)
+        tank.move(300)
+        world.update(300 / TANK_SPEED)
+        assert tank.status == BotStatus.IDLE
+        assert tank.position.x == pytest.approx(200. - 2 * TANK_RADIUS)
+
+    def test_gamedata_is_reused_while_nothing_changes(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        gamedata = world.gamedata
+        world.update(10)
+        assert world.gamedata is gamedata
+        tank.move(10)
+        moving = world.gamedata
+        assert moving is not gamedata
+        assert moving.tanks[0].status == BotStatus.MOVING
+        world.update(10)
+        assert world.gamedata is not moving
+        assert world.gamedata.tanks[0].position != moving.tanks[0].position
+
+    def test_gamedata_is_renewed_when_bullets_fly(self, world):
+        tank = world.add_tank(BOT_ID, 0)
+        world.add_bullet(tank)
+        gamedata = world.gamedata
+        assert len(gamedata.bullets) == 1
+        world.update(10)
+        assert world.gamedata is not gamedata
+
     def test_tank_is_placed_inside_arena(self, world):
         return_values = []
         return_values.extend([1] * 4)
@@ -132,11 +254,43 @@ class TestWorld:
             assert tank.turret.x == 0
             assert tank.turret.y == -1
 
+    def test_diagonal_direction_is_unit_length(self, world):
+        return_values = [1, 1, -1, 1]
+        return_values.extend([None] * 10)
+        with patch("ibidem.codetanks.server.world.randint", side_effect=_MyRandint(return_values)):
+            tank = world.add_tank(BOT_ID, 0).entity
+            assert (tank.direction.x, tank.direction.y) == pytest.approx((math.sqrt(.5), math.sqrt(.5)))
+            assert (tank.turret.x, tank.turret.y) == pytest.approx((-math.sqrt(.5), math.sqrt(.5)))
+
     def test_added_tank_is_returned(self, world):
         returned_tank = world.add_tank(BOT_ID, 0)
         added_tank = world._tanks[0]
         assert returned_tank is added_tank
 
+    def test_tank_is_found_by_id(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        assert world.get_tank(1) is tanks[1]
+
+    def test_live_bots_follow_deaths(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        assert world.number_of_live_bots == 3
+        for _ in range(MAX_HEALTH // BULLET_DAMAGE):
+            tanks[1].inflict(BULLET_DAMAGE, tanks[0])
+        assert world.number_of_live_bots == 2
+        assert world.get_live_bots() == [tanks[0], tanks[2]]
+
+    def test_tanks_are_bucketed_by_status(self, world):
+        tanks = [world.add_tank(BOT_ID, i) for i in range(3)]
+        assert world.get_tanks_with_status(BotStatus.IDLE) == tanks
+        tanks[0].move(10)
+        tanks[2].rotate(90)
+        assert world.get_tanks_with_status(BotStatus.IDLE) == [tanks[1]]
+        assert world.get_tanks_with_status(BotStatus.MOVING) == [tanks[0]]
+        assert world.get_tanks_with_status(BotStatus.ROTATING) == [tanks[2]]
+        tanks[2].update(1000)
+        assert world.get_tanks_with_status(BotStatus.ROTATING) == []
+        assert world.get_tanks_with_status(BotStatus.IDLE) == [tanks[1], tanks[2]]
+
 
 class TestTank:
     @pytest.fixture
@@ -144,6 +298,7 @@ class TestTank:
         armour = create_autospec(Armour)
         armour.entity = Tank()
         armour.radius = TANK_RADIUS
+        armour.location = (50, 50)
         return armour
 
     @pytest.fixture
@@ -252,11 +407,16 @@ class TestBullet:
         parent = create_autospec(Armour)
         parent.position = Point2(230, 50)
         parent.turret = Vector2(-1, 0)
+        parent.location = (230, 50)
+        parent.turret_vector = (-1, 0)
         return parent
 
     @pytest.fixture
     def bullet(self):
-        return create_autospec(Missile)
+        bullet = create_autospec(Missile)
+        bullet.slot = 0
+        bullet.spent = False
+        return bullet
 
     @pytest.fixture
     def world(self, world, parent, bullet):
@@ -276,14 +436,54 @@ class TestBullet:
         world.update(ticks)
         bullet.update.assert_called_with(ticks)
 
+    def test_bullet_does_not_pass_through_tank_in_long_update(self):
+        world = World(WIDTH, HEIGTH, False)
+        shooter = world.add_tank(BOT_ID, 0)
+        target = world.add_tank(BOT_ID, 1)
+        shooter.position = Point2(50, 50)
+        shooter.turret = Vector2(1, 0)
+        target.position = Point2(300, 50)
+        world.add_bullet(shooter)
+        world.update(2000)
+        assert world.bullets == []
+        assert target.health < shooter.health
+
     def test_correct_bullet_is_removed(self, world, parent):
         world.add_bullet(parent)
         world.add_bullet(parent)
         first, to_remove, last = world._bullets
         world.remove_bullet(to_remove)
-        assert len(world._bullets) == 2
-        assert world._bullets[0] == first
-        assert world._bullets[-1] == last
+        world.update(0)
+        assert world._bullets == [first, None, last]
+
+    def test_removal_is_deferred_until_end_of_update(self, world, parent, bullet):
+        world.add_bullet(parent)
+        world.add_bullet(parent)
+        _, second, third = world._bullets
+        bullet.update.side_effect = lambda ticks: world.remove_bullet(bullet)
+        world.update(10)
+        assert second.position != parent.position
+        assert third.position != parent.position
+        assert world._bullets == [None, second, third]
+
+    def test_removed_bullet_is_hidden_before_end_of_update(self, world, parent):
+        world.add_bullet(parent)
+        second = world._bullets[1]
+        world.remove_bullet(second)
+        assert world.bullets == [world._bullets[0].entity]
+
+    def test_spent_bullet_is_recycled(self, world, parent):
+        world.add_bullet(parent)
+        spent = world._bullets[1]
+        spent_id = spent.entity.id
+        world.remove_bullet(spent)
+        world.update(0)
+        world.add_bullet(parent)
+        assert world._bullets[1] is spent
+        assert spent.entity.id != spent_id
+        assert spent.position == parent.position
+        assert spent.direction == parent.turret
+        assert not spent.spent
 
 
 class _MyRandint(object):
@@ -1,11 +1,19 @@
 #!/usr/bin/env python
 # -*- coding: utf-8
 
+import asyncio
+import uuid
+
 import pytest
-from mock import patch
+import zmq
+import zmq.asyncio
+from mock import patch, create_autospec
 
-from ibidem.codetanks.domain.messages_pb2 import Command, CommandType, Registration, ClientType, Id
-from ibidem.codetanks.server.zeromq import Channel, ChannelType
+from ibidem.codetanks.domain.messages_pb2 import Command, CommandType, Registration, ClientType, Id, Event, ShotFired, \
+    RegistrationReply, RegistrationResult, CommandReply, CommandResult
+from ibidem.codetanks.server.peer import EncodedEvent
+from ibidem.codetanks.server.zeromq import Channel, ChannelType, ZeroMQPeer, ZeroMQServer, serialize, bot_topic, \
+    match_topic
 from ibidem.codetanks.server.config import Settings
 
 
@@ -31,6 +39,27 @@ class TestChannel(object):
             socket = Channel(ChannelType.PUBLISH, self.port)
             assert socket.url == "tcp://%s:%d" % (self.hostname, self.port)
 
+    def test_ipc_urls_name_a_socket_file_per_port(self, tmp_path):
+        settings = Settings(transport="ipc", ipc_dir=str(tmp_path / "sockets"))
+        with patch("ibidem.codetanks.server.zeromq.settings", settings), \
+                patch.object(Channel, "url_scheme", "ipc"):
+            socket = Channel(ChannelType.PUBLISH, self.port)
+            assert socket.url == "ipc://%s/%d" % (tmp_path / "sockets", self.port)
+            assert (tmp_path / "sockets" / str(self.port)).exists()
+
+    def test_inproc_channels_connect_to_advertised_url(self, settings):
+        with patch("ibidem.codetanks.server.zeromq.settings", settings), \
+                patch.object(Channel, "url_scheme", "inproc"):
+            rep_socket = Channel(ChannelType.REPLY, self.port)
+            assert rep_socket.url == "inproc://codetanks/%d" % self.port
+            req_socket = zmq.Context.instance().socket(zmq.REQ)
+            req_socket.connect(rep_socket.url)
+            value = Command(type=CommandType.FIRE)
+            req_socket.send(serialize(value))
+            assert rep_socket.recv() == value
+            req_socket.close()
+            rep_socket.zmq_socket.close()
+
     def test_socket(self):
         with patch.object(Channel, "url_scheme", self.test_url_scheme), \
                 patch.object(Channel, "url_wildcard", "test_socket"), \
@@ -50,3 +79,185 @@ class TestChannel(object):
             value = Registration(client_type=ClientType.VIEWER, id=Id(name="test", version=1))
             req_socket.send(value)
             assert rep_socket.recv() == value
+
+
+class TestZeroMQPeer(object):
+    def test_event_bytes_shared_between_peers(self):
+        registration = Registration(client_type=ClientType.BOT, id=Id(name="test", version=1))
+        channels = [create_autospec(Channel, instance=True) for _ in range(2)]
+        peers = [ZeroMQPeer(registration, channel, None) for channel in channels]
+        event = EncodedEvent(Event(sequence_id=1, shot_fired=ShotFired()))
+        for p in peers:
+            p.handle_event(event)
+        first, second = [channel.send_encoded.call_args.args[0] for channel in channels]
+        assert first is second
+        assert Event.FromString(first) == event.event
+
+    def test_viewer_events_sent_without_topic(self):
+        registration = Registration(client_type=ClientType.VIEWER, id=Id(name="test", version=1))
+        channel = create_autospec(Channel, instance=True)
+        event = EncodedEvent(Event(sequence_id=1))
+        ZeroMQPeer(registration, channel, None).handle_event(event)
+        channel.send_encoded.assert_called_once_with(event.data)
+
+    def test_bot_events_published_on_bot_topic(self):
+        registration = Registration(client_type=ClientType.BOT, id=Id(name="test", version=1))
+        channel = create_autospec(Channel, instance=True)
+        event = EncodedEvent(Event(sequence_id=1))
+        ZeroMQPeer(registration, channel, None, bot_topic(3)).handle_event(event)
+        channel.publish.assert_called_once_with(b"bot/3/", event.data)
+
+    def test_broadcasts_handed_to_channel_with_match_topic(self):
+        registration = Registration(client_type=ClientType.BOT, id=Id(name="test", version=1))
+        channel = create_autospec(Channel, instance=True)
+        event = EncodedEvent(Event(sequence_id=1), broadcast=True)
+        p = ZeroMQPeer(registration, channel, None, bot_topic(3))
+        p.join_match(2)
+        p.handle_event(event)
+        channel.broadcast.assert_called_once_with(b"match/2/", event)
+        channel.publish.assert_not_called()
+        assert p.broadcast_topic == "match/2/"
+
+
+class TestTopics(object):
+    def test_no_topic_is_prefix_of_another(self):
+        topics = [bot_topic(i) for i in range(20)] + [match_topic(i) for i in range(20)]
+        for topic in topics:
+            assert [other for other in topics if other.startswith(topic)] == [topic]
+
+    def test_subscriber_gets_own_events_and_broadcasts_once(self):
+        with patch.object(Channel, "url_scheme", "inproc"), \
+                patch.object(Channel, "url_wildcard", "test_topics"), \
+                patch.object(Channel, "_bind_socket", _test_bind):
+            pub_channel = Channel(ChannelType.PUBLISH, 1)
+            sub_socket = pub_channel.zmq_socket.context.socket(zmq.SUB)
+            for topic in (bot_topic(1), match_topic(0)):
+                sub_socket.set(zmq.SUBSCRIBE, topic.encode())
+            sub_socket.connect("inproc://test_topics")
+            registration = Registration(client_type=ClientType.BOT, id=Id(name="test", version=1))
+            peers = [ZeroMQPeer(registration, pub_channel, None, bot_topic(i)) for i in range(3)]
+            broadcast = EncodedEvent(Event(sequence_id=1), broadcast=True)
+            for p in peers:
+                p.handle_event(EncodedEvent(Event(sequence_id=10 + peers.index(p))))
+                p.handle_event(broadcast)
+            received = []
+            while sub_socket.poll(100):
+                received.append(Event.FromString(sub_socket.recv_multipart()[-1]).sequence_id)
+            sub_socket.close()
+            assert received == [1, 11]
+
+
+class TestZeroMQServer(object):
+    @pytest.fixture
+    def base_url(self, request):
+        return "inproc://%s" % request.node.name
+
+    @pytest.fixture
+    def server(self, base_url):
+        with patch.object(Channel, "_create_url", lambda self, host, port=None: "%s/%d" % (base_url, port)):
+            channels = [Channel(ChannelType.PUBLISH, 1), Channel(ChannelType.REPLY, 2, Registration),
+                        Channel(ChannelType.PUBLISH, 3), Channel(ChannelType.ROUTER, 4)]
+            server = ZeroMQServer(*channels)
+            yield server
+            for channel in channels:
+                channel.zmq_socket.close(linger=0)
+
+    @staticmethod
+    def _served(server, add_peer, client, commands_received=lambda: None):
+        """Run the client coroutine while the server serves on the event loop, and return what it returns"""
+        async def run():
+            serving = asyncio.create_task(server.serve(add_peer, commands_received))
+            try:
+                return await asyncio.wait_for(client, 5)
+            finally:
+                serving.cancel()
+
+        return asyncio.run(run())
+
+    @staticmethod
+    async def _request(url, value, reply_class):
+        ctx = zmq.asyncio.Context.shadow(zmq.Context.instance().underlying)
+        socket = ctx.socket(zmq.REQ)
+        socket.connect(url)
+        await socket.send(serialize(value))
+        reply = reply_class.FromString(await socket.recv())
+        socket.close(linger=0)
+        return reply
+
+    def test_commands_routed_to_their_peers_and_back(self, server, base_url):
+        peers = []
+        registration = Registration(client_type=ClientType.BOT, id=Id(name="bot", version=1))
+
+        def add_peer(p):
+            peers.append(p)
+            return RegistrationReply(result=RegistrationResult.SUCCESS)
+
+        def commands_received():
+            for p in peers:
+                command = p.next_command()
+                if command is not None:
+                    p.command_reply(CommandReply(result=CommandResult.ACCEPTED if command.value == 10
+                                                 else CommandResult.BUSY))
+
+        async def bots():
+            replies = [await self._request(base_url + "/2", registration, RegistrationReply) for _ in range(2)]
+            assert replies[0].peer_id != replies[1].peer_id
+            assert replies[0].cmd_url == replies[1].cmd_url
+            commands = [Command(type=CommandType.MOVE, value=value, peer_id=reply.peer_id)
+                        for reply, value in zip(replies, (10, 20))]
+            return await asyncio.gather(*(self._request(base_url + "/4", c, CommandReply) for c in commands))
+
+        replies = self._served(server, add_peer, bots(), commands_received)
+        assert [reply.result for reply in replies] == [CommandResult.ACCEPTED, CommandResult.BUSY]
+
+    def test_command_from_unknown_peer_is_refused(self, server, base_url):
+        command = Command(type=CommandType.FIRE, peer_id="unknown")
+        reply = self._served(server, lambda p: None, self._request(base_url + "/4", command, CommandReply))
+        assert reply.result == CommandResult.BUSY
+
+    def test_peer_ids_are_random(self, server, base_url):
+        registration = Registration(client_type=ClientType.BOT, id=Id(name="bot", version=1))
+        reply = self._served(server, lambda p: RegistrationReply(result=RegistrationResult.SUCCESS),
+                             self._request(base_url + "/2", registration, RegistrationReply))
+        assert uuid.UUID(reply.peer_id).version == 4
+        assert list(reply.event_topics) == [bot_topic(reply.peer_id), match_topic(0)]
+
+    def test_serve_handles_registrations_and_commands_on_event_loop(self, server, base_url):
+        peers = []
+        received = []
+
+        def add_peer(p):
+            peers.append(p)
+            return RegistrationReply(result=RegistrationResult.SUCCESS)
+
+        async def bot():
+            ctx = zmq.asyncio.Context.shadow(zmq.Context.instance().underlying)
+            registration = ctx.socket(zmq.REQ)
+            registration.connect(base_url + "/2")
+            await registration.send(serialize(Registration(client_type=ClientType.BOT, id=Id(name="bot", version=1))))
+            reply = RegistrationReply.FromString(await registration.recv())
+            cmd = ctx.socket(zmq.REQ)
+            cmd.connect(base_url + "/4")
+            await cmd.send(serialize(Command(type=CommandType.FIRE, peer_id=reply.peer_id)))
+            reply = CommandReply.FromString(await cmd.recv())
+            registration.close(linger=0)
+            cmd.close(linger=0)
+            return reply
+
+        def commands_received():
+            for p in peers:
+                command = p.next_command()
+                if command is not None:
+                    received.append(command)
+                    p.command_reply(CommandReply(result=CommandResult.ACCEPTED))
+
+        async def run():
+            serving = asyncio.create_task(server.serve(add_peer, commands_received))
+            try:
+                return await asyncio.wait_for(bot(), 5)
+            finally:
+                serving.cancel()
+
+        reply = asyncio.run(run())
+        assert reply.result == CommandResult.ACCEPTED
+        assert [command.type for command in received] == [CommandType.FIRE]
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+from ibidem.codetanks.domain.messages_pb2 import GameData
+
+_MESSAGE_FIELDS = ("bot_id", "position", "direction", "turret")
+_VALUE_FIELDS = ("health", "status")
+
+
+def apply_delta(game_data, delta):
+    """Build the GameData that results from applying delta on top of game_data"""
+    result = GameData()
+    result.CopyFrom(game_data)
+    tanks = {tank.id: tank for tank in result.tanks}
+    for tank_delta in delta.tanks:
+        tank = tanks.get(tank_delta.id)
+        if tank is None:
+            tank = result.tanks.add(id=tank_delta.id)
+        for field in _MESSAGE_FIELDS:
+            if tank_delta.HasField(field):
+                getattr(tank, field).CopyFrom(getattr(tank_delta, field))
+        for field in _VALUE_FIELDS:
+            if tank_delta.HasField(field):
+                setattr(tank, field, getattr(tank_delta, field))
+    removed = set(delta.removed_bullets)
+    updated = {bullet.id: bullet for bullet in delta.bullets}
+    bullets = [updated.pop(bullet.id, bullet) for bullet in result.bullets if bullet.id not in removed]
+    del result.bullets[:]
+    result.bullets.extend(bullets + list(updated.values()))
+    return result
+
+
+if __name__ == "__main__":
+    pass
@@ -10,6 +10,7 @@ import pygame
 import zmq
 
 from ibidem.codetanks.domain.messages_pb2 import Registration, ClientType, Id, BotStatus, RegistrationReply, Event
+from ibidem.codetanks.viewer.delta import apply_delta
 from ibidem.codetanks.viewer.entities import Tank, Bullet
 
 LOG = logging.getLogger(__name__)
@@ -43,6 +44,8 @@ class ServerProxy(object):
         self._update_socket.connect(event_url)
         self.entities = pygame.sprite.LayeredUpdates()
         self.tanks = pygame.sprite.Group()
+        self._game_data = None
+        self._sequence_id = None
 
     def _update_entities(self, updates, sprite_group, entity_class):
         for update in updates:
@@ -59,6 +62,15 @@ class ServerProxy(object):
         self.tanks = self.entities.copy()
         self._update_entities(game_data.bullets, self.entities, Bullet)
 
+    def _apply_game_data_delta(self, event):
+        delta = event.game_data_delta
+        if self._game_data is None or delta.base_sequence_id != self._sequence_id:
+            LOG.debug("Missed the base of delta %d, waiting for next keyframe", event.sequence_id)
+            return
+        self._game_data = apply_delta(self._game_data, delta)
+        self._sequence_id = event.sequence_id
+        self._update_game_data(self._game_data)
+
     def _get_server_update(self):
         events = self._update_socket.poll(100)
         if events == zmq.POLLIN:
@@ -69,7 +81,11 @@ class ServerProxy(object):
         try:
             event = self._get_server_update()
             if event.HasField("game_data"):
-                self._update_game_data(event.game_data)
+                self._game_data = event.game_data
+                self._sequence_id = event.sequence_id
+                self._update_game_data(self._game_data)
+            elif event.HasField("game_data_delta"):
+                self._apply_game_data_delta(event)
             else:
                 LOG.info("Received event: %r", event)
         except Empty:
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8
+
+from ibidem.codetanks.domain.messages_pb2 import GameData, GameDataDelta, TankDelta, Tank, Bullet, Point, BotStatus, \
+    Id
+
+from ibidem.codetanks.viewer.delta import apply_delta
+
+
+def _tank(id, x=10.0, health=100, status=BotStatus.IDLE):
+    return Tank(id=id, bot_id=Id(name="bot%d" % id, version=1), position=Point(x=x, y=20.0),
+                direction=Point(x=1.0, y=0.0), turret=Point(x=0.0, y=1.0), health=health, status=status)
+
+
+def _bullet(id, x):
+    return Bullet(id=id, position=Point(x=x, y=0.0), direction=Point(x=1.0, y=0.0))
+
+
+class TestApplyDelta(object):
+    def test_only_fields_in_delta_are_changed(self):
+        game_data = GameData(tanks=[_tank(0), _tank(1)])
+        delta = GameDataDelta(tanks=[TankDelta(id=1, position=Point(x=15.0, y=20.0), health=80)])
+        result = apply_delta(game_data, delta)
+        assert result.tanks[0] == _tank(0)
+        assert result.tanks[1] == _tank(1, x=15.0, health=80)
+
+    def test_status_changed_to_default_value(self):
+        game_data = GameData(tanks=[_tank(0, status=BotStatus.MOVING)])
+        delta = GameDataDelta(tanks=[TankDelta(id=0, status=BotStatus.IDLE)])
+        assert apply_delta(game_data, delta).tanks[0].status == BotStatus.IDLE
+
+    def test_new_tank_added_with_bot_id(self):
+        game_data = GameData(tanks=[_tank(0)])
+        new = _tank(1)
+        delta = GameDataDelta(tanks=[TankDelta(id=1, bot_id=new.bot_id, position=new.position,
+                                               direction=new.direction, turret=new.turret, health=new.health,
+                                               status=new.status)])
+        result = apply_delta(game_data, delta)
+        assert list(result.tanks) == [_tank(0), new]
+        assert result.tanks[1].bot_id.name == "bot1"
+
+    def test_bullets_moved_added_and_removed(self):
+        game_data = GameData(bullets=[_bullet(1, 3.0), _bullet(2, 4.0), _bullet(4, 5.0)])
+        delta = GameDataDelta(bullets=[_bullet(2, 8.0), _bullet(3, 1.0)], removed_bullets=[1])
+        result = apply_delta(game_data, delta)
+        assert list(result.bullets) == [_bullet(2, 8.0), _bullet(4, 5.0), _bullet(3, 1.0)]
+
+    def test_base_is_not_modified(self):
+        game_data = GameData(tanks=[_tank(0)], bullets=[_bullet(1, 3.0)])
+        delta = GameDataDelta(tanks=[TankDelta(id=0, health=0, status=BotStatus.DEAD)], removed_bullets=[1])
+        apply_delta(game_data, delta)
+        assert game_data == GameData(tanks=[_tank(0)], bullets=[_bullet(1, 3.0)])
+
+
+if __name__ == "__main__":
+    pass